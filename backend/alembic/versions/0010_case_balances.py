@@ -0,0 +1,74 @@
+"""add case_balances ledger
+
+Revision ID: 0010_case_balances
+Revises: 0009_activity_log
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0010_case_balances"
+down_revision = "0009_activity_log"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "case_balances",
+        sa.Column("case_id", sa.Integer(), sa.ForeignKey("cases.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("deductible_consumed_ils_gross", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("retainer_paid_total_ils_gross", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("retainer_accrued_total_ils_gross", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("fee_credit_applied_ils_gross", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("fees_due_total_ils_gross", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("excess_remaining_ils_gross", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    # Backfill from raw rows (same formula as services/balances.compute_case_balances).
+    op.execute(
+        """
+        INSERT INTO case_balances (
+            case_id, deductible_consumed_ils_gross, retainer_paid_total_ils_gross, retainer_accrued_total_ils_gross,
+            fee_credit_applied_ils_gross, fees_due_total_ils_gross, excess_remaining_ils_gross
+        )
+        SELECT
+            c.id,
+            COALESCE(e.consumed, 0),
+            COALESCE(p.paid, 0),
+            COALESCE(a.accrued, 0),
+            COALESCE(f.applied, 0),
+            COALESCE(f.due, 0),
+            GREATEST(
+                0,
+                c.deductible_ils_gross - (
+                    COALESCE(c.retainer_snapshot_ils_gross, 0) + COALESCE(p.paid, 0)
+                    + COALESCE(c.expenses_snapshot_ils_gross, 0) + COALESCE(e.other, 0)
+                )
+            )
+        FROM cases c
+        LEFT JOIN (
+            SELECT case_id,
+                   SUM(amount_ils_gross) AS consumed,
+                   SUM(CASE WHEN category <> 'ATTORNEY_FEE' THEN amount_ils_gross ELSE 0 END) AS other
+            FROM expenses WHERE payer = 'CLIENT_DEDUCTIBLE' GROUP BY case_id
+        ) e ON e.case_id = c.id
+        LEFT JOIN (SELECT case_id, SUM(amount_ils_gross) AS paid FROM retainer_payments GROUP BY case_id) p ON p.case_id = c.id
+        LEFT JOIN (SELECT case_id, SUM(amount_ils_gross) AS accrued FROM retainer_accruals GROUP BY case_id) a ON a.case_id = c.id
+        LEFT JOIN (
+            SELECT case_id,
+                   SUM(amount_covered_by_credit_ils_gross) AS applied,
+                   SUM(amount_due_cash_ils_gross) AS due
+            FROM fee_events GROUP BY case_id
+        ) f ON f.case_id = c.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("case_balances")
@@ -0,0 +1,32 @@
+"""composite indexes for keyset case listing
+
+Revision ID: 0011_case_list_keyset_indexes
+Revises: 0010_case_balances
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0011_case_list_keyset_indexes"
+down_revision = "0010_case_balances"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_cases_open_date_id", "cases", ["open_date", "id"])
+    op.create_index("ix_cases_status_open_date_id", "cases", ["status", "open_date", "id"])
+    op.create_index("ix_cases_payer_open_date_id", "cases", ["status", "insurer_started", "open_date", "id"])
+    op.create_index("ix_cases_case_type_open_date_id", "cases", ["case_type", "open_date", "id"])
+    op.create_index("ix_cases_branch_open_date_id", "cases", ["branch_name", "open_date", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_cases_branch_open_date_id", table_name="cases")
+    op.drop_index("ix_cases_case_type_open_date_id", table_name="cases")
+    op.drop_index("ix_cases_payer_open_date_id", table_name="cases")
+    op.drop_index("ix_cases_status_open_date_id", table_name="cases")
+    op.drop_index("ix_cases_open_date_id", table_name="cases")
@@ -0,0 +1,46 @@
+"""add expense_rollup_monthly
+
+Revision ID: 0012_expense_rollup_monthly
+Revises: 0011_case_list_keyset_indexes
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0012_expense_rollup_monthly"
+down_revision = "0011_case_list_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    expense_payer = postgresql.ENUM(name="expensepayer", create_type=False)
+    expense_category = postgresql.ENUM(name="expensecategory", create_type=False)
+    op.create_table(
+        "expense_rollup_monthly",
+        sa.Column("case_id", sa.Integer(), sa.ForeignKey("cases.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("month", sa.Date(), primary_key=True),
+        sa.Column("payer", expense_payer, primary_key=True),
+        sa.Column("category", expense_category, primary_key=True),
+        sa.Column("total_ils_gross", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("expense_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    # Backfill from history (same buckets as services/expense_rollup.rebuild_expense_rollup).
+    op.execute(
+        """
+        INSERT INTO expense_rollup_monthly (case_id, month, payer, category, total_ils_gross, expense_count)
+        SELECT case_id, date_trunc('month', expense_date)::date, payer, category, SUM(amount_ils_gross), COUNT(*)
+        FROM expenses
+        GROUP BY case_id, date_trunc('month', expense_date)::date, payer, category
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("expense_rollup_monthly")
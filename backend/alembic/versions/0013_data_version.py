@@ -0,0 +1,30 @@
+"""add data_version counter
+
+Revision ID: 0013_data_version
+Revises: 0012_expense_rollup_monthly
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0013_data_version"
+down_revision = "0012_expense_rollup_monthly"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "data_version",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute("INSERT INTO data_version (id, version) VALUES (1, 0)")
+
+
+def downgrade() -> None:
+    op.drop_table("data_version")
@@ -0,0 +1,32 @@
+"""unique (type, key) on alert_events
+
+Revision ID: 0014_alert_events_unique_key
+Revises: 0013_data_version
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0014_alert_events_unique_key"
+down_revision = "0013_data_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Collapse duplicates left by the old check-then-insert race: keep the earliest row per (type, key).
+    op.execute(
+        """
+        DELETE FROM alert_events a
+        USING alert_events b
+        WHERE a.type = b.type AND a.key = b.key AND a.id > b.id
+        """
+    )
+    op.create_unique_constraint("uq_alert_events_type_key", "alert_events", ["type", "key"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_alert_events_type_key", "alert_events", type_="unique")
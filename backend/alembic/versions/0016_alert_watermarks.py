@@ -0,0 +1,45 @@
+"""add alert_watermarks and cases.updated_at
+
+Revision ID: 0016_alert_watermarks
+Revises: 0015_email_outbox
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0016_alert_watermarks"
+down_revision = "0015_email_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    notificationtype = postgresql.ENUM(
+        "DEDUCTIBLE_NEAR_EXHAUSTION",
+        "INSURER_STARTED_PAYING",
+        "RETAINER_DUE_SOON",
+        "RETAINER_OVERDUE",
+        name="notificationtype",
+        create_type=False,
+    )
+    op.create_table(
+        "alert_watermarks",
+        sa.Column("type", notificationtype, primary_key=True),
+        sa.Column("evaluated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("evaluated_for", sa.Date(), nullable=False),
+    )
+    # No watermark rows yet: the first run after this migration is a full evaluation.
+    op.add_column(
+        "cases",
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("cases", "updated_at")
+    op.drop_table("alert_watermarks")
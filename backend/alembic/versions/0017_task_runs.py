@@ -0,0 +1,40 @@
+"""add task_runs
+
+Revision ID: 0017_task_runs
+Revises: 0016_alert_watermarks
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0017_task_runs"
+down_revision = "0016_alert_watermarks"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_runs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("task", sa.String(50), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False, server_default="running"),
+        sa.Column("started_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("duration_ms", sa.Integer(), nullable=True),
+        sa.Column("phases", sa.JSON(), nullable=True),
+        sa.Column("rows_scanned", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("rows_written", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("queries", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+    )
+    op.create_index("ix_task_runs_task_started_at", "task_runs", ["task", "started_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("task_runs")
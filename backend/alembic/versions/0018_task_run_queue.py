@@ -0,0 +1,39 @@
+"""queued task runs and task_locks
+
+Revision ID: 0018_task_run_queue
+Revises: 0017_task_runs
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0018_task_run_queue"
+down_revision = "0017_task_runs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("task_runs", sa.Column("queued_at", sa.DateTime(timezone=True), server_default=sa.func.now()))
+    op.execute("UPDATE task_runs SET queued_at = started_at")
+    op.alter_column("task_runs", "started_at", server_default=None, nullable=True)
+    op.drop_index("ix_task_runs_task_started_at", table_name="task_runs")
+    op.create_index("ix_task_runs_task_status", "task_runs", ["task", "status"])
+    # Lock rows for databases without advisory locks (Postgres uses pg_try_advisory_lock instead).
+    op.create_table(
+        "task_locks",
+        sa.Column("name", sa.String(50), primary_key=True),
+        sa.Column("run_id", sa.Integer(), nullable=False),
+        sa.Column("acquired_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("task_locks")
+    op.drop_index("ix_task_runs_task_status", table_name="task_runs")
+    op.create_index("ix_task_runs_task_started_at", "task_runs", ["task", "started_at"])
+    op.drop_column("task_runs", "queued_at")
@@ -0,0 +1,36 @@
+"""notifications.email_digest_pending
+
+Revision ID: 0019_notification_digest_hold
+Revises: 0018_task_run_queue
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0019_notification_digest_hold"
+down_revision = "0018_task_run_queue"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "notifications",
+        sa.Column("email_digest_pending", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    # Only the (few) held rows are ever looked up.
+    op.create_index(
+        "ix_notifications_email_digest_pending",
+        "notifications",
+        ["id"],
+        postgresql_where=sa.text("email_digest_pending"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notifications_email_digest_pending", table_name="notifications")
+    op.drop_column("notifications", "email_digest_pending")
@@ -0,0 +1,24 @@
+"""index retainer_accruals (is_paid, due_date)
+
+Revision ID: 0020_retainer_accruals_unpaid_due
+Revises: 0019_notification_digest_hold
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0020_retainer_accruals_unpaid_due"
+down_revision = "0019_notification_digest_hold"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_retainer_accruals_is_paid_due_date", "retainer_accruals", ["is_paid", "due_date"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_retainer_accruals_is_paid_due_date", table_name="retainer_accruals")
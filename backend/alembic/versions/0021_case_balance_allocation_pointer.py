@@ -0,0 +1,33 @@
+"""case_balances retainer payment allocation pointer
+
+Revision ID: 0021_case_balance_allocation_pointer
+Revises: 0020_retainer_accruals_unpaid_due
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0021_case_balance_allocation_pointer"
+down_revision = "0020_retainer_accruals_unpaid_due"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("case_balances", sa.Column("retainer_paid_through_month", sa.Date(), nullable=True))
+    op.add_column(
+        "case_balances",
+        sa.Column("retainer_unallocated_ils_gross", sa.Numeric(14, 2), nullable=False, server_default="0"),
+    )
+    # Null: no allocation state yet; the first payment per case reallocates in full and fills it in.
+    op.add_column("case_balances", sa.Column("retainer_allocated_payments_ils_gross", sa.Numeric(14, 2), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("case_balances", "retainer_allocated_payments_ils_gross")
+    op.drop_column("case_balances", "retainer_unallocated_ils_gross")
+    op.drop_column("case_balances", "retainer_paid_through_month")
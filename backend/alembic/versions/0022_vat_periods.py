@@ -0,0 +1,39 @@
+"""vat_periods table (seeded with the 17% / 18% rates)
+
+Revision ID: 0022_vat_periods
+Revises: 0021_case_balance_allocation_pointer
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0022_vat_periods"
+down_revision = "0021_case_balance_allocation_pointer"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    table = op.create_table(
+        "vat_periods",
+        sa.Column("start_month", sa.Date(), primary_key=True),
+        sa.Column("rate", sa.Numeric(6, 4), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.bulk_insert(
+        table,
+        [
+            {"start_month": dt.date(2015, 10, 1), "rate": "0.17"},
+            {"start_month": dt.date(2025, 1, 1), "rate": "0.18"},
+        ],
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("vat_periods")
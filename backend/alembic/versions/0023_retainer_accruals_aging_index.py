@@ -0,0 +1,32 @@
+"""partial covering index on unpaid retainer_accruals for the aging report
+
+Revision ID: 0023_retainer_accruals_aging_index
+Revises: 0022_vat_periods
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0023_retainer_accruals_aging_index"
+down_revision = "0022_vat_periods"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Index-only scan for GET /analytics/retainer-aging: unpaid rows by due date, with case and amount.
+    op.create_index(
+        "ix_retainer_accruals_unpaid_aging",
+        "retainer_accruals",
+        ["due_date"],
+        postgresql_where=sa.text("NOT is_paid"),
+        postgresql_include=["case_id", "amount_ils_gross"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_retainer_accruals_unpaid_aging", table_name="retainer_accruals")
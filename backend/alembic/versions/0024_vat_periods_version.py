@@ -0,0 +1,25 @@
+"""data_version row for the vat_periods version (VAT table cache)
+
+Revision ID: 0024_vat_periods_version
+Revises: 0023_retainer_accruals_aging_index
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0024_vat_periods_version"
+down_revision = "0023_retainer_accruals_aging_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # id 2 = VAT_PERIODS_VERSION_ID (app/models/data_version.py); bumped after a vat_periods commit.
+    op.execute("INSERT INTO data_version (id, version) VALUES (2, 0) ON CONFLICT (id) DO NOTHING")
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM data_version WHERE id = 2")
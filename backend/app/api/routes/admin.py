@@ -1,8 +1,10 @@
-"""Admin endpoints for destructive operations."""
+"""Admin endpoints for destructive and maintenance operations."""
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Header, HTTPException, status
+import datetime as dt
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
 from app.api.deps import require_auth
@@ -10,6 +12,7 @@ from app.core.config import settings
 from app.db.session import get_db
 from app.models.case import Case
 from app.models.notification import AlertEvent, Notification
+from app.schemas.retainer import VatPeriodOut, VatPeriodSet
 
 router = APIRouter()
 
@@ -49,6 +52,85 @@ def wipe_case_data(
     }
 
 
+@router.post("/rebuild-case-balances")
+def rebuild_case_balances(db: Session = Depends(get_db), _=Depends(require_auth)):
+    """
+    Recompute case_balances from the raw expenses / retainer / fee rows.
+    Returns how many rows were missing or had drifted (and were repaired).
+    """
+    from app.services.balances import rebuild_case_balances as rebuild
+
+    return {"ok": True, **rebuild(db)}
+
+
+@router.post("/rebuild-expense-rollup")
+def rebuild_expense_rollup(db: Session = Depends(get_db), _=Depends(require_auth)):
+    """Rebuild expense_rollup_monthly from the expenses table (backfill / drift repair)."""
+    from app.services.expense_rollup import rebuild_expense_rollup as rebuild
+
+    return {"ok": True, **rebuild(db)}
+
+
+@router.get("/task-runs")
+def task_runs(
+    task: str | None = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    _=Depends(require_auth),
+):
+    """Recent /tasks runs (newest first): status, duration and per-phase timings, rows and query counts."""
+    from app.services.task_runs import list_task_runs
+
+    return {"items": list_task_runs(db, task=task, limit=limit)}
+
+
+@router.get("/vat-periods", response_model=list[VatPeriodOut])
+def vat_periods(db: Session = Depends(get_db), _=Depends(require_auth)):
+    """VAT rates by period start, oldest first (each in force until the next start)."""
+    from app.models.vat_period import VatPeriod
+
+    rows = db.query(VatPeriod).order_by(VatPeriod.start_month.asc()).all()
+    return [VatPeriodOut(start_month=r.start_month, rate=r.rate) for r in rows]
+
+
+@router.put("/vat-periods/{start_month}")
+def set_vat_period(
+    start_month: dt.date,
+    payload: VatPeriodSet,
+    db: Session = Depends(get_db),
+    user=Depends(require_auth),
+):
+    """
+    Add or change the VAT rate from start_month on, then re-price the unpaid accruals from that
+    month (and reallocate payments for the cases whose amounts changed).
+    """
+    from app.services.activity_log import log_activity
+    from app.services.retainer import reprice_unpaid_accruals, set_vat_period as set_period
+
+    row = set_period(db, start_month=start_month, rate=payload.rate)
+    result = reprice_unpaid_accruals(db, since=row.start_month)
+    log_activity(
+        db,
+        action="vat_period_set",
+        entity_type="admin",
+        user_id=user.id,
+        details={"start_month": row.start_month.isoformat(), "rate": str(row.rate), **result},
+    )
+    return {"ok": True, "start_month": row.start_month, "rate": row.rate, **result}
+
+
+@router.post("/reprice-retainer-accruals")
+def reprice_retainer_accruals(
+    since: dt.date | None = None,
+    db: Session = Depends(get_db),
+    _=Depends(require_auth),
+):
+    """Re-price unpaid accruals (from since's month, default all) to the current VAT table."""
+    from app.services.retainer import reprice_unpaid_accruals
+
+    return {"ok": True, **reprice_unpaid_accruals(db, since=since)}
+
+
 @router.get("/wipe-case-data-status")
 def wipe_case_data_status(db: Session = Depends(get_db), _=Depends(require_auth)):
     """Returns counts of case-related rows. Use to verify DB is clean (all zeros)."""
@@ -1,21 +1,72 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+import datetime as dt
+from decimal import Decimal
+
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 
 from app.api.deps import require_auth
 from app.db.session import get_db
-from app.schemas.case import CaseCreate, CaseOut, CaseUpdateStatus
+from app.schemas.case import CaseCreate, CaseFeeSummary, CaseListPage, CaseOut, CaseUpdateStatus, CaseWorkspaceOut
+from app.schemas.retainer import RetainerSummary
 from app.models.case import Case
+from app.models.enums import CaseStatus, CaseType
 from app.services import cases as case_service
+from app.services.balances import get_case_balances
+from app.services.fees import get_fee_summaries_for_cases
 
 router = APIRouter()
 
+EMPTY_FEE_SUMMARY = {
+    "highest_court_stage": None,
+    "latest_event_type": None,
+    "fee_event_count": 0,
+    "fees_total_ils_gross": Decimal("0.00"),
+    "fees_due_cash_total_ils_gross": Decimal("0.00"),
+}
+
 
-@router.get("/", response_model=list[CaseOut])
-def list_cases(db: Session = Depends(get_db), _=Depends(require_auth)):
-    items = case_service.list_cases(db)
-    return [CaseOut(**case_service.to_case_out(db, c)) for c in items]
+@router.get("/", response_model=CaseListPage)
+def list_cases(
+    limit: int = Query(default=100, ge=1, le=500),
+    cursor: str | None = Query(default=None),
+    order: str = Query(default="desc", pattern="^(asc|desc)$"),
+    status: CaseStatus | None = Query(default=None),
+    case_type: CaseType | None = Query(default=None),
+    branch_name: str | None = Query(default=None),
+    payer_status: str | None = Query(default=None, pattern="^(client|insurer|closed)$"),
+    open_date_from: dt.date | None = Query(default=None),
+    open_date_to: dt.date | None = Query(default=None),
+    search: str | None = Query(default=None, max_length=200),  # case reference, name or id
+    include: str | None = Query(default=None),  # comma-separated: fee_summary
+    db: Session = Depends(get_db),
+    _=Depends(require_auth),
+):
+    items, next_cursor = case_service.list_cases(
+        db,
+        limit=limit,
+        cursor=cursor,
+        order=order,
+        status_value=status,
+        case_type=case_type,
+        branch_name=branch_name,
+        payer_status=payer_status,
+        open_date_from=open_date_from,
+        open_date_to=open_date_to,
+        search=search,
+    )
+    balances = get_case_balances(db, items)
+    out = [
+        CaseOut(**case_service.to_case_out(db, c, excess_remaining=balances[c.id].excess_remaining_ils_gross))
+        for c in items
+    ]
+    includes = {p.strip() for p in (include or "").split(",") if p.strip()}
+    if "fee_summary" in includes:
+        summaries = get_fee_summaries_for_cases(db, [c.id for c in items])
+        for row in out:
+            row.fee_summary = CaseFeeSummary(**summaries.get(row.id, EMPTY_FEE_SUMMARY))
+    return CaseListPage(items=out, next_cursor=next_cursor)
 
 
 @router.get("/{case_id}", response_model=CaseOut)
@@ -28,6 +79,23 @@ def get_case(case_id: int, db: Session = Depends(get_db), _=Depends(require_auth
     return CaseOut(**case_service.to_case_out(db, c))
 
 
+@router.get("/{case_id}/workspace", response_model=CaseWorkspaceOut)
+def get_case_workspace(case_id: int, db: Session = Depends(get_db), _=Depends(require_auth)):
+    from app.api.routes.expenses import _to_out as expense_out
+    from app.api.routes.fee_events import _to_out as fee_event_out
+    from app.api.routes.retainers import _accrual_out, _payment_out
+
+    ws = case_service.get_case_workspace(db, case_id=case_id)
+    return CaseWorkspaceOut(
+        case=CaseOut(**ws["case"]),
+        expenses=[expense_out(e) for e in ws["expenses"]],
+        fee_events=[fee_event_out(e) for e in ws["fee_events"]],
+        retainer_summary=RetainerSummary(**ws["retainer_summary"]),
+        retainer_accruals=[_accrual_out(a) for a in ws["retainer_accruals"]],
+        retainer_payments=[_payment_out(p) for p in ws["retainer_payments"]],
+    )
+
+
 @router.post("/", response_model=CaseOut)
 def create_case(
     payload: CaseCreate, db: Session = Depends(get_db), user=Depends(require_auth)
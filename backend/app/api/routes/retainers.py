@@ -60,12 +60,13 @@ def add_payment(
 ):
     p = RetainerPayment(case_id=case_id, payment_date=payload.payment_date, amount_ils_gross=payload.amount_ils_gross)
     db.add(p)
+    db.flush()
+    # Payment, accrual allocation, fee credit, balance and alerts land in one commit.
+    retainer_service.allocate_payments_to_accruals(db, case_id=case_id, new_payment_ils_gross=p.amount_ils_gross)
+    fee_service.apply_retainer_credit(db, case_id=case_id)
     db.commit()
     db.refresh(p)
 
-    retainer_service.allocate_payments_to_accruals(db, case_id=case_id)
-    fee_service.apply_retainer_credit(db, case_id=case_id)
-
     from app.services.activity_log import log_activity
     log_activity(db, action="retainer_payment_add", entity_type="retainer_payment", entity_id=p.id, user_id=user.id, details={"case_id": case_id})
 
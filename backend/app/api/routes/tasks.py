@@ -5,18 +5,62 @@ from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.db.session import get_db
+from app.models.task_run import TaskRun
 from app.services.alerts import run_daily_alerts
+from app.services.email import deliver_outbox, deliver_outbox_recorded
+from app.services.task_runs import TaskRunRecorder, enqueue_task_run, task_run_out
 
 router = APIRouter()
 
 
-@router.post("/daily")
+def _check_token(x_tasks_token: str | None) -> None:
+    if x_tasks_token != settings.tasks_daily_secret:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid tasks token")
+
+
+def daily_job(db: Session, recorder: TaskRunRecorder, *, full: bool = False) -> dict:
+    """Roll-forward + alerts, then drain the outbox they filled (same background run)."""
+    result = run_daily_alerts(db, full=full, recorder=recorder)
+    with recorder.phase("email_delivery") as p:
+        stats = deliver_outbox(db)
+        p.rows_scanned, p.rows_written = stats["attempted"], stats["sent"]
+    return {**result, "emails": stats}
+
+
+@router.post("/daily", status_code=status.HTTP_202_ACCEPTED)
 def daily_tasks(
+    full: bool = False,
     db: Session = Depends(get_db),
     x_tasks_token: str | None = Header(default=None),
 ):
-    if x_tasks_token != settings.tasks_daily_secret:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid tasks token")
-    return run_daily_alerts(db)
+    """
+    Queue the daily run and return its job id at once; poll GET /tasks/daily/{job_id}.
+    While a run is queued or running, the same job id is returned (a retried cron call never overlaps it).
+    """
+    _check_token(x_tasks_token)
+    run, _ = enqueue_task_run(db, "daily", lambda job_db, recorder: daily_job(job_db, recorder, full=full))
+    return {"ok": True, "job_id": run.id, "status": run.status}
 
 
+@router.get("/daily/{job_id}")
+def daily_task_status(
+    job_id: int,
+    db: Session = Depends(get_db),
+    x_tasks_token: str | None = Header(default=None),
+):
+    """Status, completed phases and (once finished) the run's counters or error."""
+    _check_token(x_tasks_token)
+    run = db.get(TaskRun, job_id)
+    if run is None or run.task != "daily":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return task_run_out(run)
+
+
+@router.post("/email")
+def email_tasks(
+    db: Session = Depends(get_db),
+    x_tasks_token: str | None = Header(default=None),
+):
+    """Drain the email outbox (one SMTP session, capped per run). Safe to call from cron as often as needed."""
+    _check_token(x_tasks_token)
+    return deliver_outbox_recorded(db)
@@ -47,6 +47,12 @@ class Settings(BaseSettings):
     # Alerts
     deductible_near_pct: float = Field(default=0.10)
     deductible_near_abs_ils: int = Field(default=20000)
+    # Re-evaluate every open case and unpaid accrual on each daily run instead of only what changed
+    # since the last run (POST /tasks/daily?full=true does the same for a single run).
+    alerts_full_evaluation: bool = Field(default=False)
+
+    # Analytics: per-process result cache (serialized JSON), evicted LRU beyond this many bytes.
+    analytics_cache_max_bytes: int = Field(default=32 * 1024 * 1024)
 
     # Email (MVP: if not set, we log instead of sending)
     smtp_host: str | None = Field(default=None)
@@ -55,6 +61,16 @@ class Settings(BaseSettings):
     smtp_password: str | None = Field(default=None)
     smtp_from: str | None = Field(default=None)
     alert_email_recipients: list[str] = Field(default_factory=list)
+    # Notification types (comma-separated, or *) emailed as one daily digest per recipient instead of
+    # one message per alert. Empty: every alert is emailed immediately.
+    alert_email_digest_types: Annotated[list[str], NoDecode] = Field(default_factory=list)
+
+    # Email outbox worker: messages per run, messages per commit, attempts before a row is marked failed,
+    # and the first retry delay (doubles on each further attempt).
+    email_outbox_max_per_run: int = Field(default=200)
+    email_outbox_batch_size: int = Field(default=50)
+    email_max_attempts: int = Field(default=5)
+    email_retry_base_seconds: int = Field(default=60)
 
     # Optional absolute external URL (for email links).
     public_app_url: AnyUrl | None = Field(default=None)
@@ -83,6 +99,13 @@ class Settings(BaseSettings):
             return [str(x).strip() for x in v if str(x).strip()]
         return v
 
+    @field_validator("alert_email_digest_types", mode="before")
+    @classmethod
+    def _parse_digest_types(cls, v):  # noqa: ANN001
+        if isinstance(v, str):
+            return [p.strip().upper() for p in v.split(",") if p.strip()]
+        return v
+
     @field_validator("cors_origins", mode="after")
     @classmethod
     def _ensure_cors_origins(cls, v: list[str] | None, info) -> list[str]:  # noqa: ANN001
@@ -1,11 +1,17 @@
 from app.models.activity_log import ActivityLog  # noqa: F401
 from app.models.case import Case  # noqa: F401
+from app.models.case_balance import CaseBalance  # noqa: F401
+from app.models.data_version import DataVersion  # noqa: F401
+from app.models.email_outbox import EmailOutbox  # noqa: F401
 from app.models.expense import Expense  # noqa: F401
+from app.models.expense_rollup import ExpenseRollupMonthly  # noqa: F401
 from app.models.fee_event import FeeEvent  # noqa: F401
 from app.models.fx_cache import FxRateCache  # noqa: F401
-from app.models.notification import AlertEvent, Notification  # noqa: F401
+from app.models.notification import AlertEvent, AlertWatermark, Notification  # noqa: F401
 from app.models.backup import BackupRecord  # noqa: F401
 from app.models.retainer import RetainerAccrual, RetainerPayment  # noqa: F401
+from app.models.task_run import TaskLock, TaskRun  # noqa: F401
 from app.models.user import User  # noqa: F401
+from app.models.vat_period import VatPeriod  # noqa: F401
 
 
@@ -3,7 +3,7 @@ from __future__ import annotations
 import datetime as dt
 from decimal import Decimal
 
-from sqlalchemy import Boolean, Date, DateTime, Enum, Integer, JSON, Numeric, String, func
+from sqlalchemy import Boolean, Date, DateTime, Enum, Index, Integer, JSON, Numeric, String, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.session import Base
@@ -12,6 +12,14 @@ from app.models.enums import CaseStatus, CaseType
 
 class Case(Base):
     __tablename__ = "cases"
+    # Keyset listing (services/cases.list_cases): every filter prefix ends in (open_date, id).
+    __table_args__ = (
+        Index("ix_cases_open_date_id", "open_date", "id"),
+        Index("ix_cases_status_open_date_id", "status", "open_date", "id"),
+        Index("ix_cases_payer_open_date_id", "status", "insurer_started", "open_date", "id"),
+        Index("ix_cases_case_type_open_date_id", "case_type", "open_date", "id"),
+        Index("ix_cases_branch_open_date_id", "branch_name", "open_date", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
@@ -45,6 +53,10 @@ class Case(Base):
     historical_fee_stages: Mapped[list[str] | None] = mapped_column(JSON, nullable=True)
 
     created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Bumped on any change to the row (status, insurer start, ...); incremental alert runs key on it.
+    updated_at: Mapped[dt.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
 
     expenses = relationship("Expense", back_populates="case", cascade="all, delete-orphan")
     retainer_accruals = relationship("RetainerAccrual", back_populates="case", cascade="all, delete-orphan")
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import datetime as dt
+from decimal import Decimal
+
+from sqlalchemy import Date, DateTime, ForeignKey, Numeric, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app.db.session import Base
+
+
+class CaseBalance(Base):
+    """
+    Materialized per-case money totals (one row per case).
+
+    Kept current by the write paths (expenses, retainer payments/accruals, fee events) inside the
+    same transaction, see services/balances.py. Can always be rebuilt from the raw rows.
+    """
+
+    __tablename__ = "case_balances"
+
+    case_id: Mapped[int] = mapped_column(ForeignKey("cases.id", ondelete="CASCADE"), primary_key=True)
+
+    deductible_consumed_ils_gross: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)  # expenses on CLIENT_DEDUCTIBLE
+    retainer_paid_total_ils_gross: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)
+    retainer_accrued_total_ils_gross: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)
+    fee_credit_applied_ils_gross: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)
+    fees_due_total_ils_gross: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)
+    excess_remaining_ils_gross: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)  # Excel P = M - J
+
+    # Retainer payment allocation state (services/retainer.allocate_payments_to_accruals): last month of
+    # the fully paid prefix, payments not yet allocated to an accrual, and the payments total this
+    # describes. A null total means unknown: the next payment reallocates every accrual.
+    retainer_paid_through_month: Mapped[dt.date | None] = mapped_column(Date, nullable=True)
+    retainer_unallocated_ils_gross: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)
+    retainer_allocated_payments_ils_gross: Mapped[Decimal | None] = mapped_column(Numeric(14, 2), nullable=True)
+
+    updated_at: Mapped[dt.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    case = relationship("Case", backref="balance")
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from sqlalchemy import BigInteger, Connection, Integer, event, insert, select, update
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from app.db.session import Base
+
+
+class DataVersion(Base):
+    """
+    Version counters, one per row. DATA_VERSION_ID is bumped after every committed write to case money
+    data (see listeners below); readers key derived results (e.g. the analytics cache, ETags) on it.
+    VAT_PERIODS_VERSION_ID is bumped after a committed change to vat_periods only.
+    """
+
+    __tablename__ = "data_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)  # DATA_VERSION_ID / VAT_PERIODS_VERSION_ID
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
+# Tables whose contents feed analytics; a write to any of them invalidates derived results.
+VERSIONED_TABLES = frozenset(
+    {
+        "cases",
+        "expenses",
+        "expense_rollup_monthly",
+        "fee_events",
+        "retainer_accruals",
+        "retainer_payments",
+        "case_balances",
+        "vat_periods",
+    }
+)
+
+
+# Counter rows: DATA_VERSION_ID covers VERSIONED_TABLES; VAT_PERIODS_VERSION_ID only vat_periods
+# (bumped by services/retainer_schedule.py, keys its VAT table cache).
+DATA_VERSION_ID = 1
+VAT_PERIODS_VERSION_ID = 2
+
+
+def current_data_version(db: Session, version_id: int = DATA_VERSION_ID) -> int:
+    return int(db.execute(select(DataVersion.version).where(DataVersion.id == version_id)).scalar() or 0)
+
+
+def bump_data_version(conn: Connection, version_id: int = DATA_VERSION_ID) -> None:
+    """Increment the counter on `conn` (the caller commits)."""
+    table = DataVersion.__table__
+    result = conn.execute(update(table).where(table.c.id == version_id).values(version=table.c.version + 1))
+    if result.rowcount == 0:
+        conn.execute(insert(table).values(id=version_id, version=1))
+
+
+def bump_data_version_after_commit(session: Session, version_id: int = DATA_VERSION_ID) -> None:
+    """For after_commit listeners: the bump in its own short transaction on a separate connection."""
+    bind = session.get_bind()
+    engine = bind.engine if isinstance(bind, Connection) else bind
+    with engine.connect() as conn:
+        bump_data_version(conn, version_id)
+        conn.commit()
+
+
+# Writers only mark their session here; the bump itself runs after their commit, in its own short
+# transaction on a separate connection, so the single data_version row is never locked for the
+# length of a writer's transaction (bulk roll-forward, re-pricing, the daily alert run).
+# Readers key results on the version read before computing, so a result stored under the old
+# version between the data commit and the bump is only ever fresher than its key.
+_PENDING = "data_version_pending"
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_on_flush(session: Session, flush_context) -> None:  # noqa: ANN001
+    touched = [*session.new, *session.deleted, *(o for o in session.dirty if session.is_modified(o))]
+    if any(getattr(o, "__tablename__", None) in VERSIONED_TABLES for o in touched):
+        session.info[_PENDING] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_on_bulk_statement(orm_execute_state) -> None:  # noqa: ANN001
+    # Bulk INSERT/UPDATE/DELETE (e.g. db.query(Case).delete()) bypasses the flush.
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.local_table.name in VERSIONED_TABLES:
+        orm_execute_state.session.info[_PENDING] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_after_commit(session: Session) -> None:
+    if session.info.pop(_PENDING, False):
+        bump_data_version_after_commit(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING, None)
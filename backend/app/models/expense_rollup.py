@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import datetime as dt
+from decimal import Decimal
+
+from sqlalchemy import Date, Enum, ForeignKey, Integer, Numeric
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+from app.models.enums import ExpenseCategory, ExpensePayer
+
+
+class ExpenseRollupMonthly(Base):
+    """
+    Monthly expense totals per (case, month, payer, category).
+
+    Updated by add_expense in the same transaction as the expense rows (see services/expense_rollup.py);
+    rebuildable from the expenses table at any time.
+    """
+
+    __tablename__ = "expense_rollup_monthly"
+
+    case_id: Mapped[int] = mapped_column(ForeignKey("cases.id", ondelete="CASCADE"), primary_key=True)
+    month: Mapped[dt.date] = mapped_column(Date, primary_key=True)  # first day of the month
+    payer: Mapped[ExpensePayer] = mapped_column(Enum(ExpensePayer), primary_key=True)
+    category: Mapped[ExpenseCategory] = mapped_column(Enum(ExpenseCategory), primary_key=True)
+
+    total_ils_gross: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)
+    expense_count: Mapped[int] = mapped_column(Integer, default=0)
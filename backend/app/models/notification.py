@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import datetime as dt
 
-from sqlalchemy import DateTime, Enum, ForeignKey, Integer, String, Text, func
+from sqlalchemy import Date, DateTime, Enum, ForeignKey, Index, Integer, String, Text, UniqueConstraint, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.session import Base
@@ -11,6 +11,9 @@ from app.models.enums import NotificationType
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_email_digest_pending", "id", postgresql_where=text("email_digest_pending")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     case_id: Mapped[int] = mapped_column(ForeignKey("cases.id", ondelete="SET NULL"), nullable=True, index=True)
@@ -21,15 +24,19 @@ class Notification(Base):
     severity: Mapped[str] = mapped_column(String(20), default="info")  # info|warning|danger
 
     is_read: Mapped[bool] = mapped_column(default=False)
+    # Recorded on a write path while its type is emailed as a digest: included in the next daily digest.
+    email_digest_pending: Mapped[bool] = mapped_column(default=False)
     created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
 
 
 class AlertEvent(Base):
     """
     Used to dedupe email alerts (e.g., insurer started paying should notify once).
+    (type, key) is unique: recording an alert is an insert-or-ignore, see services/alerts.record_alerts.
     """
 
     __tablename__ = "alert_events"
+    __table_args__ = (UniqueConstraint("type", "key", name="uq_alert_events_type_key"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     case_id: Mapped[int] = mapped_column(ForeignKey("cases.id", ondelete="CASCADE"), nullable=True, index=True)
@@ -39,3 +46,15 @@ class AlertEvent(Base):
     last_sent_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
+class AlertWatermark(Base):
+    """
+    Last evaluation of one alert type (see services/alerts.run_daily_alerts): incremental runs only
+    re-check cases and accruals that changed since evaluated_at, plus accruals whose due date moved
+    into the window since evaluated_for.
+    """
+
+    __tablename__ = "alert_watermarks"
+
+    type: Mapped[NotificationType] = mapped_column(Enum(NotificationType), primary_key=True)
+    evaluated_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True))
+    evaluated_for: Mapped[dt.date] = mapped_column(Date)  # the run's "today"
@@ -3,7 +3,7 @@ from __future__ import annotations
 import datetime as dt
 from decimal import Decimal
 
-from sqlalchemy import Boolean, Date, DateTime, ForeignKey, Integer, Numeric, func
+from sqlalchemy import Boolean, Date, DateTime, ForeignKey, Index, Integer, Numeric, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.session import Base
@@ -17,6 +17,18 @@ class RetainerAccrual(Base):
     """
 
     __tablename__ = "retainer_accruals"
+    # Retainer alert windows (services/alerts._retainer_alerts): range scans over unpaid accruals by due date.
+    # Aging report (services/analytics.compute_retainer_aging): unpaid rows only, covering the columns it
+    # aggregates so Postgres answers from the index alone.
+    __table_args__ = (
+        Index("ix_retainer_accruals_is_paid_due_date", "is_paid", "due_date"),
+        Index(
+            "ix_retainer_accruals_unpaid_aging",
+            "due_date",
+            postgresql_where=text("NOT is_paid"),
+            postgresql_include=["case_id", "amount_ils_gross"],
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     case_id: Mapped[int] = mapped_column(ForeignKey("cases.id", ondelete="CASCADE"), index=True)
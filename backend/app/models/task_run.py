@@ -0,0 +1,43 @@
+"""History of scheduled task runs (/tasks/daily, /tasks/email) with per-phase timings."""
+
+from __future__ import annotations
+
+import datetime as dt
+
+from sqlalchemy import DateTime, Index, Integer, JSON, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+
+
+class TaskRun(Base):
+    __tablename__ = "task_runs"
+    __table_args__ = (Index("ix_task_runs_task_status", "task", "status"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    task: Mapped[str] = mapped_column(String(50))  # daily | email
+    status: Mapped[str] = mapped_column(String(20), default="running")  # queued|running|succeeded|failed|skipped
+
+    queued_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    started_at: Mapped[dt.datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[dt.datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    duration_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    # [{"name", "duration_ms", "rows_scanned", "rows_written", "queries"}, ...] in execution order.
+    phases: Mapped[list[dict] | None] = mapped_column(JSON, nullable=True)
+    rows_scanned: Mapped[int] = mapped_column(Integer, default=0)
+    rows_written: Mapped[int] = mapped_column(Integer, default=0)
+    queries: Mapped[int] = mapped_column(Integer, default=0)
+
+    result: Mapped[dict | None] = mapped_column(JSON, nullable=True)  # the task's return value
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+
+class TaskLock(Base):
+    """At most one holder per task name; used where Postgres advisory locks are unavailable (SQLite)."""
+
+    __tablename__ = "task_locks"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    run_id: Mapped[int] = mapped_column(Integer)
+    acquired_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True))
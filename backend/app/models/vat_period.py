@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import datetime as dt
+from decimal import Decimal
+
+from sqlalchemy import Date, DateTime, Numeric, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+
+
+class VatPeriod(Base):
+    """VAT rate in force from start_month (first of month) until the next row's start_month."""
+
+    __tablename__ = "vat_periods"
+
+    start_month: Mapped[dt.date] = mapped_column(Date, primary_key=True)
+    rate: Mapped[Decimal] = mapped_column(Numeric(6, 4))  # 0.18 = 18%
+
+    updated_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -53,3 +53,46 @@ class AnalyticsOverviewResponse(BaseModel):
     yearly: list[TimeSeriesPoint]
 
 
+
+
+class RetainerAgingBucket(BaseModel):
+    bucket: str  # 0-30 | 31-60 | 61-90 | 90+ (days past due_date)
+    outstanding_ils_gross: Decimal
+    case_count: int
+    accrual_count: int
+
+
+class RetainerAgingRow(RetainerAgingBucket):
+    branch_name: str | None
+    case_type: CaseType
+
+
+class RetainerAgingResponse(BaseModel):
+    as_of: dt.date
+    total_outstanding_ils_gross: Decimal
+    buckets: list[RetainerAgingBucket]  # all four, portfolio-wide
+    rows: list[RetainerAgingRow]  # per branch, case type and bucket (non-empty only)
+
+
+class RetainerProjectionBranch(BaseModel):
+    branch_name: str | None
+    case_count: int
+    invoiced_ils_gross: Decimal
+    cash_due_ils_gross: Decimal
+
+
+class RetainerProjectionMonth(BaseModel):
+    month: dt.date  # accrual / invoice month
+    due_date: dt.date
+    case_count: int
+    invoiced_ils_gross: Decimal
+    covered_by_credit_ils_gross: Decimal  # prepaid retainer (payments beyond what has accrued)
+    cash_due_ils_gross: Decimal
+    branches: list[RetainerProjectionBranch]
+
+
+class RetainerProjectionResponse(BaseModel):
+    from_month: dt.date
+    months: list[RetainerProjectionMonth]
+    total_invoiced_ils_gross: Decimal
+    total_cash_due_ils_gross: Decimal
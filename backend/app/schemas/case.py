@@ -5,7 +5,10 @@ from decimal import Decimal
 
 from pydantic import BaseModel, Field
 
-from app.models.enums import CaseStatus, CaseType
+from app.models.enums import CaseStatus, CaseType, FeeEventType
+from app.schemas.expense import ExpenseOut
+from app.schemas.fee_event import FeeEventOut
+from app.schemas.retainer import RetainerAccrualOut, RetainerPaymentOut, RetainerSummary
 
 
 class CaseCreate(BaseModel):
@@ -28,6 +31,14 @@ class CaseCreate(BaseModel):
     expenses_snapshot_ils_gross: Decimal | None = Field(default=None, ge=0)  # Excel I: historical non-attorney expenses
 
 
+class CaseFeeSummary(BaseModel):
+    highest_court_stage: int | None  # 1..5, None when no court stage event
+    latest_event_type: FeeEventType | None  # most recent event (event_date, then id)
+    fee_event_count: int
+    fees_total_ils_gross: Decimal
+    fees_due_cash_total_ils_gross: Decimal
+
+
 class CaseOut(BaseModel):
     id: int
     case_reference: str
@@ -52,6 +63,23 @@ class CaseOut(BaseModel):
     expenses_snapshot_ils_gross: Decimal | None
     historical_fee_stages: list[str]  # FeeEventType codes, read-only
     excess_remaining_ils_gross: Decimal  # Excel P = M - J
+    fee_summary: CaseFeeSummary | None = None  # only with GET /cases/?include=fee_summary
+
+
+class CaseListPage(BaseModel):
+    items: list[CaseOut]
+    next_cursor: str | None  # pass back as ?cursor= for the next page; None on the last page
+
+
+class CaseWorkspaceOut(BaseModel):
+    """GET /cases/{id}/workspace: everything the case page shows, in one response."""
+
+    case: CaseOut
+    expenses: list[ExpenseOut]
+    fee_events: list[FeeEventOut]
+    retainer_summary: RetainerSummary
+    retainer_accruals: list[RetainerAccrualOut]
+    retainer_payments: list[RetainerPaymentOut]
 
 
 class CaseUpdateStatus(BaseModel):
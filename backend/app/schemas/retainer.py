@@ -32,5 +32,18 @@ class RetainerSummary(BaseModel):
     retainer_applied_to_fees_total_ils_gross: Decimal
     retainer_credit_balance_ils_gross: Decimal
     fees_due_total_ils_gross: Decimal
+    # Accrued months not yet covered by payments (oldest first), and the due date of the first of them
+    # (or of the next month to accrue when all are paid). None: no schedule (snapshot without through-month).
+    months_outstanding: int = 0
+    next_due_date: dt.date | None = None
 
 
+
+
+class VatPeriodSet(BaseModel):
+    rate: Decimal = Field(ge=0, lt=1)  # 0.18 = 18%
+
+
+class VatPeriodOut(BaseModel):
+    start_month: dt.date
+    rate: Decimal
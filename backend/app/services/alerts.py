@@ -2,104 +2,384 @@ from __future__ import annotations
 
 import datetime as dt
 import logging
+from dataclasses import dataclass
 from decimal import Decimal
 
+from sqlalchemy import String, and_, cast, exists, insert, literal, or_, select, union
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.models.case import Case
+from app.models.case_balance import CaseBalance
 from app.models.enums import CaseStatus, NotificationType
-from app.models.notification import AlertEvent, Notification
+from app.models.notification import AlertEvent, AlertWatermark, Notification
 from app.models.retainer import RetainerAccrual
+from app.services.balances import get_case_balances
 from app.services.deductible import q_ils
-from app.services.email import send_email
-from app.services.expenses import get_case_excess_remaining
+from app.services.email import enqueue_email
 from app.services.retainer import ensure_all_cases_accruals_up_to_now
+from app.services.task_runs import TaskRunRecorder
 
 
-def _has_alert(db: Session, *, type_: NotificationType, key: str) -> bool:
-    return db.query(AlertEvent).filter(AlertEvent.type == type_, AlertEvent.key == key).first() is not None
+@dataclass(frozen=True)
+class PendingAlert:
+    """One alert to record (Notification + AlertEvent) and email, keyed for dedupe by (type, key)."""
 
+    type: NotificationType
+    key: str
+    case_id: int | None
+    title: str
+    message: str
+    severity: str
 
-def _mark_alert(db: Session, *, type_: NotificationType, key: str, case_id: int | None = None) -> None:
-    db.add(AlertEvent(type=type_, key=key, case_id=case_id))
-    db.commit()
 
+# Incremental runs re-check rows changed since (watermark - overlap), so a write transaction that
+# started before the previous run and committed after it is still picked up. Re-checks are free:
+# already recorded alerts conflict on (type, key).
+WATERMARK_OVERLAP = dt.timedelta(minutes=10)
 
-def _create_notification(db: Session, *, type_: NotificationType, title: str, message: str, severity: str, case_id: int | None) -> None:
-    db.add(Notification(type=type_, title=title, message=message, severity=severity, case_id=case_id))
-    db.commit()
 
+@dataclass(frozen=True)
+class Watermark:
+    """Where the previous evaluation of an alert type left off."""
 
-def run_daily_alerts(db: Session) -> dict:
-    logger = logging.getLogger(__name__)
-    today = dt.date.today()
-    due_soon_until = today + dt.timedelta(days=7)
+    changed_since: dt.datetime  # evaluated_at - WATERMARK_OVERLAP
+    evaluated_for: dt.date
 
-    # Retainer roll-forward: ensure open cases (no snapshot) have accruals up to current month
-    cases_scanned, accruals_added = ensure_all_cases_accruals_up_to_now(db)
-    logger.info("daily_alerts: retainer_roll_forward done cases_scanned=%d accruals_added=%d", cases_scanned, accruals_added)
 
-    sent = 0
+def _load_watermark(db: Session, types: tuple[NotificationType, ...]) -> Watermark | None:
+    """The oldest watermark among types; None (full evaluation) if any type was never evaluated."""
+    rows = db.query(AlertWatermark).filter(AlertWatermark.type.in_(types)).all()
+    if len(rows) < len(types):
+        return None
+    return Watermark(
+        changed_since=min(r.evaluated_at for r in rows) - WATERMARK_OVERLAP,
+        evaluated_for=min(r.evaluated_for for r in rows),
+    )
+
+
+def _save_watermarks(db: Session, *, now: dt.datetime, today: dt.date) -> None:
+    existing = {w.type: w for w in db.query(AlertWatermark).all()}
+    for type_ in NotificationType:
+        w = existing.get(type_)
+        if w is None:
+            db.add(AlertWatermark(type=type_, evaluated_at=now, evaluated_for=today))
+        else:
+            w.evaluated_at, w.evaluated_for = now, today
+
 
-    # Insurer started paying (once per case)
-    insurer_cases = (
-        db.query(Case)
+def _changed_case_ids(since: dt.datetime):  # noqa: ANN202
+    """Cases whose row or money totals (expenses, payments, accruals, fee credit) changed since `since`."""
+    return union(
+        select(Case.id).where(Case.updated_at >= since),
+        select(CaseBalance.case_id).where(CaseBalance.updated_at >= since),
+    )
+
+
+def _insurer_started_alert(case_id: int, reference: str, start_date: dt.date) -> PendingAlert:
+    return PendingAlert(
+        type=NotificationType.INSURER_STARTED_PAYING,
+        key=f"case:{case_id}:insurer_started",
+        case_id=case_id,
+        title="המבטח התחיל לשלם",
+        message=f"בתיק '{reference}' המבטח התחיל לשלם החל מתאריך {start_date}.",
+        severity="info",
+    )
+
+
+def _deductible_near_alert(case: Case, excess_remaining: Decimal) -> PendingAlert | None:
+    """Excess near exhaustion — Excel P = M - J below deductible_near_pct of the deductible or deductible_near_abs_ils."""
+    remaining = q_ils(Decimal(str(excess_remaining)))
+    pct_threshold = q_ils(Decimal(str(case.deductible_ils_gross)) * Decimal(str(settings.deductible_near_pct)))
+    abs_threshold = q_ils(Decimal(str(settings.deductible_near_abs_ils)))
+    if not (remaining < pct_threshold or remaining < abs_threshold):
+        return None
+    return PendingAlert(
+        type=NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION,
+        key=f"case:{case.id}:deductible_near",
+        case_id=case.id,
+        title="השתתפות עצמית קרובה לסיום",
+        message=f"בתיק '{case.case_reference}' נותרו {remaining} ₪ (כולל מע\"מ) מתוך {case.deductible_ils_gross} ₪.",
+        severity="warning",
+    )
+
+
+def _insurer_started_alerts(db: Session) -> list[PendingAlert]:
+    """Insurer started paying (once per case): full scan of open cases."""
+    rows = (
+        db.query(Case.id, Case.case_reference, Case.insurer_start_date)
         .filter(Case.status == CaseStatus.OPEN, Case.insurer_started.is_(True), Case.insurer_start_date.isnot(None))
         .all()
     )
-    for c in insurer_cases:
-        key = f"case:{c.id}:insurer_started"
-        if _has_alert(db, type_=NotificationType.INSURER_STARTED_PAYING, key=key):
-            continue
-        title = "המבטח התחיל לשלם"
-        msg = f"בתיק '{c.case_reference}' המבטח התחיל לשלם החל מתאריך {c.insurer_start_date}."
-        _create_notification(db, type_=NotificationType.INSURER_STARTED_PAYING, title=title, message=msg, severity="info", case_id=c.id)
-        send_email(subject=title, body=msg, recipients=settings.alert_email_recipients)
-        _mark_alert(db, type_=NotificationType.INSURER_STARTED_PAYING, key=key, case_id=c.id)
-        sent += 1
-
-    # Excess near exhaustion (once per case) — Excel P = M - J
+    return [_insurer_started_alert(case_id, reference, start_date) for case_id, reference, start_date in rows]
+
+
+def _deductible_near_alerts(db: Session) -> list[PendingAlert]:
+    """Excess near exhaustion (once per case): full scan of open cases."""
     open_cases = db.query(Case).filter(Case.status == CaseStatus.OPEN).all()
-    for c in open_cases:
-        remaining = get_case_excess_remaining(db, c)
-        pct_threshold = q_ils(Decimal(str(c.deductible_ils_gross)) * Decimal(str(settings.deductible_near_pct)))
-        abs_threshold = q_ils(Decimal(str(settings.deductible_near_abs_ils)))
-        is_near = remaining < pct_threshold or remaining < abs_threshold
-        if not is_near:
-            continue
-        key = f"case:{c.id}:deductible_near"
-        if _has_alert(db, type_=NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION, key=key):
+    balances = get_case_balances(db, open_cases)
+    alerts = (_deductible_near_alert(c, balances[c.id].excess_remaining_ils_gross) for c in open_cases)
+    return [a for a in alerts if a is not None]
+
+
+def case_threshold_alerts(case: Case, *, excess_remaining: Decimal) -> list[PendingAlert]:
+    """Insurer-started / deductible-near alerts for one case, from its freshly computed balance."""
+    if case.status != CaseStatus.OPEN:
+        return []
+    out: list[PendingAlert] = []
+    if case.insurer_started and case.insurer_start_date is not None:
+        out.append(_insurer_started_alert(case.id, case.case_reference, case.insurer_start_date))
+    near = _deductible_near_alert(case, excess_remaining)
+    if near is not None:
+        out.append(near)
+    return out
+
+
+def record_case_alerts(db: Session, case: Case, *, balance: CaseBalance) -> list[PendingAlert]:
+    """
+    Write-path evaluation (expenses, retainer payments, reopening a case): record the case's threshold
+    alerts and queue their email inside the caller's transaction, so they go out with the write that
+    crossed the threshold instead of the next nightly run. Digest types wait for the daily digest.
+    Once recorded, a later write costs one conflicting INSERT and nothing else.
+    """
+    new_alerts = record_alerts(db, case_threshold_alerts(case, excess_remaining=balance.excess_remaining_ils_gross), defer_digest=True)
+    queue_alert_emails(db, new_alerts, run_date=dt.date.today(), defer_digest=True)
+    return new_alerts
+
+
+def _not_yet_alerted(type_: NotificationType, suffix: str):  # noqa: ANN202
+    """Anti-join: no alert_events row for this accrual's key (accrual:{id}:{suffix}) yet."""
+    key = literal("accrual:") + cast(RetainerAccrual.id, String) + literal(f":{suffix}")
+    return ~exists().where(AlertEvent.type == type_, AlertEvent.key == key)
+
+
+def _retainer_alerts(db: Session, *, today: dt.date, since: Watermark | None = None) -> list[PendingAlert]:
+    """
+    Retainer due soon / overdue: per unpaid accrual, as two range scans on (is_paid, due_date) —
+    due within the next 7 days, and overdue — each anti-joined against alert_events, so only accruals
+    not alerted yet are loaded (the paid and already alerted backlog stays in the index).
+    Incremental: only accruals whose due date entered either window since the last run, accruals
+    created since, and accruals of cases whose payments changed since.
+    """
+    due_soon_until = today + dt.timedelta(days=7)
+    q = db.query(RetainerAccrual.id, RetainerAccrual.case_id, RetainerAccrual.accrual_month, RetainerAccrual.due_date).filter(
+        RetainerAccrual.is_paid.is_(False)
+    )
+    if since is not None:
+        q = q.filter(
+            or_(
+                RetainerAccrual.due_date > since.evaluated_for + dt.timedelta(days=7),  # now due soon
+                and_(RetainerAccrual.due_date >= since.evaluated_for, RetainerAccrual.due_date < today),  # now overdue
+                RetainerAccrual.created_at >= since.changed_since,
+                RetainerAccrual.case_id.in_(_changed_case_ids(since.changed_since)),
+            )
+        )
+    due_soon = (
+        q.filter(
+            RetainerAccrual.due_date >= today,
+            RetainerAccrual.due_date <= due_soon_until,
+            _not_yet_alerted(NotificationType.RETAINER_DUE_SOON, "due_soon"),
+        )
+        .order_by(RetainerAccrual.id.asc())
+        .all()
+    )
+    overdue = (
+        q.filter(RetainerAccrual.due_date < today, _not_yet_alerted(NotificationType.RETAINER_OVERDUE, "overdue"))
+        .order_by(RetainerAccrual.id.asc())
+        .all()
+    )
+    return [
+        *(
+            PendingAlert(
+                type=NotificationType.RETAINER_DUE_SOON,
+                key=f"accrual:{accrual_id}:due_soon",
+                case_id=case_id,
+                title="תשלום ריטיינר מתקרב",
+                message=f"ריטיינר לחודש {accrual_month:%Y-%m} צפוי לתשלום עד {due_date} (נטו 60).",
+                severity="info",
+            )
+            for accrual_id, case_id, accrual_month, due_date in due_soon
+        ),
+        *(
+            PendingAlert(
+                type=NotificationType.RETAINER_OVERDUE,
+                key=f"accrual:{accrual_id}:overdue",
+                case_id=case_id,
+                title="תשלום ריטיינר באיחור",
+                message=f"ריטיינר לחודש {accrual_month:%Y-%m} היה אמור להיות משולם עד {due_date} (נטו 60).",
+                severity="danger",
+            )
+            for accrual_id, case_id, accrual_month, due_date in overdue
+        ),
+    ]
+
+
+def _insert_ignoring_conflicts(db: Session, model):  # noqa: ANN001, ANN202
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(model).on_conflict_do_nothing(index_elements=["type", "key"])
+
+
+def record_alerts(db: Session, alerts: list[PendingAlert], *, defer_digest: bool = False) -> list[PendingAlert]:
+    """
+    Record alerts that have not been recorded before and return them; others are skipped.
+    Dedupe is the (type, key) unique constraint: one INSERT ... ON CONFLICT DO NOTHING RETURNING
+    claims the keys (safe against overlapping runs), then Notifications are added only for the
+    claimed ones. Runs inside the caller's transaction (flushes, does not commit).
+    defer_digest: digest-type notifications are held for the next daily digest (email_digest_pending).
+    """
+    unique: dict[tuple[NotificationType, str], PendingAlert] = {}
+    for a in alerts:
+        unique.setdefault((a.type, a.key), a)
+    if not unique:
+        return []
+
+    claimed = db.execute(
+        _insert_ignoring_conflicts(db, AlertEvent).returning(AlertEvent.type, AlertEvent.key),
+        [{"type": a.type, "key": a.key, "case_id": a.case_id} for a in unique.values()],
+    ).all()
+    claimed_keys = {(type_, key) for type_, key in claimed}
+    new_alerts = [a for k, a in unique.items() if k in claimed_keys]
+    if new_alerts:
+        db.execute(
+            insert(Notification),
+            [
+                {
+                    "type": a.type,
+                    "title": a.title,
+                    "message": a.message,
+                    "severity": a.severity,
+                    "case_id": a.case_id,
+                    "email_digest_pending": defer_digest and is_digest_type(a.type),
+                }
+                for a in new_alerts
+            ],
+        )
+    db.flush()
+    return new_alerts
+
+
+def is_digest_type(type_: NotificationType) -> bool:
+    digest_types = settings.alert_email_digest_types
+    return "*" in digest_types or type_.value in digest_types
+
+
+def render_digest(alerts: list[PendingAlert], *, run_date: dt.date) -> tuple[str, str]:
+    """(subject, body) of one digest: a section per NotificationType (enum order), alerts ordered by case."""
+    by_type: dict[NotificationType, list[PendingAlert]] = {}
+    for a in alerts:
+        by_type.setdefault(a.type, []).append(a)
+
+    lines = [f"סיכום התראות ליום {run_date:%Y-%m-%d}: {len(alerts)} התראות חדשות."]
+    for type_ in NotificationType:
+        section = sorted(by_type.get(type_, []), key=lambda a: (a.case_id or 0, a.key))
+        if not section:
             continue
-        title = "השתתפות עצמית קרובה לסיום"
-        msg = f"בתיק '{c.case_reference}' נותרו {remaining} ₪ (כולל מע\"מ) מתוך {c.deductible_ils_gross} ₪."
-        _create_notification(db, type_=NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION, title=title, message=msg, severity="warning", case_id=c.id)
-        send_email(subject=title, body=msg, recipients=settings.alert_email_recipients)
-        _mark_alert(db, type_=NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION, key=key, case_id=c.id)
-        sent += 1
-
-    # Retainer due soon / overdue: per accrual
-    accruals = db.query(RetainerAccrual).filter(RetainerAccrual.is_paid.is_(False)).all()
-    for a in accruals:
-        if today <= a.due_date <= due_soon_until:
-            key = f"accrual:{a.id}:due_soon"
-            if not _has_alert(db, type_=NotificationType.RETAINER_DUE_SOON, key=key):
-                title = "תשלום ריטיינר מתקרב"
-                msg = f"ריטיינר לחודש {a.accrual_month:%Y-%m} צפוי לתשלום עד {a.due_date} (נטו 60)."
-                _create_notification(db, type_=NotificationType.RETAINER_DUE_SOON, title=title, message=msg, severity="info", case_id=a.case_id)
-                send_email(subject=title, body=msg, recipients=settings.alert_email_recipients)
-                _mark_alert(db, type_=NotificationType.RETAINER_DUE_SOON, key=key, case_id=a.case_id)
-                sent += 1
-        if a.due_date < today:
-            key = f"accrual:{a.id}:overdue"
-            if not _has_alert(db, type_=NotificationType.RETAINER_OVERDUE, key=key):
-                title = "תשלום ריטיינר באיחור"
-                msg = f"ריטיינר לחודש {a.accrual_month:%Y-%m} היה אמור להיות משולם עד {a.due_date} (נטו 60)."
-                _create_notification(db, type_=NotificationType.RETAINER_OVERDUE, title=title, message=msg, severity="danger", case_id=a.case_id)
-                send_email(subject=title, body=msg, recipients=settings.alert_email_recipients)
-                _mark_alert(db, type_=NotificationType.RETAINER_OVERDUE, key=key, case_id=a.case_id)
-                sent += 1
-
-    return {"ok": True, "sent": sent}
+        lines += ["", f"{section[0].title} ({len(section)})"]
+        lines += [f"- {a.message}" for a in section]
+    return f"סיכום התראות יומי: {len(alerts)} התראות חדשות", "\n".join(lines)
+
+
+def _take_held_digest_alerts(db: Session) -> list[PendingAlert]:
+    """Digest-type alerts recorded on write paths since the last digest; clears their hold."""
+    held = db.query(Notification).filter(Notification.email_digest_pending.is_(True)).order_by(Notification.id.asc()).all()
+    for n in held:
+        n.email_digest_pending = False
+    return [
+        PendingAlert(type=n.type, key=f"notification:{n.id}", case_id=n.case_id, title=n.title, message=n.message, severity=n.severity)
+        for n in held
+    ]
+
+
+def queue_alert_emails(db: Session, alerts: list[PendingAlert], *, run_date: dt.date, defer_digest: bool = False) -> int:
+    """
+    Queue email for newly recorded alerts (inside the caller's transaction). Types listed in
+    alert_email_digest_types are folded into one digest message per recipient, together with those
+    held by write paths (defer_digest=True there: digest types are left for the daily run); the rest
+    get one message each. Returns the number of outbox rows queued.
+    """
+    recipients = settings.alert_email_recipients
+    held = [] if defer_digest else _take_held_digest_alerts(db)
+    if not recipients:
+        return 0
+    digest = [] if defer_digest else [*held, *(a for a in alerts if is_digest_type(a.type))]
+    queued = 0
+    for a in alerts:
+        if not is_digest_type(a.type):
+            enqueue_email(db, subject=a.title, body=a.message, recipients=recipients)
+            queued += 1
+    if digest:
+        subject, body = render_digest(digest, run_date=run_date)
+        for recipient in recipients:
+            enqueue_email(db, subject=subject, body=body, recipients=[recipient])
+            queued += 1
+    return queued
+
 
+def run_daily_alerts(
+    db: Session,
+    *,
+    full: bool = False,
+    today: dt.date | None = None,
+    now: dt.datetime | None = None,
+    recorder: TaskRunRecorder | None = None,
+) -> dict:
+    """
+    Set-based daily pass: collect candidate alerts for every type and record the ones not seen before
+    (notification + queued email) in a single transaction. Delivery is the outbox worker's job.
+    Idempotent: a second run (or an overlapping one) conflicts on every key and records nothing.
 
+    Insurer-started and deductible-near alerts are recorded by the write paths (record_case_alerts), so
+    the nightly run only scans for them with full=True (or alerts_full_evaluation), e.g. after changing
+    the deductible thresholds, or before they were ever evaluated. Retainer alerts are time-driven and
+    incremental: only what changed since the watermark (alert_watermarks) is re-checked.
+    Each phase is timed on recorder (see services/task_runs.py).
+    """
+    logger = logging.getLogger(__name__)
+    today = today or dt.date.today()
+    now = now or dt.datetime.now(dt.timezone.utc)
+    full = full or settings.alerts_full_evaluation
+    recorder = recorder or TaskRunRecorder(db)
+
+    # Retainer roll-forward: ensure open cases (no snapshot) have accruals up to current month
+    with recorder.phase("roll_forward") as p:
+        cases_scanned, accruals_added = ensure_all_cases_accruals_up_to_now(db)
+        p.rows_scanned, p.rows_written = cases_scanned, accruals_added
+    logger.info("daily_alerts: retainer_roll_forward done cases_scanned=%d accruals_added=%d", cases_scanned, accruals_added)
+
+    def since(*types: NotificationType) -> Watermark | None:
+        return None if full else _load_watermark(db, types)
+
+    candidates: list[PendingAlert] = []
+    with recorder.phase("insurer_alerts") as p:
+        if since(NotificationType.INSURER_STARTED_PAYING) is None:
+            found = _insurer_started_alerts(db)
+            p.rows_scanned = len(found)
+            candidates += found
+    with recorder.phase("deductible_alerts") as p:
+        if since(NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION) is None:
+            found = _deductible_near_alerts(db)
+            p.rows_scanned = len(found)
+            candidates += found
+    with recorder.phase("retainer_alerts") as p:
+        found = _retainer_alerts(db, today=today, since=since(NotificationType.RETAINER_DUE_SOON, NotificationType.RETAINER_OVERDUE))
+        p.rows_scanned = len(found)
+        candidates += found
+    with recorder.phase("record_alerts") as p:
+        new_alerts = record_alerts(db, candidates)
+        p.rows_scanned, p.rows_written = len(candidates), len(new_alerts)
+    with recorder.phase("email") as p:
+        queued = queue_alert_emails(db, new_alerts, run_date=today)
+        p.rows_scanned, p.rows_written = len(new_alerts), queued
+        _save_watermarks(db, now=now, today=today)
+        db.commit()
+    logger.info(
+        "daily_alerts: mode=%s candidates=%d new=%d emails_queued=%d",
+        "full" if full else "incremental",
+        len(candidates),
+        len(new_alerts),
+        queued,
+    )
+    return {"ok": True, "sent": len(new_alerts)}
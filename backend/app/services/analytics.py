@@ -0,0 +1,410 @@
+"""Analytics aggregates computed in the database (GROUP BY), not by iterating ORM rows in Python."""
+
+from __future__ import annotations
+
+import datetime as dt
+from decimal import Decimal
+
+from sqlalchemy import and_, false, func
+from sqlalchemy import case as sql_case
+from sqlalchemy.orm import Session
+
+from app.models.case import Case
+from app.models.case_balance import CaseBalance
+from app.models.enums import CaseStatus, CaseType, ExpenseCategory, ExpensePayer
+from app.models.fee_event import FeeEvent
+from app.models.retainer import RetainerAccrual
+from app.schemas.analytics import (
+    AnalyticsOverviewResponse,
+    ExpensesByCaseRow,
+    RetainerAgingBucket,
+    RetainerAgingResponse,
+    RetainerAgingRow,
+    RetainerProjectionBranch,
+    RetainerProjectionMonth,
+    RetainerProjectionResponse,
+    StageDistributionRow,
+    TimeSeriesPoint,
+)
+from app.services.balances import get_case_balances
+from app.services.expense_rollup import expense_facts
+from app.services.fees import COURT_STAGE_NUMBERS
+from app.services.money import div_half_up, from_agorot, to_agorot
+from app.services.retainer_schedule import DUE_AFTER_DAYS, RetainerSchedule, get_vat_table, gross_for_rate
+
+
+def payer_status_of(status: CaseStatus, insurer_started: bool) -> str:
+    if status == CaseStatus.CLOSED:
+        return "closed"
+    return "insurer" if insurer_started else "client"
+
+
+def case_filters(*, case_type: CaseType | None, payer_status: str | None) -> list:
+    """WHERE clauses on Case for the analytics filters (payer_status: client|insurer|closed|all)."""
+    clauses = []
+    if case_type:
+        clauses.append(Case.case_type == case_type)
+    if payer_status and payer_status != "all":
+        if payer_status == "closed":
+            clauses.append(Case.status == CaseStatus.CLOSED)
+        elif payer_status == "insurer":
+            clauses.append(and_(Case.status != CaseStatus.CLOSED, Case.insurer_started.is_(True)))
+        elif payer_status == "client":
+            clauses.append(and_(Case.status != CaseStatus.CLOSED, Case.insurer_started.is_(False)))
+        else:
+            clauses.append(false())
+    return clauses
+
+
+def _empty_overview() -> AnalyticsOverviewResponse:
+    return AnalyticsOverviewResponse(
+        total_expenses_ils_gross=Decimal("0.00"),
+        total_on_deductible_ils_gross=Decimal("0.00"),
+        total_on_insurer_ils_gross=Decimal("0.00"),
+        average_expenses_per_case_ils_gross=Decimal("0.00"),
+        cases_switched_to_insurer_count=0,
+        aggregate_remaining_deductible_open_cases_ils_gross=Decimal("0.00"),
+        expenses_by_case=[],
+        expense_split={"attorney": Decimal("0.00"), "other": Decimal("0.00")},
+        court_cases_end_stage_distribution=[],
+        monthly=[],
+        quarterly=[],
+        yearly=[],
+    )
+
+
+def compute_overview(
+    db: Session,
+    *,
+    start_date: dt.date,
+    end_date: dt.date,
+    case_type: CaseType | None = None,
+    payer_status: str | None = None,
+) -> AnalyticsOverviewResponse:
+    """
+    Overview for the cases matching the filters and their expenses dated within [start_date, end_date].
+    Every total is a grouped aggregate over expense_facts (monthly rollup rows for whole months,
+    raw expenses only for the partial edge months); Python only sees one row per case, payer and month.
+    """
+    filters = case_filters(case_type=case_type, payer_status=payer_status)
+    facts = expense_facts(db, start_date=start_date, end_date=end_date)
+
+    def expenses_q(*columns):  # noqa: ANN001, ANN202
+        return db.query(*columns).select_from(facts).join(Case, Case.id == facts.c.case_id).filter(*filters)
+
+    # Per-case totals (attorney / other split), outer-joined so cases without expenses still get a row.
+    per_case = (
+        expenses_q(
+            facts.c.case_id.label("case_id"),
+            func.sum(facts.c.amount).label("total"),
+            func.sum(sql_case((facts.c.category == ExpenseCategory.ATTORNEY_FEE, facts.c.amount), else_=0)).label("attorney"),
+        )
+        .group_by(facts.c.case_id)
+        .subquery()
+    )
+    case_rows = (
+        db.query(
+            Case.id,
+            Case.case_reference,
+            Case.case_type,
+            Case.status,
+            Case.insurer_started,
+            per_case.c.total,
+            per_case.c.attorney,
+            CaseBalance.excess_remaining_ils_gross,
+        )
+        .outerjoin(per_case, per_case.c.case_id == Case.id)
+        .outerjoin(CaseBalance, CaseBalance.case_id == Case.id)
+        .filter(*filters)
+        .order_by(Case.id)
+        .all()
+    )
+    if not case_rows:
+        return _empty_overview()
+
+    # Cases whose case_balances row is missing (e.g. before the rebuild ran) fall back to a live computation.
+    missing = [row[0] for row in case_rows if row[7] is None]
+    fallback: dict[int, Decimal] = {}
+    if missing:
+        missing_cases = db.query(Case).filter(Case.id.in_(missing)).all()
+        fallback = {cid: b.excess_remaining_ils_gross for cid, b in get_case_balances(db, missing_cases).items()}
+
+    # All money below is integer agorot; Decimals are built only for the response.
+    per_case: list[tuple] = []
+    attorney_total = 0
+    other_total = 0
+    aggregate_remaining = 0
+    for cid, reference, ctype, cstatus, insurer_started, total_case, attorney_case, excess in case_rows:
+        total_case = to_agorot(total_case)
+        attorney_case = to_agorot(attorney_case)
+        other_case = total_case - attorney_case
+        remaining = to_agorot(excess if excess is not None else fallback[cid])
+        attorney_total += attorney_case
+        other_total += other_case
+        if cstatus == CaseStatus.OPEN:
+            aggregate_remaining += remaining
+        per_case.append((total_case, attorney_case, other_case, remaining, cid, reference, ctype, cstatus, insurer_started))
+    per_case.sort(key=lambda r: r[0], reverse=True)
+    expenses_by_case = [
+        ExpensesByCaseRow(
+            case_id=cid,
+            case_reference=reference,
+            case_type=ctype,
+            status=cstatus,
+            payer_status=payer_status_of(cstatus, insurer_started),
+            total_expenses_ils_gross=from_agorot(total_case),
+            attorney_fees_expenses_ils_gross=from_agorot(attorney_case),
+            other_expenses_ils_gross=from_agorot(other_case),
+            deductible_remaining_ils_gross=from_agorot(remaining),
+        )
+        for total_case, attorney_case, other_case, remaining, cid, reference, ctype, cstatus, insurer_started in per_case
+    ]
+
+    by_payer = {
+        payer: to_agorot(amount)
+        for payer, amount in expenses_q(facts.c.payer, func.sum(facts.c.amount)).group_by(facts.c.payer).all()
+    }
+    total = sum(by_payer.values())
+
+    switched = (
+        db.query(func.count(Case.id))
+        .filter(
+            *filters,
+            Case.insurer_started.is_(True),
+            Case.insurer_start_date >= start_date,
+            Case.insurer_start_date <= end_date,
+        )
+        .scalar()
+    )
+
+    # Stage distribution (court only): highest stage event among stages 1..5, counted per stage.
+    stage = sql_case(COURT_STAGE_NUMBERS, value=FeeEvent.event_type, else_=0)
+    highest = (
+        db.query(func.max(stage).label("stage"))
+        .join(Case, Case.id == FeeEvent.case_id)
+        .filter(*filters, Case.case_type == CaseType.COURT, FeeEvent.event_type.in_(list(COURT_STAGE_NUMBERS)))
+        .group_by(FeeEvent.case_id)
+        .subquery()
+    )
+    stage_counts = {s: 0 for s in sorted(COURT_STAGE_NUMBERS.values())}
+    for s, count in db.query(highest.c.stage, func.count()).group_by(highest.c.stage).all():
+        if s in stage_counts:
+            stage_counts[s] = int(count)
+    stage_dist = [StageDistributionRow(stage=s, count=c) for s, c in stage_counts.items()]
+
+    # Time series: months come from the database; quarters and years are rolled up from those rows.
+    monthly_map: dict[str, int] = {}
+    quarterly_map: dict[str, int] = {}
+    yearly_map: dict[str, int] = {}
+    for year, month, amount in (
+        expenses_q(facts.c.year, facts.c.month, func.sum(facts.c.amount)).group_by(facts.c.year, facts.c.month).all()
+    ):
+        year, month, amount = int(year), int(month), to_agorot(amount)
+        for bucket, key in (
+            (monthly_map, f"{year:04d}-{month:02d}"),
+            (quarterly_map, f"{year:04d}-Q{(month - 1) // 3 + 1}"),
+            (yearly_map, f"{year:04d}"),
+        ):
+            bucket[key] = bucket.get(key, 0) + amount
+
+    def series(m: dict[str, int]) -> list[TimeSeriesPoint]:
+        return [TimeSeriesPoint(period=k, total_expenses_ils_gross=from_agorot(v)) for k, v in sorted(m.items())]
+
+    return AnalyticsOverviewResponse(
+        total_expenses_ils_gross=from_agorot(total),
+        total_on_deductible_ils_gross=from_agorot(by_payer.get(ExpensePayer.CLIENT_DEDUCTIBLE, 0)),
+        total_on_insurer_ils_gross=from_agorot(by_payer.get(ExpensePayer.INSURER, 0)),
+        average_expenses_per_case_ils_gross=from_agorot(div_half_up(total, len(case_rows))),
+        cases_switched_to_insurer_count=int(switched or 0),
+        aggregate_remaining_deductible_open_cases_ils_gross=from_agorot(aggregate_remaining),
+        expenses_by_case=expenses_by_case,
+        expense_split={"attorney": from_agorot(attorney_total), "other": from_agorot(other_total)},
+        court_cases_end_stage_distribution=stage_dist,
+        monthly=series(monthly_map),
+        quarterly=series(quarterly_map),
+        yearly=series(yearly_map),
+    )
+
+
+# (label, max days past due) for the aging report; the last bucket is open-ended.
+AGING_BUCKETS: tuple[tuple[str, int | None], ...] = (("0-30", 30), ("31-60", 60), ("61-90", 90), ("90+", None))
+
+
+def compute_retainer_aging(
+    db: Session,
+    *,
+    as_of: dt.date,
+    case_type: CaseType | None = None,
+    payer_status: str | None = None,
+) -> RetainerAgingResponse:
+    """
+    Unpaid retainer accruals past their due_date (due_date < as_of), bucketed by days past due and
+    grouped by branch and case type: one aggregate query over the unpaid-by-due-date index
+    (ix_retainer_accruals_unpaid_aging). The bucket is derived from due_date against cutoff dates, so
+    the scan stays a range over the index.
+    """
+    filters = case_filters(case_type=case_type, payer_status=payer_status)
+    bucket = sql_case(
+        *[
+            (RetainerAccrual.due_date >= as_of - dt.timedelta(days=days), label)
+            for label, days in AGING_BUCKETS
+            if days is not None
+        ],
+        else_=AGING_BUCKETS[-1][0],
+    )
+    # Bucket in a subquery so GROUP BY names a column instead of repeating the parameterized CASE.
+    aged = (
+        db.query(
+            Case.branch_name.label("branch_name"),
+            Case.case_type.label("case_type"),
+            bucket.label("bucket"),
+            RetainerAccrual.case_id.label("case_id"),
+            RetainerAccrual.amount_ils_gross.label("amount"),
+        )
+        .select_from(RetainerAccrual)
+        .join(Case, Case.id == RetainerAccrual.case_id)
+        .filter(RetainerAccrual.is_paid.is_(False), RetainerAccrual.due_date < as_of, *filters)
+        .subquery()
+    )
+    grouped = (
+        db.query(
+            aged.c.branch_name,
+            aged.c.case_type,
+            aged.c.bucket,
+            func.sum(aged.c.amount),
+            func.count(func.distinct(aged.c.case_id)),
+            func.count(),
+        )
+        .group_by(aged.c.branch_name, aged.c.case_type, aged.c.bucket)
+        .all()
+    )
+
+    order = {label: i for i, (label, _days) in enumerate(AGING_BUCKETS)}
+    totals = {label: [0, 0, 0] for label, _days in AGING_BUCKETS}  # agorot, cases, accruals
+    rows: list[RetainerAgingRow] = []
+    for branch_name, ctype, label, amount, cases, accruals in sorted(
+        grouped, key=lambda r: (r[0] or "", r[1].value, order[r[2]])
+    ):
+        amount = to_agorot(amount)
+        # A case has one branch and type, so its group's distinct count adds up across groups.
+        t = totals[label]
+        t[0] += amount
+        t[1] += int(cases)
+        t[2] += int(accruals)
+        rows.append(
+            RetainerAgingRow(
+                branch_name=branch_name,
+                case_type=ctype,
+                bucket=label,
+                outstanding_ils_gross=from_agorot(amount),
+                case_count=int(cases),
+                accrual_count=int(accruals),
+            )
+        )
+
+    return RetainerAgingResponse(
+        as_of=as_of,
+        total_outstanding_ils_gross=from_agorot(sum(t[0] for t in totals.values())),
+        buckets=[
+            RetainerAgingBucket(bucket=label, outstanding_ils_gross=from_agorot(a), case_count=c, accrual_count=n)
+            for label, (a, c, n) in totals.items()
+        ],
+        rows=rows,
+    )
+
+
+def _add_months(d: dt.date, months: int) -> dt.date:
+    i = d.year * 12 + d.month - 1 + months
+    return dt.date(i // 12, i % 12 + 1, 1)
+
+
+def compute_retainer_projection(db: Session, *, months: int = 12, today: dt.date | None = None) -> RetainerProjectionResponse:
+    """
+    Retainer invoices the open cases will accrue over the next `months` months (from next month on),
+    computed from the schedule without writing accrual rows. One query reads the open cases with their
+    paid and accrued totals. Cases without prepaid credit only add to a per-branch count of cases
+    starting in each month; a running sum gives the active cases per month, times that month's gross.
+    Cases with prepaid retainer (paid beyond accrued) have it applied oldest-first, month by month.
+    """
+    today = today or dt.date.today()
+    first = _add_months(dt.date(today.year, today.month, 1), 1)
+    horizon = [_add_months(first, i) for i in range(months)]
+    vat = get_vat_table(db)
+    gross = [to_agorot(gross_for_rate(vat.rate_for(m))) for m in horizon]
+
+    cases = (
+        db.query(
+            Case.branch_name,
+            Case.retainer_anchor_date,
+            Case.retainer_snapshot_ils_gross,
+            Case.retainer_snapshot_through_month,
+            CaseBalance.retainer_paid_total_ils_gross,
+            CaseBalance.retainer_accrued_total_ils_gross,
+        )
+        .outerjoin(CaseBalance, CaseBalance.case_id == Case.id)
+        .filter(Case.status == CaseStatus.OPEN)
+        .all()
+    )
+
+    starting: dict[str | None, list[int]] = {}  # branch -> cases (without credit) starting at each horizon month
+    invoiced: dict[str | None, list[int]] = {}
+    cash: dict[str | None, list[int]] = {}
+    active: dict[str | None, list[int]] = {}
+    for row in cases:
+        schedule = RetainerSchedule.for_case(row, vat)
+        if schedule.start_month is None or schedule.start_month > horizon[-1]:
+            continue
+        offset = max(0, (schedule.start_month.year - first.year) * 12 + schedule.start_month.month - first.month)
+        branch = row.branch_name
+        for m in (starting, invoiced, cash, active):
+            m.setdefault(branch, [0] * months)
+        credit = max(0, to_agorot(row.retainer_paid_total_ils_gross) - to_agorot(row.retainer_accrued_total_ils_gross))
+        if not credit:
+            starting[branch][offset] += 1
+            continue
+        for i in range(offset, months):
+            covered = min(credit, gross[i])
+            credit -= covered
+            active[branch][i] += 1
+            invoiced[branch][i] += gross[i]
+            cash[branch][i] += gross[i] - covered
+
+    for branch, counts in starting.items():
+        running = 0
+        for i in range(months):
+            running += counts[i]
+            active[branch][i] += running
+            invoiced[branch][i] += running * gross[i]
+            cash[branch][i] += running * gross[i]
+
+    branches = sorted(active, key=lambda b: (b is None, b or ""))
+    out: list[RetainerProjectionMonth] = []
+    for i, month in enumerate(horizon):
+        month_invoiced = sum(invoiced[b][i] for b in branches)
+        month_cash = sum(cash[b][i] for b in branches)
+        out.append(
+            RetainerProjectionMonth(
+                month=month,
+                due_date=month + dt.timedelta(days=DUE_AFTER_DAYS),
+                case_count=sum(active[b][i] for b in branches),
+                invoiced_ils_gross=from_agorot(month_invoiced),
+                covered_by_credit_ils_gross=from_agorot(month_invoiced - month_cash),
+                cash_due_ils_gross=from_agorot(month_cash),
+                branches=[
+                    RetainerProjectionBranch(
+                        branch_name=b,
+                        case_count=active[b][i],
+                        invoiced_ils_gross=from_agorot(invoiced[b][i]),
+                        cash_due_ils_gross=from_agorot(cash[b][i]),
+                    )
+                    for b in branches
+                    if active[b][i]
+                ],
+            )
+        )
+    return RetainerProjectionResponse(
+        from_month=first,
+        months=out,
+        total_invoiced_ils_gross=from_agorot(sum(sum(v) for v in invoiced.values())),
+        total_cash_due_ils_gross=from_agorot(sum(sum(v) for v in cash.values())),
+    )
@@ -0,0 +1,96 @@
+"""In-process LRU cache of serialized analytics results, keyed by normalized filters + data version."""
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+
+from app.core.config import settings
+from app.models.enums import CaseType
+
+
+def overview_cache_key(
+    *, start_date: dt.date, end_date: dt.date, case_type: CaseType | None, payer_status: str | None
+) -> str:
+    """Canonical form of the overview filters (None and "all" payer_status mean the same thing)."""
+    return "|".join(
+        (
+            "overview",
+            start_date.isoformat(),
+            end_date.isoformat(),
+            case_type.value if case_type else "",
+            "" if payer_status in (None, "", "all") else payer_status,
+        )
+    )
+
+
+def retainer_aging_cache_key(*, as_of: dt.date, case_type: CaseType | None, payer_status: str | None) -> str:
+    return "|".join(
+        (
+            "retainer-aging",
+            as_of.isoformat(),
+            case_type.value if case_type else "",
+            "" if payer_status in (None, "", "all") else payer_status,
+        )
+    )
+
+
+def retainer_projection_cache_key(*, from_month: dt.date, months: int) -> str:
+    return "|".join(("retainer-projection", from_month.isoformat(), str(months)))
+
+
+def etag_for(key: str, version: int) -> str:
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+
+class ResultCache:
+    """
+    Byte-capped LRU of JSON bodies. Entries from an older data version are dropped as soon as a
+    newer version is stored, so after a write the cache only ever holds current results.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        self._version = -1
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: str, version: int, compute: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            if version == self._version and key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        body = compute()
+
+        with self._lock:
+            if version < self._version:
+                return body  # computed against an older snapshot; don't store
+            if version > self._version:
+                self._entries.clear()
+                self._bytes = 0
+                self._version = version
+            if len(body) > self.max_bytes:
+                return body
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            self._entries[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+        return body
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = -1
+
+
+overview_cache = ResultCache(settings.analytics_cache_max_bytes)
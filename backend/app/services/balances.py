@@ -0,0 +1,207 @@
+"""Materialized per-case balances (case_balances), maintained on write and rebuildable from raw rows."""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Sequence
+from decimal import Decimal
+
+from sqlalchemy import case as sql_case
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.case import Case
+from app.models.case_balance import CaseBalance
+from app.models.enums import ExpenseCategory, ExpensePayer
+from app.models.expense import Expense
+from app.models.fee_event import FeeEvent
+from app.models.retainer import RetainerAccrual, RetainerPayment
+from app.services.deductible import q_ils
+from app.services.expenses import excess_remaining_from_totals
+
+BALANCE_FIELDS = (
+    "deductible_consumed_ils_gross",
+    "retainer_paid_total_ils_gross",
+    "retainer_accrued_total_ils_gross",
+    "fee_credit_applied_ils_gross",
+    "fees_due_total_ils_gross",
+    "excess_remaining_ils_gross",
+)
+
+_REBUILD_CHUNK = 500
+
+
+def _d(v) -> Decimal:  # noqa: ANN001
+    return q_ils(Decimal(str(v or 0)))
+
+
+def compute_case_balances(db: Session, cases: Sequence[Case]) -> dict[int, dict[str, Decimal]]:
+    """
+    Recompute balances from the raw rows: {case_id: {field: value}}.
+    One grouped aggregate per table (expenses, retainer_payments, retainer_accruals, fee_events).
+    Callers inside a write transaction must flush first (sessions run with autoflush=False).
+    """
+    case_ids = [c.id for c in cases]
+    if not case_ids:
+        return {}
+
+    expense_rows = (
+        db.query(
+            Expense.case_id,
+            func.coalesce(func.sum(Expense.amount_ils_gross), 0),
+            func.coalesce(
+                func.sum(sql_case((Expense.category != ExpenseCategory.ATTORNEY_FEE, Expense.amount_ils_gross), else_=0)),
+                0,
+            ),
+        )
+        .filter(Expense.case_id.in_(case_ids), Expense.payer == ExpensePayer.CLIENT_DEDUCTIBLE)
+        .group_by(Expense.case_id)
+        .all()
+    )
+    consumed_by_case = {cid: (consumed, other) for cid, consumed, other in expense_rows}
+
+    paid_by_case = dict(
+        db.query(RetainerPayment.case_id, func.coalesce(func.sum(RetainerPayment.amount_ils_gross), 0))
+        .filter(RetainerPayment.case_id.in_(case_ids))
+        .group_by(RetainerPayment.case_id)
+        .all()
+    )
+    accrued_by_case = dict(
+        db.query(RetainerAccrual.case_id, func.coalesce(func.sum(RetainerAccrual.amount_ils_gross), 0))
+        .filter(RetainerAccrual.case_id.in_(case_ids))
+        .group_by(RetainerAccrual.case_id)
+        .all()
+    )
+    fee_rows = (
+        db.query(
+            FeeEvent.case_id,
+            func.coalesce(func.sum(FeeEvent.amount_covered_by_credit_ils_gross), 0),
+            func.coalesce(func.sum(FeeEvent.amount_due_cash_ils_gross), 0),
+        )
+        .filter(FeeEvent.case_id.in_(case_ids))
+        .group_by(FeeEvent.case_id)
+        .all()
+    )
+    fees_by_case = {cid: (applied, due) for cid, applied, due in fee_rows}
+
+    out: dict[int, dict[str, Decimal]] = {}
+    for c in cases:
+        consumed, other_expenses = consumed_by_case.get(c.id, (0, 0))
+        applied, due = fees_by_case.get(c.id, (0, 0))
+        paid = _d(paid_by_case.get(c.id))
+        out[c.id] = {
+            "deductible_consumed_ils_gross": _d(consumed),
+            "retainer_paid_total_ils_gross": paid,
+            "retainer_accrued_total_ils_gross": _d(accrued_by_case.get(c.id)),
+            "fee_credit_applied_ils_gross": _d(applied),
+            "fees_due_total_ils_gross": _d(due),
+            "excess_remaining_ils_gross": excess_remaining_from_totals(c, retainer_paid=paid, other_expenses=_d(other_expenses)),
+        }
+    return out
+
+
+def refresh_case_balance(db: Session, *, case_id: int) -> CaseBalance | None:
+    """
+    Recompute one case's balance row inside the caller's transaction (flushes, does not commit).
+    Called by every write path that changes expenses, retainer payments/accruals or fee credit.
+    """
+    case = db.get(Case, case_id)
+    if case is None:
+        return None
+    db.flush()
+    values = compute_case_balances(db, [case])[case_id]
+    row = db.get(CaseBalance, case_id)
+    if row is None:
+        row = CaseBalance(case_id=case_id)
+        db.add(row)
+    for field, value in values.items():
+        setattr(row, field, value)
+    db.flush()
+    return row
+
+
+def refresh_case_balances(db: Session, *, case_ids: Sequence[int]) -> None:
+    """Bulk refresh_case_balance for write paths touching many cases (chunked; flushes, does not commit)."""
+    db.flush()
+    ids = sorted(set(case_ids))
+    for i in range(0, len(ids), _REBUILD_CHUNK):
+        chunk = db.query(Case).filter(Case.id.in_(ids[i : i + _REBUILD_CHUNK])).all()
+        computed = compute_case_balances(db, chunk)
+        existing = {b.case_id: b for b in db.query(CaseBalance).filter(CaseBalance.case_id.in_([c.id for c in chunk])).all()}
+        for c in chunk:
+            row = existing.get(c.id)
+            if row is None:
+                db.add(CaseBalance(case_id=c.id, **computed[c.id]))
+                continue
+            for field, value in computed[c.id].items():
+                setattr(row, field, value)
+    db.flush()
+
+
+def get_case_balances(db: Session, cases: Sequence[Case]) -> dict[int, CaseBalance]:
+    """
+    Single lookup of the materialized rows for many cases: {case_id: CaseBalance}.
+    Cases without a row yet (created before the ledger existed) are computed from raw rows;
+    those objects are transient and never written by this read path.
+    """
+    case_ids = [c.id for c in cases]
+    if not case_ids:
+        return {}
+    rows = {b.case_id: b for b in db.query(CaseBalance).filter(CaseBalance.case_id.in_(case_ids)).all()}
+    missing = [c for c in cases if c.id not in rows]
+    if missing:
+        for cid, values in compute_case_balances(db, missing).items():
+            rows[cid] = CaseBalance(case_id=cid, **values)
+    return rows
+
+
+def get_case_balance(db: Session, case: Case) -> CaseBalance:
+    return get_case_balances(db, [case])[case.id]
+
+
+def rebuild_case_balances(db: Session, *, case_ids: Sequence[int] | None = None) -> dict[str, int]:
+    """
+    Recompute case_balances from raw rows (all cases, or only case_ids) and repair drift.
+    Returns counts: cases scanned, rows created, rows that drifted from the raw data.
+    """
+    logger = logging.getLogger(__name__)
+    q = db.query(Case).order_by(Case.id.asc())
+    if case_ids is not None:
+        q = q.filter(Case.id.in_(list(case_ids)))
+    cases = q.all()
+
+    scanned = 0
+    created = 0
+    drifted = 0
+    for i in range(0, len(cases), _REBUILD_CHUNK):
+        chunk = cases[i : i + _REBUILD_CHUNK]
+        computed = compute_case_balances(db, chunk)
+        existing = {
+            b.case_id: b
+            for b in db.query(CaseBalance).filter(CaseBalance.case_id.in_([c.id for c in chunk])).all()
+        }
+        for c in chunk:
+            scanned += 1
+            values = computed[c.id]
+            row = existing.get(c.id)
+            if row is None:
+                db.add(CaseBalance(case_id=c.id, **values))
+                created += 1
+                continue
+            if any(_d(getattr(row, f)) != values[f] for f in BALANCE_FIELDS):
+                drifted += 1
+                for field, value in values.items():
+                    setattr(row, field, value)
+    db.commit()
+    logger.info("case_balances_rebuild: cases_scanned=%d created=%d drifted=%d", scanned, created, drifted)
+    return {"cases_scanned": scanned, "created": created, "drifted": drifted}
+
+
+if __name__ == "__main__":
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print("Rebuilt case balances:", rebuild_case_balances(db))
+    finally:
+        db.close()
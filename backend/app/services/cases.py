@@ -1,23 +1,97 @@
 from __future__ import annotations
 
+import base64
+import datetime as dt
 from decimal import Decimal, ROUND_HALF_UP
 
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, tuple_
+from sqlalchemy.orm import Session, selectinload
 
 from app.models.case import Case
-from app.models.enums import CaseStatus
+from app.models.enums import CaseStatus, CaseType, ExpenseCategory, ExpensePayer
+from app.services.balances import get_case_balance, refresh_case_balance
 from app.services.boi_fx import FxLookupError, get_usd_ils_rate
-from app.services.expenses import get_case_excess_remaining
-from app.services.retainer import ensure_accruals_up_to, get_retainer_anchor_date
+from app.services.expenses import excess_remaining_from_totals
+from app.services.retainer import ensure_accruals_up_to, get_retainer_anchor_date, retainer_summary_from_totals
+from app.services.retainer_schedule import RetainerSchedule, get_vat_table
 
 
 def q_ils(x: Decimal) -> Decimal:
     return x.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
-def list_cases(db: Session) -> list[Case]:
-    return db.query(Case).order_by(Case.open_date.desc(), Case.id.desc()).all()
+def encode_case_cursor(case: Case) -> str:
+    """Opaque keyset cursor for (open_date, id)."""
+    raw = f"{case.open_date.isoformat()}|{case.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_case_cursor(cursor: str) -> tuple[dt.date, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        open_date_s, id_s = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return dt.date.fromisoformat(open_date_s), int(id_s)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def list_cases(
+    db: Session,
+    *,
+    limit: int = 100,
+    cursor: str | None = None,
+    order: str = "desc",
+    status_value: CaseStatus | None = None,
+    case_type: CaseType | None = None,
+    branch_name: str | None = None,
+    payer_status: str | None = None,  # client|insurer|closed
+    open_date_from: dt.date | None = None,
+    open_date_to: dt.date | None = None,
+    search: str | None = None,
+) -> tuple[list[Case], str | None]:
+    """
+    Keyset page of cases ordered by (open_date, id), newest first by default.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    Each filter combination is backed by a composite index ending in (open_date, id), see Case.__table_args__.
+    search: case-insensitive substring of case_reference or case_name, or the exact id; checked row by
+    row along that index, so the other filters narrow what it reads.
+    """
+    q = db.query(Case)
+    term = (search or "").strip()
+    if term:
+        matches = [Case.case_reference.icontains(term, autoescape=True), Case.case_name.icontains(term, autoescape=True)]
+        if term.isdigit():
+            matches.append(Case.id == int(term))
+        q = q.filter(or_(*matches))
+    if status_value is not None:
+        q = q.filter(Case.status == status_value)
+    if case_type is not None:
+        q = q.filter(Case.case_type == case_type)
+    if branch_name is not None:
+        q = q.filter(Case.branch_name == branch_name)
+    if payer_status == "closed":
+        q = q.filter(Case.status == CaseStatus.CLOSED)
+    elif payer_status in ("client", "insurer"):
+        q = q.filter(Case.status == CaseStatus.OPEN, Case.insurer_started.is_(payer_status == "insurer"))
+    if open_date_from is not None:
+        q = q.filter(Case.open_date >= open_date_from)
+    if open_date_to is not None:
+        q = q.filter(Case.open_date <= open_date_to)
+
+    key = tuple_(Case.open_date, Case.id)
+    if cursor:
+        after = tuple_(*decode_case_cursor(cursor))
+        q = q.filter(key > after if order == "asc" else key < after)
+    if order == "asc":
+        q = q.order_by(Case.open_date.asc(), Case.id.asc())
+    else:
+        q = q.order_by(Case.open_date.desc(), Case.id.desc())
+
+    rows = q.limit(limit + 1).all()
+    items = rows[:limit]
+    next_cursor = encode_case_cursor(items[-1]) if len(rows) > limit else None
+    return items, next_cursor
 
 
 def create_case(db: Session, payload) -> Case:
@@ -72,6 +146,12 @@ def create_case(db: Session, payload) -> Case:
         historical_fee_stages=historical_fee_stages,
     )
     db.add(c)
+    db.flush()
+    refresh_case_balance(db, case_id=c.id)
+    # An imported case may start past the thresholds (expenses snapshot); the nightly run only rescans changes.
+    from app.services.alerts import record_case_alerts
+
+    record_case_alerts(db, c, balance=get_case_balance(db, c))
     db.commit()
     db.refresh(c)
 
@@ -93,13 +173,23 @@ def update_case_status(db: Session, *, case_id: int, status_value) -> Case:
     if not c:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Case not found")
     c.status = status_value
+    if c.status == CaseStatus.OPEN:
+        # Threshold alerts skip closed cases; a reopened one may already be past them.
+        from app.services.alerts import record_case_alerts
+
+        db.flush()
+        record_case_alerts(db, c, balance=get_case_balance(db, c))
     db.commit()
     db.refresh(c)
     return c
 
 
-def to_case_out(db: Session, case: Case) -> dict:
-    excess = get_case_excess_remaining(db, case)
+def to_case_out(db: Session, case: Case, *, excess_remaining: Decimal | None = None) -> dict:
+    """
+    Serialize a case for CaseOut. Pass excess_remaining when it was already looked up in bulk
+    (see get_case_balances); otherwise it is read from the case's case_balances row.
+    """
+    excess = excess_remaining if excess_remaining is not None else get_case_balance(db, case).excess_remaining_ils_gross
     return {
         "id": case.id,
         "case_reference": case.case_reference,
@@ -124,3 +214,50 @@ def to_case_out(db: Session, case: Case) -> dict:
     }
 
 
+def get_case_workspace(db: Session, *, case_id: int) -> dict:
+    """
+    Everything the case page needs, loaded in one round-trip set: the case plus its expenses,
+    fee events, retainer accruals and payments (selectinload), with the summary numbers
+    (excess remaining, retainer summary) computed from those rows in memory.
+    """
+    c = (
+        db.query(Case)
+        .options(
+            selectinload(Case.expenses),
+            selectinload(Case.fee_events),
+            selectinload(Case.retainer_accruals),
+            selectinload(Case.retainer_payments),
+        )
+        .filter(Case.id == case_id)
+        .first()
+    )
+    if not c:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Case not found")
+
+    def total(values) -> Decimal:
+        return q_ils(sum((Decimal(str(v)) for v in values), Decimal("0.00")))
+
+    paid_total = total(p.amount_ils_gross for p in c.retainer_payments)
+    other_expenses = total(
+        e.amount_ils_gross
+        for e in c.expenses
+        if e.payer == ExpensePayer.CLIENT_DEDUCTIBLE and e.category != ExpenseCategory.ATTORNEY_FEE
+    )
+    summary = retainer_summary_from_totals(
+        accrued_total=total(a.amount_ils_gross for a in c.retainer_accruals),
+        paid_total=paid_total,
+        applied_to_fees_total=total(e.amount_covered_by_credit_ils_gross for e in c.fee_events),
+        fees_due_total=total(e.amount_due_cash_ils_gross for e in c.fee_events),
+        schedule=RetainerSchedule.for_case(c, get_vat_table(db)),
+    )
+    excess = excess_remaining_from_totals(c, retainer_paid=paid_total, other_expenses=other_expenses)
+
+    # Same orderings as the per-collection endpoints.
+    return {
+        "case": to_case_out(db, c, excess_remaining=excess),
+        "expenses": sorted(c.expenses, key=lambda e: (e.expense_date, e.id), reverse=True),
+        "fee_events": sorted(c.fee_events, key=lambda e: (e.event_date, e.id), reverse=True),
+        "retainer_summary": summary,
+        "retainer_accruals": sorted(c.retainer_accruals, key=lambda a: a.accrual_month, reverse=True),
+        "retainer_payments": sorted(c.retainer_payments, key=lambda p: (p.payment_date, p.id), reverse=True),
+    }
@@ -1,33 +1,153 @@
 from __future__ import annotations
 
+import datetime as dt
+import logging
 import smtplib
+from collections.abc import Iterator
+from contextlib import ExitStack, contextmanager
 from email.message import EmailMessage
 
+from sqlalchemy.orm import Session
+
 from app.core.config import settings
+from app.models.email_outbox import EmailOutbox
 
 
-def send_email(*, subject: str, body: str, recipients: list[str]) -> None:
-    """
-    MVP email sending:
-    - If SMTP is not configured, we print to logs (stdout) instead of sending.
-    """
-    if not recipients:
-        return
+def _smtp_configured() -> bool:
+    return bool(settings.smtp_host and settings.smtp_from)
 
-    if not settings.smtp_host or not settings.smtp_from:
-        print("[EMAIL][DRY_RUN]", {"to": recipients, "subject": subject, "body": body})
-        return
 
+def _build_message(*, subject: str, body: str, recipients: list[str]) -> EmailMessage:
     msg = EmailMessage()
     msg["Subject"] = subject
     msg["From"] = settings.smtp_from
     msg["To"] = ", ".join(recipients)
     msg.set_content(body)
+    return msg
+
 
+@contextmanager
+def smtp_session() -> Iterator[smtplib.SMTP]:
+    """One connected, STARTTLS'd and logged-in SMTP session."""
     with smtplib.SMTP(settings.smtp_host, settings.smtp_port) as s:
         s.starttls()
         if settings.smtp_username and settings.smtp_password:
             s.login(settings.smtp_username, settings.smtp_password)
-        s.send_message(msg)
+        yield s
+
+
+def enqueue_email(db: Session, *, subject: str, body: str, recipients: list[str]) -> EmailOutbox | None:
+    """Queue a message in email_outbox inside the caller's transaction (does not commit)."""
+    if not recipients:
+        return None
+    row = EmailOutbox(
+        recipients=",".join(recipients),
+        subject=subject,
+        body=body,
+        status="pending",
+        attempts=0,
+        next_attempt_at=dt.datetime.now(dt.timezone.utc),
+    )
+    db.add(row)
+    return row
+
+
+class _ReusedSmtp:
+    """Opens the SMTP session on first send and keeps it for the rest of the delivery run."""
+
+    def __init__(self) -> None:
+        self._stack: ExitStack | None = None
+        self._smtp: smtplib.SMTP | None = None
+        self.connections = 0
+
+    def send(self, msg: EmailMessage) -> None:
+        if self._smtp is None:
+            self._stack = ExitStack()
+            self._smtp = self._stack.enter_context(smtp_session())
+            self.connections += 1
+        self._smtp.send_message(msg)
+
+    def close(self) -> None:
+        stack, self._stack, self._smtp = self._stack, None, None
+        if stack is not None:
+            try:
+                stack.close()
+            except Exception:  # noqa: BLE001
+                pass
+
+
+def deliver_outbox(db: Session, *, max_messages: int | None = None, now: dt.datetime | None = None) -> dict[str, int]:
+    """
+    Drain due outbox rows oldest-first over one SMTP session, committing after each batch.
+
+    A failed message is retried with exponential backoff (email_retry_base_seconds * 2**(attempts-1))
+    and marked failed after email_max_attempts. At most max_messages (default email_outbox_max_per_run)
+    are attempted per run. On Postgres rows are claimed with FOR UPDATE SKIP LOCKED, so overlapping
+    workers never pick the same message.
+    """
+    logger = logging.getLogger(__name__)
+    now = now or dt.datetime.now(dt.timezone.utc)
+    limit = settings.email_outbox_max_per_run if max_messages is None else max_messages
+    batch_size = max(1, settings.email_outbox_batch_size)
+    stats = {"attempted": 0, "sent": 0, "retrying": 0, "failed": 0}
+
+    smtp = _ReusedSmtp()
+    try:
+        while stats["attempted"] < limit:
+            batch = (
+                db.query(EmailOutbox)
+                .filter(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.id.asc())
+                .limit(min(batch_size, limit - stats["attempted"]))
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not batch:
+                break
+            for row in batch:
+                stats["attempted"] += 1
+                row.attempts += 1
+                recipients = [r for r in row.recipients.split(",") if r]
+                try:
+                    if _smtp_configured():
+                        smtp.send(_build_message(subject=row.subject, body=row.body, recipients=recipients))
+                    else:
+                        logger.info("email_dry_run to=%s subject=%s body=%s", recipients, row.subject, row.body)
+                except Exception as exc:  # noqa: BLE001
+                    row.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+                    if row.attempts >= settings.email_max_attempts:
+                        row.status = "failed"
+                        stats["failed"] += 1
+                    else:
+                        delay = settings.email_retry_base_seconds * 2 ** (row.attempts - 1)
+                        row.next_attempt_at = now + dt.timedelta(seconds=delay)
+                        stats["retrying"] += 1
+                    logger.warning("email_outbox_send_failed id=%s attempts=%s error=%s", row.id, row.attempts, row.last_error)
+                    if isinstance(exc, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)):
+                        smtp.close()  # connection-level failure: reconnect on the next message
+                    continue
+                row.status = "sent"
+                row.sent_at = dt.datetime.now(dt.timezone.utc)
+                row.last_error = None
+                stats["sent"] += 1
+            db.commit()
+    finally:
+        smtp.close()
+
+    stats["smtp_connections"] = smtp.connections
+    logger.info("email_outbox_delivery: %s", stats)
+    return stats
+
+
+def deliver_outbox_recorded(db: Session) -> dict:
+    """deliver_outbox as a recorded "email" task run (task_runs)."""
+    from app.services.task_runs import record_task_run
+
+    def run(recorder) -> dict:  # noqa: ANN001
+        with recorder.phase("email") as p:
+            stats = deliver_outbox(db)
+            p.rows_scanned, p.rows_written = stats["attempted"], stats["sent"]
+        return {"ok": True, **stats}
 
+    return record_task_run(db, "email", run)
 
@@ -0,0 +1,145 @@
+"""Monthly expense rollup (expense_rollup_monthly), maintained on write and rebuildable from the expenses table."""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+from collections.abc import Sequence
+from decimal import Decimal
+
+from sqlalchemy import and_, extract, func, insert, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models.expense import Expense
+from app.models.expense_rollup import ExpenseRollupMonthly
+from app.services.deductible import q_ils
+from app.services.retainer import add_months
+
+
+def month_start(d: dt.date) -> dt.date:
+    return dt.date(d.year, d.month, 1)
+
+
+def add_expenses_to_rollup(db: Session, expenses: Sequence[Expense]) -> None:
+    """
+    Add freshly created expense rows (e.g. both halves of a deductible split) to their monthly buckets.
+    Runs inside the caller's transaction (flushes, does not commit).
+    """
+    deltas: dict[tuple, tuple[Decimal, int]] = {}
+    for e in expenses:
+        key = (e.case_id, month_start(e.expense_date), e.payer, e.category)
+        total, count = deltas.get(key, (Decimal("0.00"), 0))
+        deltas[key] = (total + Decimal(str(e.amount_ils_gross)), count + 1)
+
+    if not deltas:
+        return
+    db.flush()
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    # One atomic upsert per bucket: concurrent add_expense calls on the same bucket add up instead of
+    # overwriting each other (read-modify-write) or racing on the insert of a new bucket.
+    for (case_id, month, payer, category), (total, count) in deltas.items():
+        stmt = dialect_insert(ExpenseRollupMonthly).values(
+            case_id=case_id, month=month, payer=payer, category=category, total_ils_gross=q_ils(total), expense_count=count
+        )
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["case_id", "month", "payer", "category"],
+                set_={
+                    "total_ils_gross": ExpenseRollupMonthly.total_ils_gross + stmt.excluded.total_ils_gross,
+                    "expense_count": ExpenseRollupMonthly.expense_count + stmt.excluded.expense_count,
+                },
+            )
+        )
+
+
+def expense_facts(db: Session, *, start_date: dt.date, end_date: dt.date):  # noqa: ANN201
+    """
+    Subquery of expense amounts dated within [start_date, end_date] with columns
+    (case_id, year, month, payer, category, amount).
+
+    Whole calendar months inside the range come from expense_rollup_monthly (one row per bucket);
+    only the partial months at either edge are read from the expenses table.
+    """
+    first_full = start_date if start_date.day == 1 else add_months(month_start(start_date), 1)
+    after_end = end_date + dt.timedelta(days=1)
+    full_end = after_end if after_end.day == 1 else month_start(end_date)  # exclusive
+
+    def raw(*where):  # noqa: ANN001, ANN202
+        return select(
+            Expense.case_id.label("case_id"),
+            extract("year", Expense.expense_date).label("year"),
+            extract("month", Expense.expense_date).label("month"),
+            Expense.payer.label("payer"),
+            Expense.category.label("category"),
+            Expense.amount_ils_gross.label("amount"),
+        ).where(*where)
+
+    if first_full >= full_end:
+        return raw(Expense.expense_date >= start_date, Expense.expense_date <= end_date).subquery()
+
+    rollup = select(
+        ExpenseRollupMonthly.case_id.label("case_id"),
+        extract("year", ExpenseRollupMonthly.month).label("year"),
+        extract("month", ExpenseRollupMonthly.month).label("month"),
+        ExpenseRollupMonthly.payer.label("payer"),
+        ExpenseRollupMonthly.category.label("category"),
+        ExpenseRollupMonthly.total_ils_gross.label("amount"),
+    ).where(ExpenseRollupMonthly.month >= first_full, ExpenseRollupMonthly.month < full_end)
+    edges = raw(
+        or_(
+            and_(Expense.expense_date >= start_date, Expense.expense_date < first_full),
+            and_(Expense.expense_date >= full_end, Expense.expense_date <= end_date),
+        )
+    )
+    return union_all(rollup, edges).subquery()
+
+
+def rebuild_expense_rollup(db: Session) -> dict[str, int]:
+    """Recompute expense_rollup_monthly from the expenses table (replaces all rows). Returns row counts."""
+    logger = logging.getLogger(__name__)
+    year_col = extract("year", Expense.expense_date)
+    month_col = extract("month", Expense.expense_date)
+    grouped = (
+        db.query(
+            Expense.case_id,
+            year_col,
+            month_col,
+            Expense.payer,
+            Expense.category,
+            func.sum(Expense.amount_ils_gross),
+            func.count(Expense.id),
+        )
+        .group_by(Expense.case_id, year_col, month_col, Expense.payer, Expense.category)
+        .all()
+    )
+    rows = [
+        {
+            "case_id": case_id,
+            "month": dt.date(int(year), int(month), 1),
+            "payer": payer,
+            "category": category,
+            "total_ils_gross": q_ils(Decimal(str(total))),
+            "expense_count": int(count),
+        }
+        for case_id, year, month, payer, category, total, count in grouped
+    ]
+    db.query(ExpenseRollupMonthly).delete()
+    if rows:
+        db.execute(insert(ExpenseRollupMonthly), rows)
+    db.commit()
+    expenses = sum(r["expense_count"] for r in rows)
+    logger.info("expense_rollup_rebuild: rows=%d expenses=%d", len(rows), expenses)
+    return {"rows": len(rows), "expenses": expenses}
+
+
+if __name__ == "__main__":
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print("Rebuilt expense rollup:", rebuild_expense_rollup(db))
+    finally:
+        db.close()
@@ -37,8 +37,6 @@ def get_case_excess_remaining(db: Session, case: Case) -> Decimal:
     """
     from app.models.retainer import RetainerPayment
 
-    m = Decimal(str(case.deductible_ils_gross))
-
     retainer_paid = (
         db.query(func.coalesce(func.sum(RetainerPayment.amount_ils_gross), 0))
         .filter(RetainerPayment.case_id == case.id)
@@ -56,6 +54,12 @@ def get_case_excess_remaining(db: Session, case: Case) -> Decimal:
         .scalar()
     )
     other_expenses = Decimal(str(other_expenses))
+    return excess_remaining_from_totals(case, retainer_paid=retainer_paid, other_expenses=other_expenses)
+
+
+def excess_remaining_from_totals(case: Case, *, retainer_paid: Decimal, other_expenses: Decimal) -> Decimal:
+    """P = M - J from already-summed retainer payments and non-attorney deductible expenses."""
+    m = Decimal(str(case.deductible_ils_gross))
     expenses_snapshot = Decimal(str(case.expenses_snapshot_ils_gross or 0))
 
     retainer_total = retainer_paid
@@ -79,6 +83,10 @@ def add_expense(db: Session, *, case_id: int, payload) -> list[Expense]:
     - INSURER: full amount goes to insurer (does not consume deductible)
     - CLIENT_DEDUCTIBLE: still may be split if it would exceed remaining
     """
+    from app.services.alerts import record_case_alerts
+    from app.services.balances import refresh_case_balance
+    from app.services.expense_rollup import add_expenses_to_rollup
+
     case = db.query(Case).filter(Case.id == case_id).first()
     if not case:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Case not found")
@@ -100,13 +108,14 @@ def add_expense(db: Session, *, case_id: int, payload) -> list[Expense]:
             attachment_url=payload.attachment_url,
         )
         db.add(e)
-        db.commit()
-        db.refresh(e)
         # If insurer is paying, mark started (if not already).
         if not case.insurer_started:
             case.insurer_started = True
             case.insurer_start_date = payload.expense_date
-            db.commit()
+        add_expenses_to_rollup(db, [e])
+        record_case_alerts(db, case, balance=refresh_case_balance(db, case_id=case_id))
+        db.commit()
+        db.refresh(e)
         return [e]
 
     remaining = get_case_deductible_remaining(db, case)
@@ -156,6 +165,8 @@ def add_expense(db: Session, *, case_id: int, payload) -> list[Expense]:
             case.insurer_started = True
             case.insurer_start_date = payload.expense_date
 
+    add_expenses_to_rollup(db, created)
+    record_case_alerts(db, case, balance=refresh_case_balance(db, case_id=case_id))
     db.commit()
     for e in created:
         db.refresh(e)
@@ -1,16 +1,30 @@
 from __future__ import annotations
 
+from collections.abc import Sequence
 from decimal import Decimal
 
 from fastapi import HTTPException, status
-from sqlalchemy import func
+from sqlalchemy import case as sql_case
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
 
 from app.models.case import Case
 from app.models.enums import FeeEventType
 from app.models.fee_event import FeeEvent
 from app.models.retainer import RetainerPayment
+from app.services.balances import refresh_case_balance
 from app.services.deductible import q_ils
+from app.services.money import allocate_sequential, from_agorot, to_agorot
+
+
+# Court stage number per fee event type (used for "highest stage reached").
+COURT_STAGE_NUMBERS: dict[FeeEventType, int] = {
+    FeeEventType.COURT_STAGE_1_DEFENSE: 1,
+    FeeEventType.COURT_STAGE_2_DAMAGES: 2,
+    FeeEventType.COURT_STAGE_3_EVIDENCE: 3,
+    FeeEventType.COURT_STAGE_4_PROOFS: 4,
+    FeeEventType.COURT_STAGE_5_SUMMARIES: 5,
+}
 
 
 def compute_fee_amount(event_type: FeeEventType, *, quantity: int = 1, amount_override_ils_gross: Decimal | None = None) -> Decimal:
@@ -47,15 +61,8 @@ def apply_credit_to_amounts(amounts_ils_gross: list[Decimal], *, credit_ils_gros
 
     Returns list of (covered_by_credit, due_cash) per amount, in the same order.
     """
-    credit = q_ils(credit_ils_gross)
-    out: list[tuple[Decimal, Decimal]] = []
-    for amt in amounts_ils_gross:
-        total = q_ils(amt)
-        covered = q_ils(min(credit, total))
-        due = q_ils(total - covered)
-        out.append((covered, due))
-        credit = q_ils(credit - covered)
-    return out
+    allocations = allocate_sequential([to_agorot(a) for a in amounts_ils_gross], to_agorot(credit_ils_gross))
+    return [(from_agorot(covered), from_agorot(due)) for covered, due in allocations]
 
 
 def _retainer_paid_total(db: Session, case_id: int) -> Decimal:
@@ -67,27 +74,98 @@ def _retainer_paid_total(db: Session, case_id: int) -> Decimal:
     return q_ils(Decimal(str(total)))
 
 
-def apply_retainer_credit(db: Session, *, case_id: int) -> None:
-    paid_total = _retainer_paid_total(db, case_id)
+def _event_order_after(event: FeeEvent):  # noqa: ANN202
+    """Events after `event` in allocation order (event_date, id)."""
+    return or_(
+        FeeEvent.event_date > event.event_date,
+        and_(FeeEvent.event_date == event.event_date, FeeEvent.id > event.id),
+    )
+
 
-    events = (
+def _apply_credit_from_first_due(db: Session, *, case_id: int, paid_total: Decimal) -> bool:
+    """
+    Credit is applied oldest-first, so events before the first one with cash due are fully covered and
+    stay that way while the credit does not shrink. Re-allocates only from that event on. Returns False
+    (nothing changed) when the stored split is not such a prefix: a backdated event sits before
+    covered ones, or the credit dropped below what the covered prefix uses.
+    """
+    tail = (
         db.query(FeeEvent)
-        .filter(FeeEvent.case_id == case_id)
+        .filter(FeeEvent.case_id == case_id, FeeEvent.amount_due_cash_ils_gross > 0)
         .order_by(FeeEvent.event_date.asc(), FeeEvent.id.asc())
         .all()
     )
-
-    allocations = apply_credit_to_amounts(
-        [Decimal(str(e.computed_amount_ils_gross)) for e in events],
-        credit_ils_gross=paid_total,
+    if not tail:
+        # Every event is covered: still valid only while the credit covers all of them.
+        covered_total = (
+            db.query(func.coalesce(func.sum(FeeEvent.amount_covered_by_credit_ils_gross), 0))
+            .filter(FeeEvent.case_id == case_id)
+            .scalar()
+        )
+        return to_agorot(covered_total) <= to_agorot(paid_total)
+    first = tail[0]
+    covered_after_first = (
+        db.query(FeeEvent.id)
+        .filter(
+            FeeEvent.case_id == case_id,
+            FeeEvent.amount_due_cash_ils_gross == 0,
+            FeeEvent.computed_amount_ils_gross > 0,
+            _event_order_after(first),
+        )
+        .first()
     )
-    for e, (covered, due) in zip(events, allocations, strict=False):
-        e.amount_covered_by_credit_ils_gross = covered
-        e.amount_due_cash_ils_gross = due
-    db.commit()
+    if covered_after_first is not None:
+        return False
+    prefix_covered = (
+        db.query(func.coalesce(func.sum(FeeEvent.amount_covered_by_credit_ils_gross), 0))
+        .filter(FeeEvent.case_id == case_id, ~_event_order_after(first), FeeEvent.id != first.id)
+        .scalar()
+    )
+    remaining = to_agorot(paid_total) - to_agorot(prefix_covered)
+    if remaining < 0:
+        return False
+
+    allocations = allocate_sequential([to_agorot(e.computed_amount_ils_gross) for e in tail], remaining)
+    for e, (covered, due) in zip(tail, allocations, strict=True):
+        if to_agorot(e.amount_covered_by_credit_ils_gross) != covered or to_agorot(e.amount_due_cash_ils_gross) != due:
+            e.amount_covered_by_credit_ils_gross = from_agorot(covered)
+            e.amount_due_cash_ils_gross = from_agorot(due)
+    return True
+
+
+def apply_retainer_credit(db: Session, *, case_id: int) -> None:
+    """
+    Spread the retainer paid total over the case's fee events oldest-first (covered vs. cash due),
+    then refresh the balance and record threshold alerts. Runs inside the caller's transaction
+    (flushes, does not commit).
+
+    Appending an event or adding a payment only touches events from the first one with cash due;
+    anything else (backdated event, payment removed) falls back to reallocating every event.
+    """
+    db.flush()  # sessions run without autoflush; the caller's new event / payment must be visible
+    paid_total = _retainer_paid_total(db, case_id)
+    if not _apply_credit_from_first_due(db, case_id=case_id, paid_total=paid_total):
+        events = (
+            db.query(FeeEvent)
+            .filter(FeeEvent.case_id == case_id)
+            .order_by(FeeEvent.event_date.asc(), FeeEvent.id.asc())
+            .all()
+        )
+        allocations = apply_credit_to_amounts([e.computed_amount_ils_gross for e in events], credit_ils_gross=paid_total)
+        for e, (covered, due) in zip(events, allocations, strict=False):
+            e.amount_covered_by_credit_ils_gross = covered
+            e.amount_due_cash_ils_gross = due
+    balance = refresh_case_balance(db, case_id=case_id)
+    if balance is not None:
+        # Runs after every retainer payment: payments count against the excess (Excel J).
+        from app.services.alerts import record_case_alerts
+
+        record_case_alerts(db, db.get(Case, case_id), balance=balance)
+    db.flush()
 
 
 def add_fee_event(db: Session, *, case_id: int, payload) -> FeeEvent:
+    """Adds the event and re-applies the retainer credit in one commit."""
     case = db.query(Case).filter(Case.id == case_id).first()
     if not case:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Case not found")
@@ -104,14 +182,58 @@ def add_fee_event(db: Session, *, case_id: int, payload) -> FeeEvent:
         amount_due_cash_ils_gross=amt,
     )
     db.add(e)
-    db.commit()
-    db.refresh(e)
-
     apply_retainer_credit(db, case_id=case_id)
+    db.commit()
     db.refresh(e)
     return e
 
 
+def get_fee_summaries_for_cases(db: Session, case_ids: Sequence[int]) -> dict[int, dict]:
+    """
+    Per-case fee summary for a page of cases: one grouped query over fee_events, plus one windowed
+    query for each case's latest event type (by event_date, then id).
+    Cases without fee events are omitted (callers treat them as empty).
+    """
+    if not case_ids:
+        return {}
+    ids = list(case_ids)
+    stage = sql_case(COURT_STAGE_NUMBERS, value=FeeEvent.event_type, else_=0)
+    rows = (
+        db.query(
+            FeeEvent.case_id,
+            func.max(stage),
+            func.count(FeeEvent.id),
+            func.coalesce(func.sum(FeeEvent.computed_amount_ils_gross), 0),
+            func.coalesce(func.sum(FeeEvent.amount_due_cash_ils_gross), 0),
+        )
+        .filter(FeeEvent.case_id.in_(ids))
+        .group_by(FeeEvent.case_id)
+        .all()
+    )
+    ranked = (
+        db.query(
+            FeeEvent.case_id.label("case_id"),
+            FeeEvent.event_type.label("event_type"),
+            func.row_number()
+            .over(partition_by=FeeEvent.case_id, order_by=(FeeEvent.event_date.desc(), FeeEvent.id.desc()))
+            .label("rn"),
+        )
+        .filter(FeeEvent.case_id.in_(ids))
+        .subquery()
+    )
+    latest = dict(db.query(ranked.c.case_id, ranked.c.event_type).filter(ranked.c.rn == 1).all())
+    return {
+        case_id: {
+            "highest_court_stage": int(highest) or None,
+            "latest_event_type": latest.get(case_id),
+            "fee_event_count": int(count),
+            "fees_total_ils_gross": q_ils(Decimal(str(total))),
+            "fees_due_cash_total_ils_gross": q_ils(Decimal(str(due))),
+        }
+        for case_id, highest, count, total, due in rows
+    }
+
+
 def list_fee_events(db: Session, case_id: int) -> list[FeeEvent]:
     return db.query(FeeEvent).filter(FeeEvent.case_id == case_id).order_by(FeeEvent.event_date.desc(), FeeEvent.id.desc()).all()
 
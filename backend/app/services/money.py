@@ -0,0 +1,82 @@
+"""
+ILS amounts as integer agorot (1 ILS = 100 agorot).
+
+Hot paths convert once on the way in (to_agorot), do exact integer arithmetic, and convert back
+with from_agorot only where a Decimal leaves the service (models, API schemas). Rounding matches
+q_ils: half-up (away from zero) to whole agorot.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from decimal import ROUND_HALF_UP, Decimal
+
+_ONE = Decimal(1)
+
+
+def to_agorot(amount_ils: Decimal | int | float | str | None) -> int:
+    """ILS amount -> agorot, half-up. None counts as 0; floats go through str() like Decimal(str(x))."""
+    if amount_ils is None:
+        return 0
+    if isinstance(amount_ils, int):
+        return amount_ils * 100
+    d = amount_ils if isinstance(amount_ils, Decimal) else Decimal(str(amount_ils))
+    numerator, denominator = d.as_integer_ratio()
+    if 100 % denominator == 0:  # the common case: at most 2 decimal places (Numeric(14, 2))
+        return numerator * (100 // denominator)
+    return int(d.scaleb(2).quantize(_ONE, rounding=ROUND_HALF_UP))
+
+
+def from_agorot(agorot: int) -> Decimal:
+    """Agorot -> ILS Decimal with exactly two places (same shape as q_ils output)."""
+    return Decimal(agorot).scaleb(-2)
+
+
+def sum_agorot(amounts_ils: Iterable[Decimal | int | float | str | None]) -> int:
+    return sum(map(to_agorot, amounts_ils))
+
+
+def div_half_up(numerator: int, denominator: int) -> int:
+    """Integer division rounded half-up (away from zero), e.g. an average in agorot."""
+    if denominator == 0:
+        raise ZeroDivisionError("division by zero")
+    negative = (numerator < 0) != (denominator < 0)
+    q, r = divmod(abs(numerator), abs(denominator))
+    if 2 * r >= abs(denominator):
+        q += 1
+    return -q if negative else q
+
+
+def split_at(amount: int, capacity: int) -> tuple[int, int]:
+    """Split amount into (part within capacity, part over it); capacity <= 0 means nothing fits."""
+    within = min(amount, max(capacity, 0))
+    return within, amount - within
+
+
+def allocate_sequential(amounts: Sequence[int], credit: int) -> list[tuple[int, int]]:
+    """
+    Apply credit to amounts in order: [(covered, due), ...]. Each amount takes as much of the
+    remaining credit as it can; once credit runs out the rest are fully due.
+    """
+    out: list[tuple[int, int]] = []
+    append = out.append
+    for amount in amounts:
+        covered = amount if amount <= credit else credit
+        append((covered, amount - covered))
+        credit -= covered
+    return out
+
+
+def allocate_whole(amounts: Sequence[int], funds: int) -> list[bool]:
+    """
+    Mark amounts as fully paid in order while funds last. An amount that does not fit is skipped
+    (left unpaid) and later, smaller amounts may still be paid from the same funds.
+    """
+    out: list[bool] = []
+    for amount in amounts:
+        if funds >= amount:
+            out.append(True)
+            funds -= amount
+        else:
+            out.append(False)
+    return out
@@ -4,32 +4,39 @@ import datetime as dt
 import logging
 from decimal import Decimal
 
-from sqlalchemy import func
+from sqlalchemy import and_, func, insert, or_, text, update
 from sqlalchemy.orm import Session
 
 from app.models.case import Case
+from app.models.case_balance import CaseBalance
 from app.models.enums import CaseStatus
-from app.models.fee_event import FeeEvent
 from app.models.retainer import RetainerAccrual, RetainerPayment
+from app.models.vat_period import VatPeriod
+from app.services.balances import get_case_balance, refresh_case_balance, refresh_case_balances
 from app.services.deductible import q_ils
-
-RETAINER_BASE_NET_ILS = Decimal("945.00")
-VAT_17_PCT = Decimal("0.17")
-VAT_18_PCT = Decimal("0.18")
-VAT_CUTOVER = dt.date(2025, 1, 1)  # From Jan 2025: 18%
-
-
-def vat_rate_for_month(accrual_month: dt.date) -> Decimal:
-    """VAT rate: 17% up to Dec 2024, 18% from Jan 2025."""
-    if accrual_month < VAT_CUTOVER:
-        return VAT_17_PCT
-    return VAT_18_PCT
-
-
-def retainer_gross_for_month(accrual_month: dt.date) -> Decimal:
+from app.services.money import allocate_whole, from_agorot, to_agorot
+from app.services.retainer_schedule import RETAINER_BASE_NET_ILS  # noqa: F401 (re-export)
+from app.services.retainer_schedule import (
+    DEFAULT_VAT,
+    DUE_AFTER_DAYS,
+    RetainerSchedule,
+    VatTable,
+    accrual_start_month,
+    get_vat_table,
+    gross_for_rate,
+    schedule_start_month,
+)
+from app.services.retainer_schedule import vat_rate_for_month as schedule_vat_rate
+
+
+def vat_rate_for_month(accrual_month: dt.date, vat: VatTable | None = None) -> Decimal:
+    """VAT rate from the vat_periods table (17% up to Dec 2024, 18% from Jan 2025 unless changed)."""
+    return schedule_vat_rate(accrual_month, vat)
+
+
+def retainer_gross_for_month(accrual_month: dt.date, vat: VatTable | None = None) -> Decimal:
     """Gross = 945 * (1 + VAT_rate). Dec 2024: 1105.65, Jan 2025: 1115.10."""
-    rate = vat_rate_for_month(accrual_month)
-    return q_ils(RETAINER_BASE_NET_ILS * (Decimal("1") + rate))
+    return gross_for_rate(vat_rate_for_month(accrual_month, vat))
 
 
 def _month_start(d: dt.date) -> dt.date:
@@ -54,13 +61,6 @@ def get_retainer_start_month(retainer_anchor_date: dt.date) -> dt.date:
     return _month_start(retainer_anchor_date)
 
 
-def _accrual_start_month(retainer_anchor_date: dt.date, snapshot_through_month: dt.date | None) -> dt.date:
-    """First accrual month. If snapshot_through_month set, start from month after. Else from anchor."""
-    if snapshot_through_month is not None:
-        return add_months(_month_start(snapshot_through_month), 1)
-    return get_retainer_start_month(retainer_anchor_date)
-
-
 def ensure_accruals_up_to(
     db: Session,
     *,
@@ -72,13 +72,14 @@ def ensure_accruals_up_to(
     """
     Ensure fixed monthly accruals exist from start month through up_to month (inclusive).
     start_month = first month after snapshot_through_month (if set), else retainer_anchor_date.
-    Amount per month uses VAT: 17% up to Dec 2024, 18% from Jan 2025.
+    Amount per month uses VAT from the vat_periods table (retainer_schedule.get_vat_table).
     """
     today = dt.date.today()
     up_to = _month_start(up_to or today)
-    start = _accrual_start_month(retainer_anchor_date, snapshot_through_month)
+    start = accrual_start_month(retainer_anchor_date, snapshot_through_month)
     if start > up_to:
         return []
+    vat = get_vat_table(db)
 
     existing = {
         a.accrual_month: a
@@ -90,8 +91,8 @@ def ensure_accruals_up_to(
     while cur <= up_to:
         if cur not in existing:
             invoice_date = cur
-            due_date = invoice_date + dt.timedelta(days=60)
-            amount = retainer_gross_for_month(cur)
+            due_date = invoice_date + dt.timedelta(days=DUE_AFTER_DAYS)
+            amount = retainer_gross_for_month(cur, vat)
             a = RetainerAccrual(
                 case_id=case_id,
                 accrual_month=cur,
@@ -105,45 +106,127 @@ def ensure_accruals_up_to(
         cur = add_months(cur, 1)
 
     if created:
+        invalidate_payment_allocation(db, {case_id: created[0].accrual_month})
+        refresh_case_balance(db, case_id=case_id)
         db.commit()
         for a in created:
             db.refresh(a)
     return created
 
 
-def ensure_all_cases_accruals_up_to_now(db: Session) -> tuple[int, int]:
+# Rows per multi-row INSERT in the bulk roll-forward.
+_ROLL_FORWARD_BATCH = 1000
+
+# Postgres: every missing (case_id, month) of the open cases, start month as in retainer_schedule.schedule_start_month.
+_MISSING_ACCRUAL_MONTHS_SQL = """
+    SELECT c.id, CAST(m.month AS date)
+    FROM cases c
+    CROSS JOIN LATERAL generate_series(
+        CASE
+            WHEN COALESCE(c.retainer_snapshot_ils_gross, 0) <> 0
+            THEN date_trunc('month', CAST(c.retainer_snapshot_through_month AS timestamp)) + interval '1 month'
+            ELSE date_trunc('month', CAST(c.retainer_anchor_date AS timestamp))
+        END,
+        CAST(:up_to AS timestamp),
+        interval '1 month'
+    ) AS m(month)
+    WHERE c.status = 'OPEN'
+      AND NOT (c.retainer_snapshot_ils_gross IS NOT NULL AND c.retainer_snapshot_through_month IS NULL)
+      AND NOT EXISTS (
+          SELECT 1 FROM retainer_accruals a WHERE a.case_id = c.id AND a.accrual_month = CAST(m.month AS date)
+      )
+    ORDER BY c.id, m.month
+"""
+
+
+def _roll_forward_eligible():  # noqa: ANN202
+    """Open cases that roll forward: all but a snapshot without through-month (backward compat)."""
+    return and_(
+        Case.status == CaseStatus.OPEN,
+        or_(Case.retainer_snapshot_ils_gross.is_(None), Case.retainer_snapshot_through_month.isnot(None)),
+    )
+
+
+def _missing_accrual_months_py(db: Session, *, up_to: dt.date) -> list[tuple[int, dt.date]]:
+    """Other dialects: eligible cases and their existing months in two queries, month ranges in Python."""
+    cases = (
+        db.query(Case.id, Case.retainer_anchor_date, Case.retainer_snapshot_ils_gross, Case.retainer_snapshot_through_month)
+        .filter(_roll_forward_eligible())
+        .order_by(Case.id.asc())
+        .all()
+    )
+    existing: dict[int, set[dt.date]] = {}
+    for case_id, month in (
+        db.query(RetainerAccrual.case_id, RetainerAccrual.accrual_month)
+        .join(Case, Case.id == RetainerAccrual.case_id)
+        .filter(_roll_forward_eligible())
+    ):
+        existing.setdefault(case_id, set()).add(month)
+
+    pairs: list[tuple[int, dt.date]] = []
+    for case_id, anchor, snapshot, snapshot_through in cases:
+        have = existing.get(case_id, set())
+        cur = schedule_start_month(anchor, snapshot, snapshot_through)
+        while cur <= up_to:
+            if cur not in have:
+                pairs.append((case_id, cur))
+            cur = add_months(cur, 1)
+    return pairs
+
+
+def ensure_all_cases_accruals_up_to_now(db: Session, *, today: dt.date | None = None) -> tuple[int, int]:
     """
     Roll-forward: ensure all open cases have accruals up to current month.
     - No snapshot: start from retainer_anchor_date.
     - Snapshot + through_month: start from month after through_month.
     - Snapshot without through_month: skip (backward compat).
     Returns (cases_scanned, accruals_added).
-    Idempotent: ensure_accruals_up_to only creates missing months.
+    Idempotent: only missing months are created.
+
+    Set-based: the missing (case_id, month) pairs of the whole portfolio are found in one pass
+    (generate_series on Postgres), inserted with one multi-row INSERT per batch, and the touched
+    cases' balances refreshed in bulk, all in one commit.
     """
     logger = logging.getLogger(__name__)
-    today = dt.date.today()
-    open_cases = db.query(Case).filter(Case.status == CaseStatus.OPEN).all()
-    total_added = 0
-    processed = 0
-    for c in open_cases:
-        if c.retainer_snapshot_ils_gross is not None and c.retainer_snapshot_through_month is None:
-            continue
-        processed += 1
-        snapshot_through = c.retainer_snapshot_through_month if c.retainer_snapshot_ils_gross else None
-        created = ensure_accruals_up_to(
-            db,
-            case_id=c.id,
-            retainer_anchor_date=c.retainer_anchor_date,
-            up_to=today,
-            snapshot_through_month=snapshot_through,
+    up_to = _month_start(today or dt.date.today())
+    processed = db.query(func.count(Case.id)).filter(_roll_forward_eligible()).scalar()
+    if db.get_bind().dialect.name == "postgresql":
+        pairs = [tuple(r) for r in db.execute(text(_MISSING_ACCRUAL_MONTHS_SQL), {"up_to": up_to})]
+    else:
+        pairs = _missing_accrual_months_py(db, up_to=up_to)
+
+    vat = get_vat_table(db)
+    gross_by_month: dict[dt.date, Decimal] = {}
+    rows = []
+    for case_id, month in pairs:
+        if month not in gross_by_month:
+            gross_by_month[month] = retainer_gross_for_month(month, vat)
+        rows.append(
+            {
+                "case_id": case_id,
+                "accrual_month": month,
+                "invoice_date": month,
+                "due_date": month + dt.timedelta(days=DUE_AFTER_DAYS),
+                "amount_ils_gross": gross_by_month[month],
+                "is_paid": False,
+            }
         )
-        total_added += len(created)
+    for i in range(0, len(rows), _ROLL_FORWARD_BATCH):
+        db.execute(insert(RetainerAccrual), rows[i : i + _ROLL_FORWARD_BATCH])
+    if rows:
+        first_new_month: dict[int, dt.date] = {}
+        for case_id, month in pairs:
+            first_new_month.setdefault(case_id, month)  # pairs are ordered by (case_id, month)
+        invalidate_payment_allocation(db, first_new_month)
+        refresh_case_balances(db, case_ids=list(first_new_month))
+        db.commit()
+
     logger.info(
         "retainer_roll_forward: cases_scanned=%d accruals_added=%d",
         processed,
-        total_added,
+        len(rows),
     )
-    return processed, total_added
+    return processed, len(rows)
 
 
 def _sum_payments(db: Session, case_id: int) -> Decimal:
@@ -155,61 +238,238 @@ def _sum_payments(db: Session, case_id: int) -> Decimal:
     return q_ils(Decimal(str(total)))
 
 
-def allocate_payments_to_accruals(db: Session, *, case_id: int) -> None:
+def invalidate_payment_allocation(db: Session, first_new_month_by_case: dict[int, dt.date]) -> None:
     """
-    Marks accruals as paid oldest-first based on total cash received.
-    Each accrual has its own amount_ils_gross (VAT-dependent).
+    Accruals were added at first_new_month (per case): where that is inside the paid-through prefix the
+    stored allocation no longer describes the rows, so the next payment reallocates in full.
+    Appending after the pointer (the monthly roll-forward) keeps it valid.
     """
-    total_paid = _sum_payments(db, case_id)
+    if not first_new_month_by_case:
+        return
+    rows = (
+        db.query(CaseBalance)
+        .filter(CaseBalance.case_id.in_(list(first_new_month_by_case)), CaseBalance.retainer_paid_through_month.isnot(None))
+        .all()
+    )
+    for row in rows:
+        if first_new_month_by_case[row.case_id] <= row.retainer_paid_through_month:
+            row.retainer_allocated_payments_ils_gross = None
+
+
+def _store_allocation(
+    row: CaseBalance | None, *, paid_through: dt.date | None, unallocated: int, allocated_payments: int | None
+) -> None:
+    if row is None:
+        return
+    row.retainer_paid_through_month = paid_through
+    row.retainer_unallocated_ils_gross = from_agorot(unallocated)
+    row.retainer_allocated_payments_ils_gross = None if allocated_payments is None else from_agorot(allocated_payments)
+
+
+def _allocate_all(db: Session, *, case_id: int, total_paid: int, row: CaseBalance | None) -> None:
     accruals = (
         db.query(RetainerAccrual)
         .filter(RetainerAccrual.case_id == case_id)
         .order_by(RetainerAccrual.accrual_month.asc())
         .all()
     )
-    remaining = total_paid
-    for a in accruals:
-        amt = Decimal(str(a.amount_ils_gross))
-        if remaining >= amt:
-            a.is_paid = True
-            remaining = q_ils(remaining - amt)
-        else:
-            a.is_paid = False
-    db.commit()
+    amounts = [to_agorot(a.amount_ils_gross) for a in accruals]
+    paid_flags = allocate_whole(amounts, total_paid)
+    for a, is_paid in zip(accruals, paid_flags, strict=True):
+        a.is_paid = is_paid
+
+    prefix = 0
+    while prefix < len(accruals) and paid_flags[prefix]:
+        prefix += 1
+    unallocated = total_paid - sum(amount for amount, is_paid in zip(amounts, paid_flags) if is_paid)
+    # The pointer only describes a paid prefix; a paid accrual past it (a smaller amount skipped ahead)
+    # leaves no reusable state and the next payment reallocates in full again.
+    prefix_only = not any(paid_flags[prefix:])
+    _store_allocation(
+        row,
+        paid_through=accruals[prefix - 1].accrual_month if prefix else None,
+        unallocated=unallocated,
+        allocated_payments=total_paid if prefix_only else None,
+    )
 
 
-def retainer_summary(db: Session, *, case_id: int) -> dict[str, Decimal]:
-    accrued_total = (
-        db.query(func.coalesce(func.sum(RetainerAccrual.amount_ils_gross), 0))
-        .filter(RetainerAccrual.case_id == case_id)
-        .scalar()
+def _allocate_forward(db: Session, *, case_id: int, row: CaseBalance, new_payment: int) -> bool:
+    """
+    Apply one new payment from the stored pointer: only the unpaid tail is read and only accruals that
+    become paid are written. Returns False (nothing changed) when the result could differ from a full
+    allocation, i.e. a later, smaller accrual would fit the leftover.
+    """
+    credit = to_agorot(row.retainer_unallocated_ils_gross) + new_payment
+    q = db.query(RetainerAccrual).filter(RetainerAccrual.case_id == case_id)
+    if row.retainer_paid_through_month is not None:
+        q = q.filter(RetainerAccrual.accrual_month > row.retainer_paid_through_month)
+    tail = q.order_by(RetainerAccrual.accrual_month.asc()).all()
+
+    newly_paid: list[RetainerAccrual] = []
+    stop = len(tail)
+    for i, a in enumerate(tail):
+        amount = to_agorot(a.amount_ils_gross)
+        if a.is_paid or amount > credit:
+            stop = i
+            break
+        newly_paid.append(a)
+        credit -= amount
+    if any(a.is_paid or to_agorot(a.amount_ils_gross) <= credit for a in tail[stop:]):
+        return False
+
+    for a in newly_paid:
+        a.is_paid = True
+    _store_allocation(
+        row,
+        paid_through=newly_paid[-1].accrual_month if newly_paid else row.retainer_paid_through_month,
+        unallocated=credit,
+        allocated_payments=to_agorot(row.retainer_allocated_payments_ils_gross) + new_payment,
     )
-    paid_total = _sum_payments(db, case_id)
+    return True
 
-    applied_to_fees_total = (
-        db.query(func.coalesce(func.sum(FeeEvent.amount_covered_by_credit_ils_gross), 0))
-        .filter(FeeEvent.case_id == case_id)
-        .scalar()
-    )
-    applied_to_fees_total = q_ils(Decimal(str(applied_to_fees_total)))
 
-    fees_due_total = (
-        db.query(func.coalesce(func.sum(FeeEvent.amount_due_cash_ils_gross), 0))
-        .filter(FeeEvent.case_id == case_id)
-        .scalar()
+def allocate_payments_to_accruals(db: Session, *, case_id: int, new_payment_ils_gross: Decimal | None = None) -> None:
+    """
+    Marks accruals as paid oldest-first based on total cash received.
+    Each accrual has its own amount_ils_gross (VAT-dependent).
+
+    case_balances keeps a paid-through pointer (last month of the fully paid prefix), the unallocated
+    credit and the payments total they reflect. With new_payment_ils_gross (one payment just added)
+    and a pointer that still matches the payments on file, only accruals after the pointer are read
+    and flipped. Otherwise (no pointer yet, a payment changed or removed, accruals inserted inside the
+    paid prefix, see invalidate_payment_allocation) all accruals are reallocated from the total.
+    Allocation depends only on amounts and accrual order, so a payment's date does not matter.
+    Runs inside the caller's transaction (flushes, does not commit).
+    """
+    db.flush()  # the caller's new payment (sessions run without autoflush)
+    total_paid = to_agorot(_sum_payments(db, case_id))
+    row = db.get(CaseBalance, case_id)
+    fast = (
+        new_payment_ils_gross is not None
+        and row is not None
+        and row.retainer_allocated_payments_ils_gross is not None
+        and to_agorot(row.retainer_allocated_payments_ils_gross) + to_agorot(new_payment_ils_gross) == total_paid
     )
-    fees_due_total = q_ils(Decimal(str(fees_due_total)))
+    if not (fast and _allocate_forward(db, case_id=case_id, row=row, new_payment=to_agorot(new_payment_ils_gross))):
+        _allocate_all(db, case_id=case_id, total_paid=total_paid, row=row)
+    db.flush()
+
+
+def set_vat_period(db: Session, *, start_month: dt.date, rate: Decimal) -> VatPeriod:
+    """
+    Add or change the VAT rate in force from start_month (first of month). Flushes only: the caller
+    commits it together with reprice_unpaid_accruals, so the rate never applies without the re-price.
+    An empty table stands for DEFAULT_VAT, so its periods are written out first.
+    """
+    start_month = _month_start(start_month)
+    if db.query(VatPeriod.start_month).first() is None:
+        for start, _end, default_rate in DEFAULT_VAT.periods():
+            db.add(VatPeriod(start_month=start, rate=default_rate))
+        db.flush()
+    row = db.get(VatPeriod, start_month)
+    if row is None:
+        row = VatPeriod(start_month=start_month, rate=rate)
+        db.add(row)
+    else:
+        row.rate = rate
+    db.flush()
+    return row
+
+
+def reprice_unpaid_accruals(db: Session, *, since: dt.date | None = None) -> dict[str, int]:
+    """
+    Bring unpaid accruals (from since's month on, default all) to the current VAT table: one UPDATE
+    per VAT period for the rows whose amount differs, returning the case ids touched. Only those
+    cases get their payments reallocated (amounts changed, so which accruals the payments cover can
+    change) and their balances refreshed. Paid accruals keep the amount they were invoiced at.
+    Commits, including a VAT change the session has pending (set_vat_period).
+    """
+    logger = logging.getLogger(__name__)
+    vat = get_vat_table(db)
+    lo = _month_start(since) if since is not None else None
+    db.flush()
+
+    repriced = 0
+    case_ids: set[int] = set()
+    for start, end, rate in vat.periods():
+        if lo is not None and end is not None and end <= lo:
+            continue
+        gross = gross_for_rate(rate)
+        conditions = [RetainerAccrual.is_paid.is_(False), RetainerAccrual.amount_ils_gross != gross]
+        if start != vat.starts[0]:  # the first period also covers everything before it
+            conditions.append(RetainerAccrual.accrual_month >= start)
+        if lo is not None:
+            conditions.append(RetainerAccrual.accrual_month >= lo)
+        if end is not None:
+            conditions.append(RetainerAccrual.accrual_month < end)
+        touched = db.execute(
+            update(RetainerAccrual)
+            .where(*conditions)
+            .values(amount_ils_gross=gross)
+            .returning(RetainerAccrual.case_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        repriced += len(touched)
+        case_ids.update(touched)
+
+    if case_ids:
+        db.expire_all()
+        ids = sorted(case_ids)
+        for case_id in ids:
+            _allocate_all(
+                db, case_id=case_id, total_paid=to_agorot(_sum_payments(db, case_id)), row=db.get(CaseBalance, case_id)
+            )
+        refresh_case_balances(db, case_ids=ids)
+    db.commit()
+
+    logger.info("retainer_reprice: accruals_repriced=%d cases_reallocated=%d", repriced, len(case_ids))
+    return {"accruals_repriced": repriced, "cases_reallocated": len(case_ids)}
+
+
+def retainer_summary_from_totals(
+    *,
+    accrued_total: Decimal,
+    paid_total: Decimal,
+    applied_to_fees_total: Decimal,
+    fees_due_total: Decimal,
+    schedule: RetainerSchedule | None = None,
+) -> dict:
+    """
+    Summary numbers from totals. With the case's schedule, also months outstanding (accrued months
+    not covered by payments, oldest first) and the next due date, in closed form (retainer_schedule.py).
+    """
+    paid_total = q_ils(Decimal(str(paid_total)))
+    applied_to_fees_total = q_ils(Decimal(str(applied_to_fees_total)))
+    accrued_total = q_ils(Decimal(str(accrued_total)))
 
     credit_balance = q_ils(paid_total - applied_to_fees_total)
     if credit_balance < 0:
         credit_balance = Decimal("0.00")
 
     return {
-        "retainer_accrued_total_ils_gross": q_ils(Decimal(str(accrued_total))),
+        "retainer_accrued_total_ils_gross": accrued_total,
         "retainer_paid_total_ils_gross": paid_total,
         "retainer_applied_to_fees_total_ils_gross": applied_to_fees_total,
         "retainer_credit_balance_ils_gross": credit_balance,
-        "fees_due_total_ils_gross": fees_due_total,
+        "fees_due_total_ils_gross": q_ils(Decimal(str(fees_due_total))),
+        "months_outstanding": (
+            schedule.months_outstanding(accrued_total=accrued_total, paid_total=paid_total) if schedule else 0
+        ),
+        "next_due_date": schedule.next_due_date(paid_total=paid_total) if schedule else None,
     }
 
 
+def retainer_summary(db: Session, *, case_id: int) -> dict:
+    """Single-row read from case_balances (see services/balances.py)."""
+    case = db.get(Case, case_id)
+    if case is None:
+        zero = Decimal("0.00")
+        return retainer_summary_from_totals(accrued_total=zero, paid_total=zero, applied_to_fees_total=zero, fees_due_total=zero)
+    balance = get_case_balance(db, case)
+    return retainer_summary_from_totals(
+        accrued_total=balance.retainer_accrued_total_ils_gross,
+        paid_total=balance.retainer_paid_total_ils_gross,
+        applied_to_fees_total=balance.fee_credit_applied_ils_gross,
+        fees_due_total=balance.fees_due_total_ils_gross,
+        schedule=RetainerSchedule.for_case(case, get_vat_table(db)),
+    )
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import datetime as dt
+from bisect import bisect_right
+from dataclasses import dataclass
+from decimal import Decimal
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models.data_version import VAT_PERIODS_VERSION_ID, bump_data_version_after_commit, current_data_version
+from app.models.vat_period import VatPeriod
+from app.services.deductible import q_ils
+from app.services.money import from_agorot, to_agorot
+
+RETAINER_BASE_NET_ILS = Decimal("945.00")
+# Accrual invoice = first of the month; payment due this many days later.
+DUE_AFTER_DAYS = 60
+
+
+@dataclass(frozen=True)
+class VatTable:
+    """
+    VAT rates by period: rates[i] is in force from starts[i] (first of month, ascending) until starts[i + 1].
+    Months before the first start use the first rate.
+    """
+
+    starts: tuple[dt.date, ...]
+    rates: tuple[Decimal, ...]
+
+    def rate_for(self, month: dt.date) -> Decimal:
+        return self.rates[max(bisect_right(self.starts, month) - 1, 0)]
+
+    def periods(self) -> list[tuple[dt.date, dt.date | None, Decimal]]:
+        """(start, end exclusive or None for the open last period, rate); the first start is open-ended backwards."""
+        ends = [*self.starts[1:], None]
+        return [(self.starts[i], ends[i], self.rates[i]) for i in range(len(self.starts))]
+
+
+# Fallback when vat_periods is empty (and the migration seed): 17% up to Dec 2024, 18% from Jan 2025.
+DEFAULT_VAT = VatTable(
+    starts=(dt.date(2015, 10, 1), dt.date(2025, 1, 1)),
+    rates=(Decimal("0.17"), Decimal("0.18")),
+)
+
+# Process-wide copy of vat_periods, keyed on the vat_periods version it was loaded at. Only a committed
+# change to vat_periods bumps that version (listeners below), in whichever worker made it, so every
+# process reloads before the roll-forward can price a new accrual at a superseded rate. The version is
+# checked once per transaction: the table is kept in session.info until it commits or rolls back.
+_vat_cache: tuple[int, VatTable] | None = None
+
+
+def _load_vat_table(db: Session) -> VatTable:
+    rows = db.query(VatPeriod.start_month, VatPeriod.rate).order_by(VatPeriod.start_month.asc()).all()
+    return VatTable(starts=tuple(r[0] for r in rows), rates=tuple(Decimal(str(r[1])) for r in rows)) if rows else DEFAULT_VAT
+
+
+def get_vat_table(db: Session) -> VatTable:
+    """
+    The VAT table as db sees it. A session with its own uncommitted change to vat_periods (e.g.
+    set_vat_period before the re-price commits) reads it directly and leaves the cache alone.
+    """
+    global _vat_cache
+    if db.info.get("vat_periods_changed"):
+        return _load_vat_table(db)
+    table = db.info.get("vat_table")
+    if table is not None:
+        return table
+    version = current_data_version(db, VAT_PERIODS_VERSION_ID)
+    cached = _vat_cache
+    if cached is not None and cached[0] == version:
+        table = cached[1]
+    else:
+        table = _load_vat_table(db)
+        _vat_cache = (version, table)
+    db.info["vat_table"] = table
+    return table
+
+
+def current_vat_table() -> VatTable:
+    """Last loaded table, for callers without a session (DEFAULT_VAT before the first load)."""
+    cached = _vat_cache
+    return cached[1] if cached is not None else DEFAULT_VAT
+
+
+@event.listens_for(Session, "after_flush")
+def _note_vat_change(session: Session, flush_context) -> None:  # noqa: ANN001
+    touched = [*session.new, *session.deleted, *session.dirty]
+    if any(isinstance(o, VatPeriod) for o in touched):
+        session.info["vat_periods_changed"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_vat_bulk_change(orm_execute_state) -> None:  # noqa: ANN001
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is VatPeriod:
+        orm_execute_state.session.info["vat_periods_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_vat_version(session: Session) -> None:
+    session.info.pop("vat_table", None)
+    if session.info.pop("vat_periods_changed", False):
+        bump_data_version_after_commit(session, VAT_PERIODS_VERSION_ID)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_vat_change(session: Session) -> None:
+    session.info.pop("vat_table", None)
+    session.info.pop("vat_periods_changed", None)
+
+
+def _month_start(d: dt.date) -> dt.date:
+    return dt.date(d.year, d.month, 1)
+
+
+def _month_index(d: dt.date) -> int:
+    return d.year * 12 + d.month - 1
+
+
+def _month_from_index(i: int) -> dt.date:
+    return dt.date(i // 12, i % 12 + 1, 1)
+
+
+def accrual_start_month(retainer_anchor_date: dt.date, snapshot_through_month: dt.date | None) -> dt.date:
+    """First accrual month: the month after snapshot_through_month if set, else the anchor month."""
+    if snapshot_through_month is not None:
+        return _month_from_index(_month_index(snapshot_through_month) + 1)
+    return _month_start(retainer_anchor_date)
+
+
+def schedule_start_month(
+    retainer_anchor_date: dt.date, snapshot_ils_gross: Decimal | None, snapshot_through_month: dt.date | None
+) -> dt.date | None:
+    """
+    A case's first retainer accrual month under the roll-forward, or None when it has no schedule. The one
+    rule behind ensure_all_cases_accruals_up_to_now (and its SQL twin in retainer.py) and
+    RetainerSchedule.for_case:
+    - Snapshot without through-month: None (backward compat, never rolled forward).
+    - Non-zero snapshot + through-month: the month after through-month.
+    - Otherwise (no snapshot, or a 0.00 one, which covers no months): the anchor month.
+    """
+    if snapshot_ils_gross is not None and snapshot_through_month is None:
+        return None
+    covers_months = snapshot_ils_gross is not None and snapshot_ils_gross != 0
+    return accrual_start_month(retainer_anchor_date, snapshot_through_month if covers_months else None)
+
+
+def vat_rate_for_month(accrual_month: dt.date, vat: VatTable | None = None) -> Decimal:
+    return (vat or current_vat_table()).rate_for(accrual_month)
+
+
+def gross_for_rate(rate: Decimal) -> Decimal:
+    return q_ils(RETAINER_BASE_NET_ILS * (Decimal("1") + rate))
+
+
+@dataclass(frozen=True)
+class RetainerSchedule:
+    """
+    A case's monthly retainer accruals as a formula instead of rows: one accrual per month from
+    start_month on, priced by the VAT period it falls in. Totals over a range are a sum over the
+    (few) VAT periods it overlaps, independent of the number of months.
+
+    start_month None: the case has no schedule (snapshot without through-month, see retainer.py).
+    Unpaid rows follow the VAT table (reprice_unpaid_accruals); paid rows keep the amount invoiced.
+    The retainer_accruals rows are still written for invoicing and payment allocation.
+    """
+
+    start_month: dt.date | None
+    vat: VatTable = DEFAULT_VAT
+
+    @classmethod
+    def for_case(cls, case, vat: VatTable | None = None) -> RetainerSchedule:  # noqa: ANN001
+        start = schedule_start_month(
+            case.retainer_anchor_date, case.retainer_snapshot_ils_gross, case.retainer_snapshot_through_month
+        )
+        return cls(start_month=start, vat=vat or current_vat_table())
+
+    def _segments(self):  # noqa: ANN202
+        """(first month index, end month index exclusive or None, gross in agorot) per VAT period from start_month."""
+        first = _month_index(self.start_month)
+        for i, (start, end, rate) in enumerate(self.vat.periods()):
+            end_i = _month_index(end) if end is not None else None
+            if end_i is not None and end_i <= first:
+                continue
+            start_i = first if i == 0 else max(first, _month_index(start))
+            yield start_i, end_i, to_agorot(gross_for_rate(rate))
+
+    def months_accrued(self, *, through: dt.date) -> int:
+        """Accruals from start_month through the month of `through`, inclusive."""
+        if self.start_month is None:
+            return 0
+        return max(0, _month_index(through) - _month_index(self.start_month) + 1)
+
+    def accrued_total(self, *, through: dt.date, since: dt.date | None = None) -> Decimal:
+        """Sum of the accruals dated since..through (months, inclusive); since defaults to start_month."""
+        if self.start_month is None:
+            return Decimal("0.00")
+        lo = _month_index(since) if since is not None else _month_index(self.start_month)
+        hi = _month_index(through) + 1
+        total = 0
+        for seg_lo, seg_hi, gross in self._segments():
+            a, b = max(lo, seg_lo), hi if seg_hi is None else min(hi, seg_hi)
+            if b > a:
+                total += (b - a) * gross
+        return from_agorot(total)
+
+    def months_covered(self, amount: Decimal) -> int:
+        """Leading months whose accruals the amount pays in full (oldest first)."""
+        if self.start_month is None:
+            return 0
+        remaining = to_agorot(amount)
+        months = 0
+        for seg_lo, seg_hi, gross in self._segments():
+            k = remaining // gross
+            if seg_hi is not None:
+                k = min(k, seg_hi - seg_lo)
+            months += k
+            remaining -= k * gross
+            if seg_hi is None or k < seg_hi - seg_lo:
+                break
+        return months
+
+    def month_at(self, n: int) -> dt.date:
+        """The n-th accrual month (0 = start_month)."""
+        return _month_from_index(_month_index(self.start_month) + n)
+
+    def months_outstanding(self, *, accrued_total: Decimal, paid_total: Decimal) -> int:
+        return max(0, self.months_covered(accrued_total) - self.months_covered(paid_total))
+
+    def next_due_date(self, *, paid_total: Decimal) -> dt.date | None:
+        """Due date of the first month the payments do not cover (accrued yet or not)."""
+        if self.start_month is None:
+            return None
+        return self.month_at(self.months_covered(paid_total)) + dt.timedelta(days=DUE_AFTER_DAYS)
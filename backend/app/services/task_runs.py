@@ -0,0 +1,337 @@
+"""
+Task run history: wall time, rows and SQL statements per phase of a scheduled task.
+Long tasks (/tasks/daily) run on an in-process background executor, one at a time per task
+(DB-backed lock), and report progress on their task_runs row.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import threading
+import time
+import zlib
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import TypeVar
+
+from sqlalchemy import delete, event, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models.task_run import TaskLock, TaskRun
+
+T = TypeVar("T")
+
+
+@dataclass
+class PhaseStats:
+    """rows_scanned: rows the phase evaluated (cases, accruals, candidate alerts, messages)."""
+
+    name: str
+    duration_ms: int = 0
+    rows_scanned: int = 0
+    rows_written: int = 0
+    queries: int = 0
+
+
+class TaskRunRecorder:
+    """
+    Collects PhaseStats for one run. Queries are counted with a before_cursor_execute listener on the
+    session's engine, restricted to the recording thread (concurrent requests are not counted).
+    Without a TaskRun row (recorder for direct calls / tests) nothing is persisted.
+    on_phase is called after each phase (progress reporting).
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        run: TaskRun | None = None,
+        on_phase: Callable[[list[PhaseStats]], None] | None = None,
+    ) -> None:
+        self.db = db
+        self.run = run
+        self.on_phase = on_phase
+        self.phases: list[PhaseStats] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[PhaseStats]:
+        stats = PhaseStats(name=name)
+        self.phases.append(stats)
+        engine = self.db.get_bind()
+        thread_id = threading.get_ident()
+
+        def count(*_args) -> None:  # noqa: ANN002
+            if threading.get_ident() == thread_id:
+                stats.queries += 1
+
+        event.listen(engine, "before_cursor_execute", count)
+        started = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.duration_ms = round((time.perf_counter() - started) * 1000)
+            event.remove(engine, "before_cursor_execute", count)
+        if self.on_phase is not None:
+            self.on_phase(self.phases)
+
+
+def _finish(run: TaskRun, recorder: TaskRunRecorder, *, status: str, started: float) -> None:
+    run.status = status
+    run.finished_at = dt.datetime.now(dt.timezone.utc)
+    run.duration_ms = round((time.perf_counter() - started) * 1000)
+    run.phases = [asdict(p) for p in recorder.phases]
+    run.rows_scanned = sum(p.rows_scanned for p in recorder.phases)
+    run.rows_written = sum(p.rows_written for p in recorder.phases)
+    run.queries = sum(p.queries for p in recorder.phases)
+
+
+def record_task_run(
+    db: Session,
+    task: str,
+    fn: Callable[[TaskRunRecorder], T],
+    *,
+    run: TaskRun | None = None,
+    on_phase: Callable[[list[PhaseStats]], None] | None = None,
+) -> T:
+    """
+    Run fn(recorder) as a recorded run of task: the task_runs row (new, or a queued run) is committed as
+    "running" first, then updated with phases, totals and fn's result (or the error, after rolling back
+    fn's open transaction).
+    """
+    logger = logging.getLogger(__name__)
+    if run is None:
+        run = TaskRun(task=task)
+        db.add(run)
+    run.status = "running"
+    run.started_at = dt.datetime.now(dt.timezone.utc)
+    db.commit()
+    recorder = TaskRunRecorder(db, run, on_phase=on_phase)
+    started = time.perf_counter()
+    try:
+        result = fn(recorder)
+    except Exception as exc:
+        db.rollback()
+        _finish(run, recorder, status="failed", started=started)
+        run.error = f"{type(exc).__name__}: {exc}"[:2000]
+        db.commit()
+        logger.exception("task_run_failed task=%s id=%s", task, run.id)
+        raise
+    _finish(run, recorder, status="succeeded", started=started)
+    run.result = result if isinstance(result, dict) else None
+    db.commit()
+    logger.info("task_run task=%s id=%s duration_ms=%s queries=%s", task, run.id, run.duration_ms, run.queries)
+    return result
+
+
+def task_run_out(run: TaskRun) -> dict:
+    return {
+        "id": run.id,
+        "task": run.task,
+        "status": run.status,
+        "queued_at": run.queued_at,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+        "duration_ms": run.duration_ms,
+        "phases": run.phases or [],
+        "rows_scanned": run.rows_scanned,
+        "rows_written": run.rows_written,
+        "queries": run.queries,
+        "result": run.result,
+        "error": run.error,
+    }
+
+
+def list_task_runs(db: Session, *, task: str | None = None, limit: int = 50) -> list[dict]:
+    """Most recent runs first."""
+    q = db.query(TaskRun)
+    if task:
+        q = q.filter(TaskRun.task == task)
+    return [task_run_out(r) for r in q.order_by(TaskRun.id.desc()).limit(limit).all()]
+
+
+# One worker: background tasks run one after another, never concurrently within the process.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-runs")
+
+ACTIVE_STATUSES = ("queued", "running")
+# A task_locks row (SQLite) older than this is left over from a process that died mid-run.
+ABANDONED_AFTER = dt.timedelta(hours=6)
+# A queued run is picked up by the executor right away; still queued and without the lock after
+# this long, the process that queued it is gone.
+QUEUED_GRACE = dt.timedelta(minutes=5)
+
+
+def _lock_key(name: str) -> int:
+    return zlib.crc32(f"teremflow:{name}".encode())
+
+
+def _lock_held(db: Session, name: str, *, run_id: int) -> bool:
+    """
+    Whether the task_lock for name is held (by run_id, where the lock records it). Read-only: the
+    Postgres check looks the advisory lock up in pg_locks instead of trying to take it.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # A bigint advisory key below 2**32 is reported as classid 0, objid key, objsubid 1.
+        return bool(
+            db.execute(
+                text(
+                    "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND granted"
+                    " AND database = (SELECT oid FROM pg_database WHERE datname = current_database())"
+                    " AND classid = 0 AND objid::bigint = :k AND objsubid = 1)"
+                ),
+                {"k": _lock_key(name)},
+            ).scalar()
+        )
+    cutoff = dt.datetime.now(dt.timezone.utc) - ABANDONED_AFTER
+    return (
+        db.query(TaskLock.name)
+        .filter(TaskLock.name == name, TaskLock.run_id == run_id, TaskLock.acquired_at >= cutoff)
+        .first()
+        is not None
+    )
+
+
+def active_task_run(db: Session, task: str) -> TaskRun | None:
+    """
+    The queued or running run of task that is still alive, if any. A run is alive while it holds the
+    task lock, or while it is freshly queued (not started yet). Queued/running rows that fail both are
+    left over from a process that died (deploy, restart): they are marked failed, not handed back.
+    """
+    now = dt.datetime.now(dt.timezone.utc)
+    runs = (
+        db.query(TaskRun)
+        .filter(TaskRun.task == task, TaskRun.status.in_(ACTIVE_STATUSES))
+        .order_by(TaskRun.id.desc())
+        .all()
+    )
+    alive: TaskRun | None = None
+    abandoned = False
+    for run in runs:
+        queued_at = run.queued_at
+        if queued_at is not None and queued_at.tzinfo is None:
+            queued_at = queued_at.replace(tzinfo=dt.timezone.utc)
+        fresh = run.status == "queued" and queued_at is not None and now - queued_at < QUEUED_GRACE
+        if alive is None and (fresh or _lock_held(db, task, run_id=run.id)):
+            alive = run
+            continue
+        run.error = f"abandoned: still {run.status} but its process is gone"
+        run.status = "failed"
+        run.finished_at = now
+        abandoned = True
+    if abandoned:
+        db.commit()
+        logging.getLogger(__name__).warning("task_run_abandoned task=%s", task)
+    return alive
+
+
+@contextmanager
+def task_lock(session_factory: sessionmaker, name: str, *, run_id: int) -> Iterator[bool]:
+    """
+    Hold the named cross-process lock for the block; yields whether it was acquired (never waits).
+    Postgres: session-level pg_try_advisory_lock on a dedicated connection. Elsewhere (SQLite in
+    dev/tests): a task_locks row, taken over once older than ABANDONED_AFTER.
+    """
+    engine = session_factory.kw["bind"]
+    if engine.dialect.name == "postgresql":
+        key = _lock_key(name)
+        with engine.connect() as conn:
+            acquired = bool(conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": key}).scalar())
+            conn.commit()
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": key})
+                    conn.commit()
+        return
+
+    now = dt.datetime.now(dt.timezone.utc)
+    with session_factory() as db:
+        db.execute(delete(TaskLock).where(TaskLock.name == name, TaskLock.acquired_at < now - ABANDONED_AFTER))
+        db.add(TaskLock(name=name, run_id=run_id, acquired_at=now))
+        try:
+            db.commit()
+            acquired = True
+        except IntegrityError:
+            db.rollback()
+            acquired = False
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with session_factory() as db:
+                db.execute(delete(TaskLock).where(TaskLock.name == name, TaskLock.run_id == run_id))
+                db.commit()
+
+
+def _progress_writer(session_factory: sessionmaker, run_id: int) -> Callable[[list[PhaseStats]], None] | None:
+    """
+    Publish completed phases on the run row from a separate session while the task's own transaction
+    is still open. Postgres only: SQLite has a single database-wide writer, so there the phases appear
+    when the run finishes.
+    """
+    if session_factory.kw["bind"].dialect.name != "postgresql":
+        return None
+
+    def write(phases: list[PhaseStats]) -> None:
+        try:
+            with session_factory() as db:
+                db.execute(update(TaskRun).where(TaskRun.id == run_id).values(phases=[asdict(p) for p in phases]))
+                db.commit()
+        except Exception:  # noqa: BLE001
+            logging.getLogger(__name__).warning("task_run_progress_failed id=%s", run_id, exc_info=True)
+
+    return write
+
+
+def _execute_queued_run(
+    session_factory: sessionmaker, run_id: int, fn: Callable[[Session, TaskRunRecorder], dict]
+) -> dict | None:
+    logger = logging.getLogger(__name__)
+    with session_factory() as db:
+        run = db.get(TaskRun, run_id)
+        with task_lock(session_factory, run.task, run_id=run_id) as acquired:
+            if not acquired:
+                run.status = "skipped"
+                run.finished_at = dt.datetime.now(dt.timezone.utc)
+                run.error = f"another {run.task} run holds the lock"
+                db.commit()
+                logger.warning("task_run_skipped task=%s id=%s: lock held", run.task, run_id)
+                return None
+            try:
+                return record_task_run(
+                    db, run.task, lambda recorder: fn(db, recorder), run=run, on_phase=_progress_writer(session_factory, run_id)
+                )
+            except Exception:  # noqa: BLE001
+                return None  # recorded on the row (and logged) by record_task_run
+
+
+def enqueue_task_run(
+    db: Session,
+    task: str,
+    fn: Callable[[Session, TaskRunRecorder], dict],
+    *,
+    session_factory: sessionmaker | None = None,
+    executor: Executor | None = None,
+) -> tuple[TaskRun, Future | None]:
+    """
+    Queue fn(db, recorder) to run in the background with its own session from session_factory (default
+    SessionLocal) and return (run, future) at once; poll the task_runs row for progress.
+    If a live run of task is already queued or running (active_task_run), that run is returned instead
+    (future None), so a retried request never starts a second one; the lock in task_lock covers the
+    remaining races.
+    """
+    active = active_task_run(db, task)
+    if active is not None:
+        return active, None
+    if session_factory is None:
+        from app.db.session import SessionLocal
+
+        session_factory = SessionLocal
+    run = TaskRun(task=task, status="queued")
+    db.add(run)
+    db.commit()
+    future = (executor or _executor).submit(_execute_queued_run, session_factory, run.id, fn)
+    return run, future
@@ -0,0 +1,105 @@
+"""
+Benchmark: Decimal(str(x)) + q_ils loops vs the integer-agorot helpers in app.services.money.
+
+Run from backend/:  python -m benchmarks.money_bench [N]
+Inputs are Decimal amounts with two places, as the database driver returns Numeric(14, 2).
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+import time
+from decimal import Decimal
+
+from app.services.deductible import q_ils
+from app.services.money import allocate_sequential, allocate_whole, from_agorot, sum_agorot, to_agorot
+
+
+def _timed(label: str, fn):  # noqa: ANN001, ANN202
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    print(f"  {label:<10} {elapsed * 1000:9.1f} ms")
+    return result, elapsed
+
+
+def decimal_sum(amounts: list[Decimal]) -> Decimal:
+    total = Decimal("0.00")
+    for a in amounts:
+        total = q_ils(total + Decimal(str(a)))
+    return total
+
+
+def decimal_credit(amounts: list[Decimal], credit: Decimal) -> list[tuple[Decimal, Decimal]]:
+    # The pre-agorot apply_credit_to_amounts loop.
+    credit = q_ils(credit)
+    out = []
+    for amt in amounts:
+        total = q_ils(amt)
+        covered = q_ils(min(credit, total))
+        out.append((covered, q_ils(total - covered)))
+        credit = q_ils(credit - covered)
+    return out
+
+
+def decimal_whole(amounts: list[Decimal], funds: Decimal) -> list[bool]:
+    # The pre-agorot allocate_payments_to_accruals loop.
+    out = []
+    for a in amounts:
+        amt = Decimal(str(a))
+        if funds >= amt:
+            out.append(True)
+            funds = q_ils(funds - amt)
+        else:
+            out.append(False)
+    return out
+
+
+def main(n: int) -> None:
+    rng = random.Random(42)
+    amounts = [Decimal(rng.randint(1, 5_000_000)).scaleb(-2) for _ in range(n)]
+    credit = sum(amounts, Decimal("0.00")) / 2
+    print(f"{n:,} amounts")
+
+    results = []
+    print("sum")
+    expected, t_dec = _timed("decimal", lambda: decimal_sum(amounts))
+    got, t_int = _timed("agorot", lambda: from_agorot(sum_agorot(amounts)))
+    assert got == expected
+    results.append(("sum", t_dec, t_int))
+
+    print("credit (apply_credit_to_amounts)")
+    expected, t_dec = _timed("decimal", lambda: decimal_credit(amounts, credit))
+    got, t_int = _timed(
+        "agorot",
+        lambda: [
+            (from_agorot(c), from_agorot(d))
+            for c, d in allocate_sequential([to_agorot(a) for a in amounts], to_agorot(credit))
+        ],
+    )
+    assert got == expected
+    results.append(("credit", t_dec, t_int))
+
+    print("whole (allocate_payments_to_accruals)")
+    expected, t_dec = _timed("decimal", lambda: decimal_whole(amounts, q_ils(credit)))
+    got, t_int = _timed("agorot", lambda: allocate_whole([to_agorot(a) for a in amounts], to_agorot(credit)))
+    assert got == expected
+    results.append(("whole", t_dec, t_int))
+
+    # Integer core alone, for callers that keep amounts in agorot between steps.
+    cents = [to_agorot(a) for a in amounts]
+    funds = to_agorot(credit)
+    print("agorot core only (inputs already converted)")
+    _, t_sum = _timed("sum", lambda: sum(cents))
+    _, t_credit = _timed("credit", lambda: allocate_sequential(cents, funds))
+    _, t_whole = _timed("whole", lambda: allocate_whole(cents, funds))
+    core = {"sum": t_sum, "credit": t_credit, "whole": t_whole}
+
+    print("speedup vs decimal     end-to-end   core only")
+    for name, t_dec, t_int in results:
+        print(f"  {name:<20} {t_dec / t_int:9.1f}x {t_dec / core[name]:10.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
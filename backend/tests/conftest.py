@@ -11,8 +11,10 @@ import app.models  # noqa: F401
 
 
 @pytest.fixture(scope="function")
-def db():
+def db(monkeypatch: pytest.MonkeyPatch):
     """Create an in-memory SQLite DB with all tables for tests."""
+    # Process-wide VAT table cache: its version key restarts with every fresh database.
+    monkeypatch.setattr("app.services.retainer_schedule._vat_cache", None)
     engine = create_engine("sqlite+pysqlite:///:memory:", echo=False)
     Base.metadata.create_all(engine)
     SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
@@ -0,0 +1,362 @@
+"""Tests for the set-based daily alert pipeline."""
+
+import datetime as dt
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.db.session import Base
+from app.models.case import Case
+from app.models.case_balance import CaseBalance
+from app.models.email_outbox import EmailOutbox
+from app.models.enums import CaseStatus, CaseType, ExpenseCategory, ExpensePayer, NotificationType
+from app.models.notification import AlertEvent, Notification
+from app.models.retainer import RetainerAccrual
+from app.schemas.expense import ExpenseCreate
+from app.services.alerts import (
+    PendingAlert,
+    _load_watermark,
+    _retainer_alerts,
+    record_alerts,
+    run_daily_alerts,
+)
+from app.services.balances import rebuild_case_balances
+from app.schemas.case import CaseCreate
+from app.services.cases import create_case, update_case_status
+from app.services.expenses import add_expense
+
+
+def _seed(db: Session) -> tuple[Case, Case]:
+    today = dt.date.today()
+    near = Case(
+        case_reference="alerts-near",
+        case_type=CaseType.COURT,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2024, 1, 1),
+        retainer_anchor_date=dt.date(2024, 7, 1),
+        deductible_ils_gross=Decimal("5000.00"),  # below the absolute threshold: near exhaustion
+        insurer_started=True,
+        insurer_start_date=dt.date(2025, 3, 1),
+        retainer_snapshot_ils_gross=Decimal("0.00"),  # snapshot without through-month: no roll-forward
+    )
+    far = Case(
+        case_reference="alerts-far",
+        case_type=CaseType.COURT,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2024, 1, 1),
+        retainer_anchor_date=dt.date(2024, 7, 1),
+        deductible_ils_gross=Decimal("500000.00"),
+        insurer_started=False,
+        retainer_snapshot_ils_gross=Decimal("0.00"),
+    )
+    db.add_all([near, far])
+    db.commit()
+    for i, due in enumerate([today - dt.timedelta(days=30), today - dt.timedelta(days=1), today + dt.timedelta(days=3), today + dt.timedelta(days=40)]):
+        db.add(
+            RetainerAccrual(
+                case_id=far.id,
+                accrual_month=dt.date(2024, 1 + i, 1),
+                amount_ils_gross=Decimal("1115.10"),
+                invoice_date=dt.date(2024, 1 + i, 1),
+                due_date=due,
+                is_paid=False,
+            )
+        )
+    db.commit()
+    return near, far
+
+
+def test_daily_alerts_single_commit_and_idempotent(db: Session):
+    _seed(db)
+    commits: list[int] = []
+    event.listen(db, "after_commit", lambda s: commits.append(1))
+
+    result = run_daily_alerts(db)
+
+    assert result == {"ok": True, "sent": 5}
+    assert len(commits) == 1
+    by_type = {}
+    for n in db.query(Notification).all():
+        by_type[n.type] = by_type.get(n.type, 0) + 1
+    assert by_type == {
+        NotificationType.INSURER_STARTED_PAYING: 1,
+        NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION: 1,
+        NotificationType.RETAINER_OVERDUE: 2,
+        NotificationType.RETAINER_DUE_SOON: 1,
+    }
+    assert db.query(AlertEvent).count() == 5
+    # No recipients configured: nothing is queued for email.
+    assert db.query(EmailOutbox).count() == 0
+
+    assert run_daily_alerts(db) == {"ok": True, "sent": 0}
+    assert db.query(Notification).count() == 5
+
+
+def test_record_alerts_skips_existing_and_repeated_keys(db: Session):
+    near, _ = _seed(db)
+    db.add(AlertEvent(type=NotificationType.INSURER_STARTED_PAYING, key=f"case:{near.id}:insurer_started", case_id=near.id))
+    db.commit()
+
+    def alert(type_: NotificationType, key: str) -> PendingAlert:
+        return PendingAlert(type=type_, key=key, case_id=near.id, title="t", message="m", severity="info")
+
+    recorded = record_alerts(
+        db,
+        [
+            alert(NotificationType.INSURER_STARTED_PAYING, f"case:{near.id}:insurer_started"),  # already recorded
+            alert(NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION, f"case:{near.id}:deductible_near"),
+            alert(NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION, f"case:{near.id}:deductible_near"),  # repeated
+        ],
+    )
+    db.commit()
+
+    assert [(a.type, a.key) for a in recorded] == [(NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION, f"case:{near.id}:deductible_near")]
+    assert db.query(AlertEvent).count() == 2
+    assert db.query(Notification).count() == 1
+
+    db.add(AlertEvent(type=NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION, key=f"case:{near.id}:deductible_near", case_id=near.id))
+    with pytest.raises(IntegrityError):
+        db.commit()
+
+
+def test_daily_alerts_queue_emails_in_outbox(db: Session, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "alert_email_recipients", ["ops@example.com", "lead@example.com"])
+    _seed(db)
+
+    run_daily_alerts(db)
+
+    rows = db.query(EmailOutbox).order_by(EmailOutbox.id).all()
+    assert len(rows) == 5
+    assert {r.status for r in rows} == {"pending"}
+    assert rows[0].recipients == "ops@example.com,lead@example.com"
+    assert rows[0].subject == "המבטח התחיל לשלם"
+
+
+def test_digest_types_fold_into_one_message_per_recipient(db: Session, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "alert_email_recipients", ["ops@example.com", "lead@example.com"])
+    monkeypatch.setattr(settings, "alert_email_digest_types", ["RETAINER_DUE_SOON", "RETAINER_OVERDUE"])
+    _seed(db)
+
+    assert run_daily_alerts(db) == {"ok": True, "sent": 5}
+
+    rows = db.query(EmailOutbox).order_by(EmailOutbox.id).all()
+    immediate = [r for r in rows if not r.subject.startswith("סיכום")]
+    digests = [r for r in rows if r.subject.startswith("סיכום")]
+    assert [r.subject for r in immediate] == ["המבטח התחיל לשלם", "השתתפות עצמית קרובה לסיום"]
+    assert [r.recipients for r in digests] == ["ops@example.com", "lead@example.com"]
+    body = digests[0].body
+    assert digests[0].subject == "סיכום התראות יומי: 3 התראות חדשות"
+    assert body.index("תשלום ריטיינר מתקרב (1)") < body.index("תשלום ריטיינר באיחור (2)")  # enum order
+    assert body.count("\n- ") == 3
+
+
+def test_digest_wildcard_covers_every_type(db: Session, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "alert_email_recipients", ["ops@example.com"])
+    monkeypatch.setattr(settings, "alert_email_digest_types", ["*"])
+    _seed(db)
+
+    run_daily_alerts(db)
+
+    rows = db.query(EmailOutbox).all()
+    assert len(rows) == 1
+    assert rows[0].subject == "סיכום התראות יומי: 5 התראות חדשות"
+
+
+_LONG_AGO = dt.datetime(2020, 1, 1, tzinfo=dt.timezone.utc)
+
+
+def _seed_history(db: Session, today: dt.date) -> dict[str, Case]:
+    """Cases and accruals whose rows were last written long ago (before any alert run)."""
+
+    def case(ref: str, deductible: str, *, status: CaseStatus = CaseStatus.OPEN, insurer: bool = False) -> Case:
+        return Case(
+            case_reference=ref,
+            case_type=CaseType.COURT,
+            status=status,
+            open_date=dt.date(2024, 1, 1),
+            retainer_anchor_date=dt.date(2024, 7, 1),
+            deductible_ils_gross=Decimal(deductible),
+            insurer_started=insurer,
+            insurer_start_date=dt.date(2025, 3, 1) if insurer else None,
+            retainer_snapshot_ils_gross=Decimal("0.00"),
+            created_at=_LONG_AGO,
+            updated_at=_LONG_AGO,
+        )
+
+    cases = {
+        "spends": case("wm-spends", "500000.00"),
+        "reopens": case("wm-reopens", "5000.00", status=CaseStatus.CLOSED, insurer=True),
+        "alerted": case("wm-alerted", "5000.00", insurer=True),
+        "accruals": case("wm-accruals", "500000.00"),
+    }
+    db.add_all(cases.values())
+    db.commit()
+    for i, days in enumerate([-15, 3, 40]):
+        db.add(
+            RetainerAccrual(
+                case_id=cases["accruals"].id,
+                accrual_month=dt.date(2024, 1 + i, 1),
+                amount_ils_gross=Decimal("1115.10"),
+                invoice_date=dt.date(2024, 1 + i, 1),
+                due_date=today + dt.timedelta(days=days),
+                is_paid=False,
+                created_at=_LONG_AGO,
+            )
+        )
+    db.commit()
+    rebuild_case_balances(db)
+    db.execute(update(CaseBalance).values(updated_at=_LONG_AGO))
+    db.commit()
+    return cases
+
+
+def _alert_scenario(db: Session, *, full: bool) -> set[tuple]:
+    today = dt.date.today()
+    cases = _seed_history(db, today)
+    # Yesterday's run (ten days ago, an hour before the changes below).
+    run_daily_alerts(db, full=full, today=today - dt.timedelta(days=10), now=dt.datetime.now(dt.timezone.utc) - dt.timedelta(hours=1))
+
+    add_expense(
+        db,
+        case_id=cases["spends"].id,
+        payload=ExpenseCreate(
+            supplier_name="Supplier",
+            amount_ils_gross=Decimal("495000.00"),
+            service_description="Service",
+            demand_received_date=today,
+            expense_date=today,
+            category=ExpenseCategory.EXPERT,
+            payer=ExpensePayer.CLIENT_DEDUCTIBLE,
+        ),
+    )
+    update_case_status(db, case_id=cases["reopens"].id, status_value=CaseStatus.OPEN)
+    db.add(
+        RetainerAccrual(
+            case_id=cases["spends"].id,
+            accrual_month=dt.date(2024, 6, 1),
+            amount_ils_gross=Decimal("1115.10"),
+            invoice_date=dt.date(2024, 6, 1),
+            due_date=today - dt.timedelta(days=30),
+            is_paid=False,
+        )
+    )
+    db.commit()
+    run_daily_alerts(db, full=full)
+
+    return {(n.type, n.case_id, n.message) for n in db.query(Notification).all()}
+
+
+def test_incremental_and_full_evaluation_record_the_same_notifications():
+    results = {}
+    for full in (False, True):
+        engine = create_engine("sqlite+pysqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+        try:
+            results[full] = _alert_scenario(session, full=full)
+        finally:
+            session.close()
+            engine.dispose()
+
+    assert results[False] == results[True]
+    counts: dict[NotificationType, int] = {}
+    for type_, _, _ in results[True]:
+        counts[type_] = counts.get(type_, 0) + 1
+    assert counts == {
+        NotificationType.INSURER_STARTED_PAYING: 2,  # alerted + reopened
+        NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION: 3,  # alerted + reopened + spends
+        NotificationType.RETAINER_DUE_SOON: 1,  # entered the window since the last run
+        NotificationType.RETAINER_OVERDUE: 2,  # overdue at the first run + accrual added since
+    }
+
+
+def test_incremental_run_skips_unchanged_rows(db: Session):
+    today = dt.date.today()
+    _seed_history(db, today)
+    run_daily_alerts(db, today=today)
+
+    since = _load_watermark(db, tuple(NotificationType))
+    assert since is not None and since.evaluated_for == today
+    assert _retainer_alerts(db, today=today, since=since) == []
+
+    # Without a watermark the window scans still skip what is already alerted (anti-join).
+    assert _retainer_alerts(db, today=today) == []
+    db.query(AlertEvent).filter(AlertEvent.type == NotificationType.RETAINER_OVERDUE).delete()
+    assert [a.type for a in _retainer_alerts(db, today=today)] == [NotificationType.RETAINER_OVERDUE]
+
+
+def _expense(amount: str) -> ExpenseCreate:
+    return ExpenseCreate(
+        supplier_name="Supplier",
+        amount_ils_gross=Decimal(amount),
+        service_description="Service",
+        demand_received_date=dt.date(2025, 3, 1),
+        expense_date=dt.date(2025, 3, 1),
+        category=ExpenseCategory.EXPERT,
+    )
+
+
+def test_add_expense_records_threshold_alerts_on_write(db: Session, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "alert_email_recipients", ["ops@example.com"])
+    _, far = _seed(db)
+    run_daily_alerts(db)
+    before = db.query(Notification).count()
+
+    add_expense(db, case_id=far.id, payload=_expense("100000.00"))  # still far from the threshold
+    assert db.query(Notification).count() == before
+    add_expense(db, case_id=far.id, payload=_expense("450000.00"))  # exhausts it and spills over to the insurer
+
+    new = db.query(Notification).filter(
+        Notification.case_id == far.id,
+        Notification.type.in_([NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION, NotificationType.INSURER_STARTED_PAYING]),
+    )
+    assert {n.type for n in new} == {NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION, NotificationType.INSURER_STARTED_PAYING}
+    assert {r.subject for r in db.query(EmailOutbox).all()} >= {"השתתפות עצמית קרובה לסיום", "המבטח התחיל לשלם"}
+
+    # The nightly run does not rescan cases for them.
+    assert run_daily_alerts(db) == {"ok": True, "sent": 0}
+
+
+def test_create_case_records_threshold_alerts_after_a_watermark(db: Session):
+    _seed(db)
+    run_daily_alerts(db)
+    assert _load_watermark(db, tuple(NotificationType)) is not None
+
+    c = create_case(
+        db,
+        CaseCreate(
+            case_reference="alerts-imported",
+            case_type=CaseType.COURT,
+            open_date=dt.date(2024, 1, 1),
+            deductible_ils_gross=Decimal("30000.00"),
+            retainer_snapshot_ils_gross=Decimal("0.00"),  # no roll-forward
+            expenses_snapshot_ils_gross=Decimal("29000.00"),
+        ),
+    )
+    assert [n.type for n in db.query(Notification).filter(Notification.case_id == c.id)] == [
+        NotificationType.DEDUCTIBLE_NEAR_EXHAUSTION
+    ]
+    assert run_daily_alerts(db) == {"ok": True, "sent": 0}
+
+
+def test_write_path_digest_alerts_wait_for_the_daily_digest(db: Session, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "alert_email_recipients", ["ops@example.com"])
+    monkeypatch.setattr(settings, "alert_email_digest_types", ["DEDUCTIBLE_NEAR_EXHAUSTION"])
+    _, far = _seed(db)
+    run_daily_alerts(db)
+    db.query(EmailOutbox).delete()
+    db.commit()
+
+    add_expense(db, case_id=far.id, payload=_expense("495000.00"))
+    assert db.query(EmailOutbox).count() == 0
+    assert db.query(Notification).filter(Notification.email_digest_pending.is_(True)).count() == 1
+
+    run_daily_alerts(db)
+    [digest] = db.query(EmailOutbox).all()
+    assert digest.subject == "סיכום התראות יומי: 1 התראות חדשות"
+    assert "alerts-far" in digest.body
+    assert db.query(Notification).filter(Notification.email_digest_pending.is_(True)).count() == 0
@@ -0,0 +1,221 @@
+"""Tests for the SQL-aggregated analytics overview."""
+
+import datetime as dt
+from decimal import Decimal
+
+from sqlalchemy.orm import Session
+
+from app.models.case import Case
+from app.models.case_balance import CaseBalance
+from app.models.enums import CaseStatus, CaseType, ExpenseCategory, ExpensePayer, FeeEventType
+from app.models.expense import Expense
+from app.models.fee_event import FeeEvent
+from app.models.retainer import RetainerAccrual
+from app.services.analytics import compute_overview, compute_retainer_aging, compute_retainer_projection
+from app.services.balances import rebuild_case_balances
+from app.services.expense_rollup import rebuild_expense_rollup
+
+
+def _case(ref: str, *, case_type=CaseType.COURT, status=CaseStatus.OPEN, insurer_start: dt.date | None = None) -> Case:  # noqa: ANN001
+    return Case(
+        case_reference=ref,
+        case_type=case_type,
+        status=status,
+        open_date=dt.date(2024, 1, 1),
+        retainer_anchor_date=dt.date(2024, 7, 1),
+        deductible_ils_gross=Decimal("10000.00"),
+        insurer_started=insurer_start is not None,
+        insurer_start_date=insurer_start,
+    )
+
+
+def _expense(case: Case, amount: str, day: dt.date, *, category=ExpenseCategory.EXPERT, payer=ExpensePayer.CLIENT_DEDUCTIBLE) -> Expense:  # noqa: ANN001
+    return Expense(
+        case_id=case.id,
+        supplier_name="Supplier",
+        amount_ils_gross=Decimal(amount),
+        service_description="Service",
+        demand_received_date=day,
+        expense_date=day,
+        category=category,
+        payer=payer,
+    )
+
+
+def _fee(case: Case, event_type: FeeEventType) -> FeeEvent:
+    return FeeEvent(
+        case_id=case.id,
+        event_type=event_type,
+        event_date=dt.date(2025, 1, 1),
+        computed_amount_ils_gross=Decimal("0.00"),
+        amount_covered_by_credit_ils_gross=Decimal("0.00"),
+        amount_due_cash_ils_gross=Decimal("0.00"),
+    )
+
+
+def test_overview_aggregates(db: Session):
+    a = _case("a")
+    b = _case("b", insurer_start=dt.date(2025, 2, 10))
+    c = _case("c", case_type=CaseType.DEMAND_LETTER, status=CaseStatus.CLOSED)
+    d = _case("d")
+    db.add_all([a, b, c, d])
+    db.commit()
+    db.add_all(
+        [
+            _expense(a, "1000.00", dt.date(2025, 1, 5), category=ExpenseCategory.ATTORNEY_FEE),
+            _expense(a, "250.50", dt.date(2025, 1, 20)),
+            _expense(a, "99.00", dt.date(2024, 12, 31)),  # before the window
+            _expense(b, "400.00", dt.date(2025, 4, 2)),
+            _expense(b, "600.00", dt.date(2025, 4, 3), payer=ExpensePayer.INSURER),
+            _expense(c, "50.00", dt.date(2025, 7, 1)),
+            _fee(a, FeeEventType.COURT_STAGE_1_DEFENSE),
+            _fee(a, FeeEventType.COURT_STAGE_3_EVIDENCE),
+            _fee(b, FeeEventType.COURT_STAGE_1_DEFENSE),
+            _fee(b, FeeEventType.THIRD_PARTY_NOTICE),
+        ]
+    )
+    db.commit()
+    rebuild_case_balances(db)
+    rebuild_expense_rollup(db)
+
+    out = compute_overview(db, start_date=dt.date(2025, 1, 1), end_date=dt.date(2025, 12, 31))
+
+    assert out.total_expenses_ils_gross == Decimal("2300.50")
+    assert out.total_on_deductible_ils_gross == Decimal("1700.50")
+    assert out.total_on_insurer_ils_gross == Decimal("600.00")
+    assert out.average_expenses_per_case_ils_gross == Decimal("575.13")
+    assert out.cases_switched_to_insurer_count == 1
+    assert out.expense_split == {"attorney": Decimal("1000.00"), "other": Decimal("1300.50")}
+    assert [r.case_reference for r in out.expenses_by_case] == ["a", "b", "c", "d"]
+    row_a = out.expenses_by_case[0]
+    assert (row_a.total_expenses_ils_gross, row_a.attorney_fees_expenses_ils_gross) == (Decimal("1250.50"), Decimal("1000.00"))
+    assert out.expenses_by_case[2].payer_status == "closed"
+    # Open cases only: a (10000 - 250.50 - 99.00), b, d.
+    assert out.aggregate_remaining_deductible_open_cases_ils_gross == Decimal("9650.50") + Decimal("9600.00") + Decimal("10000.00")
+    assert [(r.stage, r.count) for r in out.court_cases_end_stage_distribution] == [(1, 1), (2, 0), (3, 1), (4, 0), (5, 0)]
+    assert [(p.period, p.total_expenses_ils_gross) for p in out.monthly] == [
+        ("2025-01", Decimal("1250.50")),
+        ("2025-04", Decimal("1000.00")),
+        ("2025-07", Decimal("50.00")),
+    ]
+    assert [p.period for p in out.quarterly] == ["2025-Q1", "2025-Q2", "2025-Q3"]
+    assert [(p.period, p.total_expenses_ils_gross) for p in out.yearly] == [("2025", Decimal("2300.50"))]
+
+
+def test_overview_filters_in_sql(db: Session):
+    a = _case("a")
+    b = _case("b", insurer_start=dt.date(2025, 2, 10))
+    c = _case("c", case_type=CaseType.DEMAND_LETTER, status=CaseStatus.CLOSED)
+    db.add_all([a, b, c])
+    db.commit()
+    db.add_all([_expense(a, "100.00", dt.date(2025, 1, 5)), _expense(b, "200.00", dt.date(2025, 1, 5))])
+    db.commit()
+    rebuild_expense_rollup(db)
+
+    window = {"start_date": dt.date(2025, 1, 1), "end_date": dt.date(2025, 12, 31)}
+    client = compute_overview(db, payer_status="client", **window)
+    assert [r.case_reference for r in client.expenses_by_case] == ["a"]
+    assert client.total_expenses_ils_gross == Decimal("100.00")
+
+    insurer = compute_overview(db, payer_status="insurer", **window)
+    assert [r.case_reference for r in insurer.expenses_by_case] == ["b"]
+
+    demand = compute_overview(db, case_type=CaseType.DEMAND_LETTER, **window)
+    assert [r.case_reference for r in demand.expenses_by_case] == ["c"]
+    assert demand.total_expenses_ils_gross == Decimal("0.00")
+
+    assert compute_overview(db, payer_status="bogus", **window).expenses_by_case == []
+
+
+def _accrual(case: Case, due: dt.date, amount: str = "1000.00", *, paid: bool = False) -> RetainerAccrual:
+    month = dt.date(due.year, due.month, 1)
+    return RetainerAccrual(
+        case_id=case.id,
+        accrual_month=month,
+        invoice_date=month,
+        due_date=due,
+        amount_ils_gross=Decimal(amount),
+        is_paid=paid,
+    )
+
+
+def test_retainer_aging_buckets_by_branch_and_type(db: Session):
+    as_of = dt.date(2026, 6, 30)
+    a = _case("a")
+    a.branch_name = "North"
+    b = _case("b")
+    b.branch_name = "North"
+    c = _case("c", case_type=CaseType.DEMAND_LETTER, status=CaseStatus.CLOSED)
+    db.add_all([a, b, c])
+    db.commit()
+    db.add_all(
+        [
+            _accrual(a, as_of - dt.timedelta(days=1)),  # 0-30
+            _accrual(a, as_of - dt.timedelta(days=30)),  # 0-30
+            _accrual(b, as_of - dt.timedelta(days=31), "500.00"),  # 31-60
+            _accrual(a, as_of - dt.timedelta(days=90)),  # 61-90
+            _accrual(c, as_of - dt.timedelta(days=91), "250.00"),  # 90+
+            _accrual(a, as_of - dt.timedelta(days=200), paid=True),  # paid: ignored
+            _accrual(b, as_of, "700.00"),  # due today: not past due
+        ]
+    )
+    db.commit()
+
+    r = compute_retainer_aging(db, as_of=as_of)
+    assert r.total_outstanding_ils_gross == Decimal("3750.00")
+    assert [(x.bucket, x.outstanding_ils_gross, x.case_count, x.accrual_count) for x in r.buckets] == [
+        ("0-30", Decimal("2000.00"), 1, 2),
+        ("31-60", Decimal("500.00"), 1, 1),
+        ("61-90", Decimal("1000.00"), 1, 1),
+        ("90+", Decimal("250.00"), 1, 1),
+    ]
+    assert [(x.branch_name, x.case_type, x.bucket, x.outstanding_ils_gross) for x in r.rows] == [
+        (None, CaseType.DEMAND_LETTER, "90+", Decimal("250.00")),
+        ("North", CaseType.COURT, "0-30", Decimal("2000.00")),
+        ("North", CaseType.COURT, "31-60", Decimal("500.00")),
+        ("North", CaseType.COURT, "61-90", Decimal("1000.00")),
+    ]
+
+    open_only = compute_retainer_aging(db, as_of=as_of, payer_status="client")
+    assert open_only.total_outstanding_ils_gross == Decimal("3500.00")
+
+
+def test_retainer_projection_matches_per_case_schedule(db: Session):
+    """Future invoices per month/branch without writing rows; prepaid retainer reduces cash due oldest-first."""
+    today = dt.date(2026, 10, 17)
+    north = [_case(f"n{i}") for i in range(3)]
+    for c in north:
+        c.branch_name = "North"
+    late = _case("late")  # anchor inside the horizon
+    late.retainer_anchor_date = dt.date(2027, 1, 1)
+    late.branch_name = "South"
+    snap = _case("snap")  # snapshot without through-month: no schedule
+    snap.retainer_snapshot_ils_gross = Decimal("3000.00")
+    closed = _case("closed", status=CaseStatus.CLOSED)
+    db.add_all([*north, late, snap, closed])
+    db.commit()
+    rebuild_case_balances(db)
+    # 2.5 months prepaid on one North case.
+    balance = db.get(CaseBalance, north[0].id)
+    balance.retainer_paid_total_ils_gross = Decimal("2787.75")
+    db.commit()
+
+    r = compute_retainer_projection(db, months=6, today=today)
+    assert r.from_month == dt.date(2026, 11, 1)
+    assert [m.case_count for m in r.months] == [3, 3, 4, 4, 4, 4]
+    assert [m.invoiced_ils_gross for m in r.months] == [Decimal("3345.30")] * 2 + [Decimal("4460.40")] * 4
+    assert [m.covered_by_credit_ils_gross for m in r.months] == [
+        Decimal("1115.10"),
+        Decimal("1115.10"),
+        Decimal("557.55"),
+        Decimal("0.00"),
+        Decimal("0.00"),
+        Decimal("0.00"),
+    ]
+    jan = r.months[2]
+    assert jan.due_date == dt.date(2027, 1, 1) + dt.timedelta(days=60)
+    assert [(b.branch_name, b.case_count, b.cash_due_ils_gross) for b in jan.branches] == [
+        ("North", 3, Decimal("2787.75")),
+        ("South", 1, Decimal("1115.10")),
+    ]
+    assert r.total_cash_due_ils_gross == r.total_invoiced_ils_gross - Decimal("2787.75")
@@ -0,0 +1,92 @@
+"""Tests for the data-version counter and the analytics result cache."""
+
+import datetime as dt
+from decimal import Decimal
+
+from sqlalchemy.orm import Session
+
+from app.models.case import Case
+from app.models.data_version import current_data_version
+from app.models.enums import CaseStatus, CaseType, ExpenseCategory, NotificationType
+from app.models.notification import Notification
+from app.schemas.expense import ExpenseCreate
+from app.services.analytics_cache import ResultCache, etag_for, overview_cache_key
+from app.services.expenses import add_expense
+
+
+def test_writes_bump_data_version(db: Session):
+    assert current_data_version(db) == 0
+
+    c = Case(
+        case_reference="version-1",
+        case_type=CaseType.COURT,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2025, 1, 1),
+        retainer_anchor_date=dt.date(2025, 7, 1),
+        deductible_ils_gross=Decimal("10000.00"),
+        insurer_started=False,
+    )
+    db.add(c)
+    db.commit()
+    v1 = current_data_version(db)
+    assert v1 > 0
+
+    add_expense(
+        db,
+        case_id=c.id,
+        payload=ExpenseCreate(
+            supplier_name="Supplier",
+            amount_ils_gross=Decimal("100.00"),
+            service_description="Service",
+            demand_received_date=dt.date(2025, 2, 1),
+            expense_date=dt.date(2025, 2, 1),
+            category=ExpenseCategory.EXPERT,
+        ),
+    )
+    v2 = current_data_version(db)
+    assert v2 > v1
+
+    # Unrelated tables do not invalidate analytics.
+    db.add(Notification(type=NotificationType.RETAINER_DUE_SOON, title="t", message="m", severity="info"))
+    db.commit()
+    assert current_data_version(db) == v2
+
+    # Bulk statements bypass the flush but still count.
+    db.query(Case).delete()
+    db.commit()
+    assert current_data_version(db) > v2
+
+
+def test_cache_key_normalizes_filters():
+    base = {"start_date": dt.date(2025, 1, 1), "end_date": dt.date(2025, 12, 31), "case_type": None}
+    assert overview_cache_key(payer_status=None, **base) == overview_cache_key(payer_status="all", **base)
+    assert overview_cache_key(payer_status="client", **base) != overview_cache_key(payer_status="insurer", **base)
+    key = overview_cache_key(payer_status=None, **base)
+    assert etag_for(key, 1) != etag_for(key, 2)
+
+
+def test_result_cache_lru_and_version_purge():
+    cache = ResultCache(max_bytes=10)
+    calls: list[str] = []
+
+    def compute(value: bytes):  # noqa: ANN202
+        def run() -> bytes:
+            calls.append(value.decode())
+            return value
+
+        return run
+
+    assert cache.get_or_compute("a", 1, compute(b"aaaa")) == b"aaaa"
+    assert cache.get_or_compute("a", 1, compute(b"zzzz")) == b"aaaa"  # hit
+    cache.get_or_compute("b", 1, compute(b"bbbb"))
+    cache.get_or_compute("a", 1, compute(b"zzzz"))  # touch a so b is least recent
+    cache.get_or_compute("c", 1, compute(b"cccc"))  # over 10 bytes: evicts b
+    assert cache.get_or_compute("b", 1, compute(b"bbbb")) == b"bbbb"
+    assert calls == ["aaaa", "bbbb", "cccc", "bbbb"]
+
+    # A newer data version drops everything stored under the old one.
+    assert cache.get_or_compute("a", 2, compute(b"AAAA")) == b"AAAA"
+    # A result computed against an older version is served but not stored.
+    cache.get_or_compute("old", 1, compute(b"oooo"))
+    cache.get_or_compute("old", 2, compute(b"OOOO"))
+    assert calls[-3:] == ["AAAA", "oooo", "OOOO"]
@@ -0,0 +1,161 @@
+"""Tests for the materialized case_balances ledger."""
+
+import datetime as dt
+from decimal import Decimal
+
+from sqlalchemy.orm import Session
+
+from app.models.case import Case
+from app.models.case_balance import CaseBalance
+from app.models.enums import CaseStatus, CaseType, ExpenseCategory, ExpensePayer, FeeEventType
+from app.models.retainer import RetainerAccrual, RetainerPayment
+from app.schemas.expense import ExpenseCreate
+from app.schemas.fee_event import FeeEventCreate
+from app.services.balances import BALANCE_FIELDS, compute_case_balances, get_case_balance, rebuild_case_balances
+from app.services.expenses import add_expense, get_case_excess_remaining
+from app.services.fees import add_fee_event, apply_retainer_credit
+from app.services.money import allocate_whole, to_agorot
+from app.services.retainer import allocate_payments_to_accruals, ensure_accruals_up_to, retainer_summary
+
+
+def _case(db: Session, ref: str, deductible: str = "20000.00") -> Case:
+    c = Case(
+        case_reference=ref,
+        case_type=CaseType.COURT,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2024, 1, 15),
+        retainer_anchor_date=dt.date(2024, 7, 1),
+        deductible_ils_gross=Decimal(deductible),
+        insurer_started=False,
+    )
+    db.add(c)
+    db.commit()
+    db.refresh(c)
+    return c
+
+
+def _expense(amount: str, category: ExpenseCategory = ExpenseCategory.EXPERT, payer: ExpensePayer | None = None) -> ExpenseCreate:
+    return ExpenseCreate(
+        supplier_name="Supplier",
+        amount_ils_gross=Decimal(amount),
+        service_description="Service",
+        demand_received_date=dt.date(2025, 3, 1),
+        expense_date=dt.date(2025, 3, 1),
+        category=category,
+        payer=payer,
+    )
+
+
+def _stored(db: Session, case_id: int) -> dict[str, Decimal]:
+    row = db.get(CaseBalance, case_id)
+    assert row is not None
+    return {f: Decimal(str(getattr(row, f))) for f in BALANCE_FIELDS}
+
+
+def test_write_paths_keep_balance_in_sync(db: Session):
+    """Expenses, accruals, payments and fee events all leave the row equal to a recompute from raw rows."""
+    c = _case(db, "bal-sync")
+
+    ensure_accruals_up_to(db, case_id=c.id, retainer_anchor_date=c.retainer_anchor_date, up_to=dt.date(2025, 2, 1))
+    add_expense(db, case_id=c.id, payload=_expense("1500.00"))
+    add_expense(db, case_id=c.id, payload=_expense("3000.00", category=ExpenseCategory.ATTORNEY_FEE))
+    add_expense(db, case_id=c.id, payload=_expense("800.00", payer=ExpensePayer.INSURER))
+
+    db.add(RetainerPayment(case_id=c.id, payment_date=dt.date(2025, 3, 1), amount_ils_gross=Decimal("5000.00")))
+    db.commit()
+    allocate_payments_to_accruals(db, case_id=c.id)
+    apply_retainer_credit(db, case_id=c.id)
+
+    add_fee_event(db, case_id=c.id, payload=FeeEventCreate(event_type=FeeEventType.COURT_STAGE_1_DEFENSE, event_date=dt.date(2025, 3, 2)))
+
+    stored = _stored(db, c.id)
+    assert stored == compute_case_balances(db, [c])[c.id]
+    assert stored["deductible_consumed_ils_gross"] == Decimal("4500.00")
+    assert stored["retainer_paid_total_ils_gross"] == Decimal("5000.00")
+    assert stored["fee_credit_applied_ils_gross"] == Decimal("5000.00")
+    assert stored["fees_due_total_ils_gross"] == Decimal("15000.00")
+    assert stored["excess_remaining_ils_gross"] == get_case_excess_remaining(db, c) == Decimal("13500.00")
+
+    summary = retainer_summary(db, case_id=c.id)
+    assert summary["retainer_paid_total_ils_gross"] == Decimal("5000.00")
+    assert summary["retainer_credit_balance_ils_gross"] == Decimal("0.00")
+    assert summary["retainer_accrued_total_ils_gross"] == stored["retainer_accrued_total_ils_gross"]
+
+
+def test_missing_row_read_falls_back_to_raw_rows(db: Session):
+    """Reads never require the row: a case without one is computed (and nothing is written)."""
+    c = _case(db, "bal-missing", deductible="1000.00")
+    db.add(RetainerPayment(case_id=c.id, payment_date=dt.date(2025, 3, 1), amount_ils_gross=Decimal("250.00")))
+    db.commit()
+
+    assert get_case_balance(db, c).excess_remaining_ils_gross == Decimal("750.00")
+    db.commit()
+    assert db.get(CaseBalance, c.id) is None
+
+
+def test_rebuild_creates_missing_and_repairs_drift(db: Session):
+    a = _case(db, "bal-rebuild-a")
+    b = _case(db, "bal-rebuild-b")
+    add_expense(db, case_id=a.id, payload=_expense("1200.00"))
+
+    row = db.get(CaseBalance, a.id)
+    row.excess_remaining_ils_gross = Decimal("1.00")
+    db.commit()
+
+    result = rebuild_case_balances(db)
+
+    assert result == {"cases_scanned": 2, "created": 1, "drifted": 1}
+    assert _stored(db, a.id)["excess_remaining_ils_gross"] == Decimal("18800.00")
+    assert _stored(db, b.id)["excess_remaining_ils_gross"] == Decimal("20000.00")
+    assert rebuild_case_balances(db) == {"cases_scanned": 2, "created": 0, "drifted": 0}
+
+
+def _pay(db: Session, case_id: int, amount: str) -> None:
+    db.add(RetainerPayment(case_id=case_id, payment_date=dt.date(2025, 3, 1), amount_ils_gross=Decimal(amount)))
+    db.commit()
+    allocate_payments_to_accruals(db, case_id=case_id, new_payment_ils_gross=Decimal(amount))
+
+
+def _expected_paid_flags(db: Session, case_id: int) -> list[bool]:
+    accruals = db.query(RetainerAccrual).filter(RetainerAccrual.case_id == case_id).order_by(RetainerAccrual.accrual_month).all()
+    total = sum((p.amount_ils_gross for p in db.query(RetainerPayment).filter(RetainerPayment.case_id == case_id)), Decimal("0"))
+    return allocate_whole([to_agorot(a.amount_ils_gross) for a in accruals], to_agorot(total))
+
+
+def _paid_flags(db: Session, case_id: int) -> list[bool]:
+    accruals = db.query(RetainerAccrual).filter(RetainerAccrual.case_id == case_id).order_by(RetainerAccrual.accrual_month).all()
+    return [a.is_paid for a in accruals]
+
+
+def test_incremental_payment_allocation_matches_full_reallocation(db: Session):
+    """Payments applied from the paid-through pointer leave the same flags as allocating the total from scratch."""
+    c = _case(db, "bal-alloc")
+    ensure_accruals_up_to(db, case_id=c.id, retainer_anchor_date=c.retainer_anchor_date, up_to=dt.date(2025, 3, 1))
+    # A cheaper month ahead makes the skip rule matter: leftover credit can pay it before an earlier one.
+    small = db.query(RetainerAccrual).filter_by(case_id=c.id, accrual_month=dt.date(2025, 1, 1)).one()
+    small.amount_ils_gross = Decimal("500.00")
+    db.commit()
+
+    row = db.get(CaseBalance, c.id)
+    for amount in ["1105.65", "2211.30", "800.00", "305.65", "1105.65", "1000.00", "115.10", "2720.75"]:
+        _pay(db, c.id, amount)
+        assert _paid_flags(db, c.id) == _expected_paid_flags(db, c.id)
+    db.refresh(row)
+    assert row.retainer_paid_through_month == dt.date(2025, 3, 1)
+    assert row.retainer_allocated_payments_ils_gross == Decimal("9364.10")
+    assert row.retainer_unallocated_ils_gross == Decimal("0.00")
+
+    # Roll-forward appends after the pointer: the state stays usable.
+    ensure_accruals_up_to(db, case_id=c.id, retainer_anchor_date=c.retainer_anchor_date, up_to=dt.date(2025, 5, 1))
+    db.refresh(row)
+    assert row.retainer_allocated_payments_ils_gross is not None
+    _pay(db, c.id, "1115.10")
+    assert _paid_flags(db, c.id) == _expected_paid_flags(db, c.id)
+    db.refresh(row)
+    assert row.retainer_paid_through_month == dt.date(2025, 4, 1)
+
+    # A payment removed behind the allocator's back no longer matches the stored total: full reallocation.
+    db.delete(db.query(RetainerPayment).filter_by(case_id=c.id, amount_ils_gross=Decimal("2211.30")).one())
+    db.commit()
+    _pay(db, c.id, "100.00")
+    assert _paid_flags(db, c.id) == _expected_paid_flags(db, c.id)
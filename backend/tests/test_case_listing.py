@@ -0,0 +1,92 @@
+"""Tests for keyset-paginated case listing."""
+
+import datetime as dt
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.models.case import Case
+from app.models.enums import CaseStatus, CaseType
+from app.services.cases import list_cases
+
+
+def _seed(db: Session) -> list[Case]:
+    cases = []
+    for i in range(12):
+        cases.append(
+            Case(
+                case_reference=f"list-{i}",
+                case_type=CaseType.COURT if i % 3 else CaseType.DEMAND_LETTER,
+                status=CaseStatus.CLOSED if i % 4 == 0 else CaseStatus.OPEN,
+                # Several cases share an open_date so the id tiebreaker matters.
+                open_date=dt.date(2025, 1 + i // 3, 10),
+                retainer_anchor_date=dt.date(2025, 7, 1),
+                branch_name="TLV" if i % 2 else "HAIFA",
+                deductible_ils_gross=Decimal("10000.00"),
+                insurer_started=i % 5 == 1,
+            )
+        )
+    db.add_all(cases)
+    db.commit()
+    return cases
+
+
+def _walk(db: Session, **kwargs) -> list[int]:
+    ids: list[int] = []
+    cursor = None
+    while True:
+        items, cursor = list_cases(db, limit=5, cursor=cursor, **kwargs)
+        ids.extend(c.id for c in items)
+        if cursor is None:
+            return ids
+
+
+def test_keyset_pages_cover_full_ordering(db: Session):
+    cases = _seed(db)
+    expected_desc = [c.id for c in sorted(cases, key=lambda c: (c.open_date, c.id), reverse=True)]
+
+    assert _walk(db) == expected_desc
+    assert _walk(db, order="asc") == list(reversed(expected_desc))
+
+    items, cursor = list_cases(db, limit=12)
+    assert len(items) == 12
+    assert cursor is None
+
+
+def test_filters(db: Session):
+    cases = _seed(db)
+
+    def expected(pred) -> list[int]:
+        return [c.id for c in sorted(cases, key=lambda c: (c.open_date, c.id), reverse=True) if pred(c)]
+
+    assert _walk(db, status_value=CaseStatus.CLOSED) == expected(lambda c: c.status == CaseStatus.CLOSED)
+    assert _walk(db, case_type=CaseType.DEMAND_LETTER) == expected(lambda c: c.case_type == CaseType.DEMAND_LETTER)
+    assert _walk(db, branch_name="TLV") == expected(lambda c: c.branch_name == "TLV")
+    assert _walk(db, payer_status="insurer") == expected(lambda c: c.status == CaseStatus.OPEN and c.insurer_started)
+    assert _walk(db, payer_status="client") == expected(lambda c: c.status == CaseStatus.OPEN and not c.insurer_started)
+    assert _walk(db, payer_status="closed") == expected(lambda c: c.status == CaseStatus.CLOSED)
+    assert _walk(db, open_date_from=dt.date(2025, 2, 1), open_date_to=dt.date(2025, 3, 31)) == expected(
+        lambda c: dt.date(2025, 2, 1) <= c.open_date <= dt.date(2025, 3, 31)
+    )
+
+
+def test_search_by_reference_name_or_id(db: Session):
+    cases = _seed(db)
+    cases[7].case_name = "Cohen 100%"
+    db.commit()
+    newest_first = sorted(cases, key=lambda c: (c.open_date, c.id), reverse=True)
+
+    assert _walk(db, search=" LIST-1") == [c.id for c in newest_first if c.case_reference.startswith("list-1")]
+    assert _walk(db, search="cohen") == [cases[7].id]
+    assert _walk(db, search="%") == [cases[7].id]  # LIKE wildcards match literally
+    assert cases[3].id in _walk(db, search=str(cases[3].id))
+    assert _walk(db, search="cohen", status_value=CaseStatus.OPEN) == [cases[7].id]
+    assert _walk(db, search="cohen", status_value=CaseStatus.CLOSED) == []
+
+
+def test_invalid_cursor_rejected(db: Session):
+    with pytest.raises(HTTPException) as exc:
+        list_cases(db, cursor="not-a-cursor")
+    assert exc.value.status_code == 400
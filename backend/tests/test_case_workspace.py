@@ -0,0 +1,78 @@
+"""Tests for the single-request case workspace."""
+
+import datetime as dt
+from decimal import Decimal
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models.case import Case
+from app.models.enums import CaseStatus, CaseType, ExpenseCategory, FeeEventType
+from app.models.retainer import RetainerPayment
+from app.schemas.expense import ExpenseCreate
+from app.schemas.fee_event import FeeEventCreate
+from app.services.cases import get_case_workspace
+from app.services.expenses import add_expense, get_case_excess_remaining, list_expenses
+from app.services.fees import add_fee_event, apply_retainer_credit, list_fee_events
+from app.services.retainer import allocate_payments_to_accruals, ensure_accruals_up_to, retainer_summary
+from app.services.retainer_schedule import get_vat_table
+
+
+def test_workspace_matches_per_endpoint_reads(db: Session):
+    c = Case(
+        case_reference="workspace-1",
+        case_type=CaseType.COURT,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2024, 1, 15),
+        retainer_anchor_date=dt.date(2024, 7, 1),
+        deductible_ils_gross=Decimal("25000.00"),
+        insurer_started=False,
+        retainer_snapshot_ils_gross=Decimal("1000.00"),
+        retainer_snapshot_through_month=dt.date(2024, 9, 1),
+    )
+    db.add(c)
+    db.commit()
+
+    ensure_accruals_up_to(
+        db, case_id=c.id, retainer_anchor_date=c.retainer_anchor_date, up_to=dt.date(2025, 3, 1), snapshot_through_month=dt.date(2024, 9, 1)
+    )
+    for amount, category in (("700.00", ExpenseCategory.EXPERT), ("2500.00", ExpenseCategory.ATTORNEY_FEE)):
+        add_expense(
+            db,
+            case_id=c.id,
+            payload=ExpenseCreate(
+                supplier_name="Supplier",
+                amount_ils_gross=Decimal(amount),
+                service_description="Service",
+                demand_received_date=dt.date(2025, 2, 1),
+                expense_date=dt.date(2025, 2, 1),
+                category=category,
+            ),
+        )
+    add_fee_event(db, case_id=c.id, payload=FeeEventCreate(event_type=FeeEventType.COURT_STAGE_1_DEFENSE, event_date=dt.date(2025, 2, 3)))
+    db.add(RetainerPayment(case_id=c.id, payment_date=dt.date(2025, 3, 1), amount_ils_gross=Decimal("3000.00")))
+    db.commit()
+    allocate_payments_to_accruals(db, case_id=c.id)
+    apply_retainer_credit(db, case_id=c.id)
+    case_id = c.id
+    db.expunge_all()
+    get_vat_table(db)  # the VAT table, checked once per transaction
+
+    statements: list[str] = []
+    bind = db.get_bind()
+    listener = lambda conn, cursor, stmt, params, ctx, many: statements.append(stmt)  # noqa: E731
+    event.listen(bind, "before_cursor_execute", listener)
+    try:
+        ws = get_case_workspace(db, case_id=case_id)
+    finally:
+        event.remove(bind, "before_cursor_execute", listener)
+
+    # Case + one selectin query per collection.
+    assert len(statements) == 5
+    assert ws["case"]["excess_remaining_ils_gross"] == get_case_excess_remaining(db, db.get(Case, case_id))
+    assert ws["retainer_summary"] == retainer_summary(db, case_id=case_id)
+    assert [e.id for e in ws["expenses"]] == [e.id for e in list_expenses(db, case_id)]
+    assert [e.id for e in ws["fee_events"]] == [e.id for e in list_fee_events(db, case_id)]
+    assert [a.accrual_month for a in ws["retainer_accruals"]][0] == dt.date(2025, 3, 1)
+    assert len(ws["retainer_accruals"]) == 6
+    assert len(ws["retainer_payments"]) == 1
@@ -0,0 +1,112 @@
+"""Tests for the email outbox delivery worker."""
+
+import datetime as dt
+import smtplib
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.email_outbox import EmailOutbox
+from app.services.email import deliver_outbox, enqueue_email
+
+
+class FakeSMTP:
+    """Stand-in for smtplib.SMTP that records connections and messages."""
+
+    instances: list["FakeSMTP"] = []
+    fail_subjects: set[str] = set()
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host, self.port = host, port
+        self.sent: list[str] = []
+        self.logged_in = False
+        FakeSMTP.instances.append(self)
+
+    def __enter__(self) -> "FakeSMTP":
+        return self
+
+    def __exit__(self, *exc) -> None:  # noqa: ANN002
+        pass
+
+    def starttls(self) -> None:
+        pass
+
+    def login(self, username: str, password: str) -> None:
+        self.logged_in = True
+
+    def send_message(self, msg) -> None:  # noqa: ANN001
+        if msg["Subject"] in FakeSMTP.fail_subjects:
+            raise smtplib.SMTPRecipientsRefused({})
+        self.sent.append(msg["Subject"])
+
+
+@pytest.fixture
+def smtp(monkeypatch: pytest.MonkeyPatch):
+    FakeSMTP.instances = []
+    FakeSMTP.fail_subjects = set()
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    monkeypatch.setattr(settings, "smtp_host", "smtp.test")
+    monkeypatch.setattr(settings, "smtp_from", "noreply@test")
+    monkeypatch.setattr(settings, "smtp_username", "user")
+    monkeypatch.setattr(settings, "smtp_password", "pw")
+    monkeypatch.setattr(settings, "email_outbox_batch_size", 2)
+    monkeypatch.setattr(settings, "email_max_attempts", 2)
+    monkeypatch.setattr(settings, "email_retry_base_seconds", 60)
+    return FakeSMTP
+
+
+def _enqueue(db: Session, n: int, *, prefix: str = "msg") -> None:
+    for i in range(n):
+        enqueue_email(db, subject=f"{prefix}-{i}", body="body", recipients=["a@example.com"])
+    db.commit()
+
+
+def test_outbox_drains_over_one_smtp_session(db: Session, smtp):  # noqa: ANN001
+    _enqueue(db, 5)
+
+    stats = deliver_outbox(db)
+
+    assert stats == {"attempted": 5, "sent": 5, "retrying": 0, "failed": 0, "smtp_connections": 1}
+    assert len(smtp.instances) == 1
+    assert smtp.instances[0].sent == [f"msg-{i}" for i in range(5)]
+    assert smtp.instances[0].logged_in
+    assert {r.status for r in db.query(EmailOutbox).all()} == {"sent"}
+    assert deliver_outbox(db)["attempted"] == 0
+
+
+def test_outbox_caps_messages_per_run(db: Session, smtp):  # noqa: ANN001
+    _enqueue(db, 5)
+
+    assert deliver_outbox(db, max_messages=3)["sent"] == 3
+    assert db.query(EmailOutbox).filter(EmailOutbox.status == "pending").count() == 2
+
+
+def test_outbox_retries_with_backoff_then_fails(db: Session, smtp):  # noqa: ANN001
+    _enqueue(db, 1, prefix="ok")
+    _enqueue(db, 1, prefix="bad")
+    smtp.fail_subjects = {"bad-0"}
+    now = dt.datetime.now(dt.timezone.utc).replace(microsecond=0) + dt.timedelta(hours=1)
+
+    first = deliver_outbox(db, now=now)
+    assert (first["sent"], first["retrying"], first["failed"]) == (1, 1, 0)
+    bad = db.query(EmailOutbox).filter(EmailOutbox.subject == "bad-0").one()
+    assert bad.status == "pending"
+    assert bad.attempts == 1
+    assert bad.next_attempt_at.replace(tzinfo=None) == (now + dt.timedelta(seconds=60)).replace(tzinfo=None)
+
+    # Not due yet: nothing to do.
+    assert deliver_outbox(db, now=now + dt.timedelta(seconds=30))["attempted"] == 0
+
+    second = deliver_outbox(db, now=now + dt.timedelta(minutes=2))
+    assert (second["attempted"], second["failed"]) == (1, 1)
+    db.refresh(bad)
+    assert bad.status == "failed"
+    assert "SMTPRecipientsRefused" in bad.last_error
+
+
+def test_outbox_dry_run_without_smtp(db: Session, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "smtp_host", None)
+    _enqueue(db, 2)
+
+    assert deliver_outbox(db)["sent"] == 2
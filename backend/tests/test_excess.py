@@ -9,6 +9,7 @@ from app.models.case import Case
 from app.models.enums import CaseStatus, CaseType, ExpenseCategory, ExpensePayer
 from app.models.expense import Expense
 from app.models.retainer import RetainerPayment
+from app.services.balances import get_case_balances
 from app.services.expenses import get_case_excess_remaining
 
 
@@ -216,3 +217,82 @@ def test_excess_snapshot_plus_payments_no_double_count(db: Session):
     # J = snapshot(5000) + payment(1115.10) + expenses_snapshot(2000) + other_expense(500) = 8615.10
     # P = 30000 - 8615.10 = 21384.90
     assert get_case_excess_remaining(db, c) == Decimal("21384.90")
+
+
+def test_batch_excess_matches_per_case(db: Session):
+    """get_case_balances (the list path) returns exactly what get_case_excess_remaining returns per case."""
+    plain = Case(
+        case_reference="batch-plain",
+        case_type=CaseType.COURT,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2025, 1, 15),
+        retainer_anchor_date=dt.date(2025, 7, 1),
+        deductible_ils_gross=Decimal("10000.00"),
+        insurer_started=False,
+    )
+    snapshot = Case(
+        case_reference="batch-snapshot",
+        case_type=CaseType.DEMAND_LETTER,
+        status=CaseStatus.CLOSED,
+        open_date=dt.date(2024, 3, 1),
+        retainer_anchor_date=dt.date(2024, 7, 1),
+        deductible_ils_gross=Decimal("30000.00"),
+        insurer_started=False,
+        retainer_snapshot_ils_gross=Decimal("5000.00"),
+        expenses_snapshot_ils_gross=Decimal("2000.00"),
+    )
+    exhausted = Case(
+        case_reference="batch-exhausted",
+        case_type=CaseType.COURT,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2025, 2, 1),
+        retainer_anchor_date=dt.date(2025, 7, 1),
+        deductible_ils_gross=Decimal("1000.00"),
+        insurer_started=False,
+    )
+    empty = Case(
+        case_reference="batch-empty",
+        case_type=CaseType.SMALL_CLAIMS,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2025, 2, 1),
+        retainer_anchor_date=dt.date(2025, 7, 1),
+        deductible_ils_gross=Decimal("777.77"),
+        insurer_started=False,
+    )
+    db.add_all([plain, snapshot, exhausted, empty])
+    db.commit()
+
+    def expense(case: Case, amount: str, category: ExpenseCategory, payer: ExpensePayer) -> Expense:
+        return Expense(
+            case_id=case.id,
+            supplier_name="Supplier",
+            amount_ils_gross=Decimal(amount),
+            service_description="Service",
+            demand_received_date=dt.date(2025, 8, 1),
+            expense_date=dt.date(2025, 8, 1),
+            category=category,
+            payer=payer,
+        )
+
+    db.add_all(
+        [
+            RetainerPayment(case_id=plain.id, payment_date=dt.date(2025, 8, 1), amount_ils_gross=Decimal("1115.10")),
+            RetainerPayment(case_id=plain.id, payment_date=dt.date(2025, 9, 1), amount_ils_gross=Decimal("1115.10")),
+            RetainerPayment(case_id=snapshot.id, payment_date=dt.date(2025, 1, 1), amount_ils_gross=Decimal("1115.10")),
+            RetainerPayment(case_id=exhausted.id, payment_date=dt.date(2025, 8, 1), amount_ils_gross=Decimal("900.00")),
+            expense(plain, "500.00", ExpenseCategory.EXPERT, ExpensePayer.CLIENT_DEDUCTIBLE),
+            expense(plain, "4000.00", ExpenseCategory.ATTORNEY_FEE, ExpensePayer.CLIENT_DEDUCTIBLE),
+            expense(plain, "800.00", ExpenseCategory.FEES, ExpensePayer.INSURER),
+            expense(snapshot, "250.55", ExpenseCategory.MEDICAL_INFO, ExpensePayer.CLIENT_DEDUCTIBLE),
+            expense(exhausted, "300.00", ExpenseCategory.INVESTIGATOR, ExpensePayer.CLIENT_DEDUCTIBLE),
+        ]
+    )
+    db.commit()
+
+    cases = [plain, snapshot, exhausted, empty]
+    batch = {case_id: b.excess_remaining_ils_gross for case_id, b in get_case_balances(db, cases).items()}
+
+    assert batch == {c.id: get_case_excess_remaining(db, c) for c in cases}
+    assert batch[exhausted.id] == Decimal("0.00")
+    assert batch[empty.id] == Decimal("777.77")
+    assert get_case_balances(db, []) == {}
@@ -0,0 +1,103 @@
+"""Tests for the incrementally maintained monthly expense rollup."""
+
+import datetime as dt
+from decimal import Decimal
+
+from sqlalchemy.orm import Session
+
+from app.models.case import Case
+from app.models.enums import CaseStatus, CaseType, ExpenseCategory, ExpensePayer
+from app.models.expense_rollup import ExpenseRollupMonthly
+from app.schemas.expense import ExpenseCreate
+from app.services.analytics import compute_overview
+from app.services.expense_rollup import rebuild_expense_rollup
+from app.services.expenses import add_expense
+
+
+def _snapshot(db: Session) -> dict:
+    return {
+        (r.case_id, r.month, r.payer, r.category): (Decimal(str(r.total_ils_gross)), r.expense_count)
+        for r in db.query(ExpenseRollupMonthly).all()
+    }
+
+
+def _add(db: Session, case_id: int, amount: str, day: dt.date, category=ExpenseCategory.EXPERT, payer=None):  # noqa: ANN001, ANN202
+    return add_expense(
+        db,
+        case_id=case_id,
+        payload=ExpenseCreate(
+            supplier_name="Supplier",
+            amount_ils_gross=Decimal(amount),
+            service_description="Service",
+            demand_received_date=day,
+            expense_date=day,
+            category=category,
+            payer=payer,
+        ),
+    )
+
+
+def test_add_expense_maintains_rollup_including_split(db: Session):
+    c = Case(
+        case_reference="rollup-1",
+        case_type=CaseType.COURT,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2024, 1, 1),
+        retainer_anchor_date=dt.date(2024, 7, 1),
+        deductible_ils_gross=Decimal("1000.00"),
+        insurer_started=False,
+    )
+    db.add(c)
+    db.commit()
+
+    _add(db, c.id, "300.00", dt.date(2025, 1, 10))
+    _add(db, c.id, "200.00", dt.date(2025, 1, 31))
+    split = _add(db, c.id, "900.00", dt.date(2025, 2, 1))  # 500 on deductible, 400 on insurer
+    _add(db, c.id, "50.00", dt.date(2025, 3, 15), category=ExpenseCategory.ATTORNEY_FEE, payer=ExpensePayer.INSURER)
+    assert len(split) == 2
+
+    rollup = _snapshot(db)
+    assert rollup[(c.id, dt.date(2025, 1, 1), ExpensePayer.CLIENT_DEDUCTIBLE, ExpenseCategory.EXPERT)] == (Decimal("500.00"), 2)
+    assert rollup[(c.id, dt.date(2025, 2, 1), ExpensePayer.CLIENT_DEDUCTIBLE, ExpenseCategory.EXPERT)] == (Decimal("500.00"), 1)
+    assert rollup[(c.id, dt.date(2025, 2, 1), ExpensePayer.INSURER, ExpenseCategory.EXPERT)] == (Decimal("400.00"), 1)
+
+    rebuild_expense_rollup(db)
+    assert _snapshot(db) == rollup
+
+
+def test_overview_mixes_rollup_months_with_partial_edges(db: Session):
+    c = Case(
+        case_reference="rollup-2",
+        case_type=CaseType.COURT,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2024, 1, 1),
+        retainer_anchor_date=dt.date(2024, 7, 1),
+        deductible_ils_gross=Decimal("100000.00"),
+        insurer_started=False,
+    )
+    db.add(c)
+    db.commit()
+    for day, amount in (
+        (dt.date(2025, 1, 9), "1.00"),  # before the window
+        (dt.date(2025, 1, 10), "10.00"),  # partial first month
+        (dt.date(2025, 2, 14), "100.00"),  # whole month (rollup)
+        (dt.date(2025, 3, 31), "1000.00"),  # whole month (rollup)
+        (dt.date(2025, 4, 20), "10000.00"),  # partial last month
+        (dt.date(2025, 4, 21), "99999.00"),  # after the window
+    ):
+        _add(db, c.id, amount, day)
+
+    out = compute_overview(db, start_date=dt.date(2025, 1, 10), end_date=dt.date(2025, 4, 20))
+
+    assert out.total_expenses_ils_gross == Decimal("11110.00")
+    assert [(p.period, p.total_expenses_ils_gross) for p in out.monthly] == [
+        ("2025-01", Decimal("10.00")),
+        ("2025-02", Decimal("100.00")),
+        ("2025-03", Decimal("1000.00")),
+        ("2025-04", Decimal("10000.00")),
+    ]
+    assert [(p.period, p.total_expenses_ils_gross) for p in out.quarterly] == [
+        ("2025-Q1", Decimal("1110.00")),
+        ("2025-Q2", Decimal("10000.00")),
+    ]
+    assert out.expenses_by_case[0].total_expenses_ils_gross == Decimal("11110.00")
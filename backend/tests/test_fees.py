@@ -1,9 +1,20 @@
+import datetime as dt
 from decimal import Decimal
 
 import pytest
 
-from app.models.enums import FeeEventType
-from app.services.fees import apply_credit_to_amounts, compute_fee_amount
+from app.models.case import Case
+from app.models.enums import CaseStatus, CaseType, FeeEventType
+from app.models.fee_event import FeeEvent
+from app.models.retainer import RetainerPayment
+from app.schemas.fee_event import FeeEventCreate
+from app.services.fees import (
+    add_fee_event,
+    apply_credit_to_amounts,
+    apply_retainer_credit,
+    compute_fee_amount,
+    get_fee_summaries_for_cases,
+)
 
 
 def test_compute_fee_amount_court_stage():
@@ -25,3 +36,110 @@ def test_apply_credit_chronological():
     assert allocations == [(Decimal("100.00"), Decimal("0.00")), (Decimal("50.00"), Decimal("30.00"))]
 
 
+def test_fee_summaries_grouped_per_case(db):
+    """Highest court stage, latest event, count and totals for a page of cases."""
+    cases = []
+    for ref, case_type in (("fee-sum-court", CaseType.COURT), ("fee-sum-demand", CaseType.DEMAND_LETTER), ("fee-sum-none", CaseType.COURT)):
+        c = Case(
+            case_reference=ref,
+            case_type=case_type,
+            status=CaseStatus.OPEN,
+            open_date=dt.date(2025, 1, 15),
+            retainer_anchor_date=dt.date(2025, 7, 1),
+            deductible_ils_gross=Decimal("10000.00"),
+            insurer_started=False,
+        )
+        db.add(c)
+        cases.append(c)
+    db.commit()
+    court, demand, empty = cases
+
+    for event_type in (FeeEventType.COURT_STAGE_2_DAMAGES, FeeEventType.COURT_STAGE_1_DEFENSE, FeeEventType.THIRD_PARTY_NOTICE):
+        add_fee_event(db, case_id=court.id, payload=FeeEventCreate(event_type=event_type, event_date=dt.date(2025, 3, 1)))
+    add_fee_event(db, case_id=demand.id, payload=FeeEventCreate(event_type=FeeEventType.DEMAND_HOURLY, event_date=dt.date(2025, 3, 1), quantity=2))
+
+    summaries = get_fee_summaries_for_cases(db, [c.id for c in cases])
+
+    assert summaries[court.id] == {
+        "highest_court_stage": 2,
+        "latest_event_type": FeeEventType.THIRD_PARTY_NOTICE,  # same date: the last one added
+        "fee_event_count": 3,
+        "fees_total_ils_gross": Decimal("45000.00"),
+        "fees_due_cash_total_ils_gross": Decimal("45000.00"),
+    }
+    assert summaries[demand.id]["highest_court_stage"] is None
+    assert summaries[demand.id]["latest_event_type"] == FeeEventType.DEMAND_HOURLY
+    assert summaries[demand.id]["fees_total_ils_gross"] == Decimal("1400.00")
+    assert empty.id not in summaries
+
+
+def test_incremental_credit_matches_full_reallocation(db):
+    """Appended events, new payments, a backdated event and a removed payment all end in the oldest-first split."""
+    c = Case(
+        case_reference="fee-credit-incr",
+        case_type=CaseType.COURT,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2025, 1, 15),
+        retainer_anchor_date=dt.date(2025, 7, 1),
+        deductible_ils_gross=Decimal("100000.00"),
+        insurer_started=False,
+    )
+    db.add(c)
+    db.commit()
+
+    def pay(amount: str) -> RetainerPayment:
+        p = RetainerPayment(case_id=c.id, payment_date=dt.date(2025, 6, 1), amount_ils_gross=Decimal(amount))
+        db.add(p)
+        apply_retainer_credit(db, case_id=c.id)
+        db.commit()
+        return p
+
+    def hours(day: dt.date, quantity: int) -> None:
+        add_fee_event(db, case_id=c.id, payload=FeeEventCreate(event_type=FeeEventType.DEMAND_HOURLY, event_date=day, quantity=quantity))
+
+    def check() -> None:
+        events = db.query(FeeEvent).filter_by(case_id=c.id).order_by(FeeEvent.event_date, FeeEvent.id).all()
+        paid = sum((p.amount_ils_gross for p in db.query(RetainerPayment).filter_by(case_id=c.id)), Decimal("0"))
+        expected = apply_credit_to_amounts([e.computed_amount_ils_gross for e in events], credit_ils_gross=paid)
+        assert [(e.amount_covered_by_credit_ils_gross, e.amount_due_cash_ils_gross) for e in events] == expected
+
+    first = pay("1000.00")
+    hours(dt.date(2025, 3, 1), 1)  # 700: covered
+    hours(dt.date(2025, 4, 1), 2)  # 1400: 300 covered
+    check()
+    pay("500.00")
+    hours(dt.date(2025, 5, 1), 1)
+    check()
+    hours(dt.date(2025, 2, 1), 1)  # backdated before covered events
+    check()
+    db.delete(first)  # credit shrinks below the covered prefix
+    apply_retainer_credit(db, case_id=c.id)
+    db.commit()
+    check()
+    pay("5000.00")
+    check()
+
+
+def test_shrunk_credit_uncovers_fully_covered_events(db):
+    """No event has cash due, then the credit drops: the covered events must not stay covered."""
+    c = Case(
+        case_reference="fee-credit-shrink",
+        case_type=CaseType.DEMAND_LETTER,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2025, 1, 15),
+        retainer_anchor_date=dt.date(2025, 7, 1),
+        deductible_ils_gross=Decimal("100000.00"),
+        insurer_started=False,
+    )
+    db.add(c)
+    db.commit()
+    payment = RetainerPayment(case_id=c.id, payment_date=dt.date(2025, 6, 1), amount_ils_gross=Decimal("2000.00"))
+    db.add(payment)
+    db.commit()
+    e = add_fee_event(db, case_id=c.id, payload=FeeEventCreate(event_type=FeeEventType.DEMAND_HOURLY, event_date=dt.date(2025, 3, 1), quantity=1))
+    assert (e.amount_covered_by_credit_ils_gross, e.amount_due_cash_ils_gross) == (Decimal("700.00"), Decimal("0.00"))
+
+    payment.amount_ils_gross = Decimal("500.00")
+    apply_retainer_credit(db, case_id=c.id)
+    db.commit()
+    assert (e.amount_covered_by_credit_ils_gross, e.amount_due_cash_ils_gross) == (Decimal("500.00"), Decimal("200.00"))
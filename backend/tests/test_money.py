@@ -0,0 +1,55 @@
+"""Tests for the integer-agorot money helpers."""
+
+import random
+from decimal import Decimal
+
+from app.services.deductible import q_ils
+from app.services.fees import apply_credit_to_amounts
+from app.services.money import allocate_sequential, allocate_whole, div_half_up, from_agorot, split_at, sum_agorot, to_agorot
+
+
+def test_to_agorot_rounds_half_up_like_q_ils():
+    for raw in ("0", "0.005", "0.004", "1.235", "-1.235", "-0.005", "12345.67", "10", "0.1", "7.999"):
+        assert from_agorot(to_agorot(Decimal(raw))) == q_ils(Decimal(raw)), raw
+    assert to_agorot(None) == 0
+    assert to_agorot(5) == 500
+    assert to_agorot(0.1 + 0.2) == 30  # floats go through str(), like Decimal(str(x))
+    assert to_agorot("19.90") == 1990
+    assert str(from_agorot(0)) == "0.00"
+    assert str(from_agorot(-5)) == "-0.05"
+
+
+def test_sum_split_and_div():
+    assert sum_agorot([Decimal("1.10"), Decimal("2.20"), None, "3.30"]) == 660
+    assert split_at(1000, 400) == (400, 600)
+    assert split_at(1000, 1500) == (1000, 0)
+    assert split_at(1000, -5) == (0, 1000)
+    assert div_half_up(10, 4) == 3
+    assert div_half_up(9, 4) == 2
+    assert div_half_up(-10, 4) == -3
+
+
+def test_allocations_match_decimal_reference():
+    rng = random.Random(7)
+    for _ in range(200):
+        amounts = [Decimal(rng.randint(0, 100_000)).scaleb(-2) for _ in range(rng.randint(0, 20))]
+        credit = Decimal(rng.randint(0, 500_000)).scaleb(-2)
+
+        expected_credit = []
+        c = credit
+        for amt in amounts:
+            covered = q_ils(min(c, amt))
+            expected_credit.append((covered, q_ils(amt - covered)))
+            c = q_ils(c - covered)
+        assert apply_credit_to_amounts(amounts, credit_ils_gross=credit) == expected_credit
+        assert allocate_sequential([to_agorot(a) for a in amounts], to_agorot(credit)) == [
+            (to_agorot(x), to_agorot(y)) for x, y in expected_credit
+        ]
+
+        expected_paid = []
+        funds = credit
+        for amt in amounts:
+            expected_paid.append(funds >= amt)
+            if funds >= amt:
+                funds -= amt
+        assert allocate_whole([to_agorot(a) for a in amounts], to_agorot(credit)) == expected_paid
@@ -3,13 +3,17 @@
 import datetime as dt
 from decimal import Decimal
 
-from sqlalchemy.orm import Session
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
 
+from app.db.session import Base
 from app.models.case import Case
+from app.models.case_balance import CaseBalance
 from app.models.enums import CaseStatus, CaseType
 from app.models.retainer import RetainerAccrual
 from app.services.alerts import run_daily_alerts
-from app.services.retainer import ensure_all_cases_accruals_up_to_now
+from app.services.balances import BALANCE_FIELDS
+from app.services.retainer import ensure_accruals_up_to, ensure_all_cases_accruals_up_to_now
 
 
 def _accrual_count(db: Session, case_id: int) -> int:
@@ -200,3 +204,78 @@ def test_roll_forward_idempotent_with_snapshot(db: Session):
 
     assert count_after_first == count_after_second
     assert n2 == 0
+
+
+def _portfolio(db: Session) -> None:
+    def case(ref: str, *, status=CaseStatus.OPEN, snapshot=None, through=None, anchor=dt.date(2024, 7, 1)) -> Case:  # noqa: ANN001
+        return Case(
+            case_reference=ref,
+            case_type=CaseType.COURT,
+            status=status,
+            open_date=dt.date(2024, 1, 15),
+            retainer_anchor_date=anchor,
+            deductible_ils_gross=Decimal("10000.00"),
+            insurer_started=False,
+            retainer_snapshot_ils_gross=snapshot,
+            retainer_snapshot_through_month=through,
+        )
+
+    gaps = case("gaps", anchor=dt.date(2023, 7, 1))
+    db.add_all(
+        [
+            gaps,
+            case("plain"),
+            case("snapshot", snapshot=Decimal("5000.00"), through=dt.date(2025, 3, 1)),
+            case("zero-snapshot", snapshot=Decimal("0.00"), through=dt.date(2025, 3, 1)),  # through-month ignored
+            case("snapshot-no-through", snapshot=Decimal("5000.00")),  # skipped
+            case("closed", status=CaseStatus.CLOSED),
+            case("future", anchor=dt.date.today().replace(day=1) + dt.timedelta(days=62)),
+        ]
+    )
+    db.commit()
+    for month in (dt.date(2023, 7, 1), dt.date(2024, 2, 1)):
+        db.add(RetainerAccrual(case_id=gaps.id, accrual_month=month, invoice_date=month, due_date=month, amount_ils_gross=Decimal("1.00")))
+    db.commit()
+
+
+def _per_case_roll_forward(db: Session) -> tuple[int, int]:
+    """The original loop over open cases, as the reference result."""
+    processed = added = 0
+    for c in db.query(Case).filter(Case.status == CaseStatus.OPEN).all():
+        if c.retainer_snapshot_ils_gross is not None and c.retainer_snapshot_through_month is None:
+            continue
+        processed += 1
+        snapshot_through = c.retainer_snapshot_through_month if c.retainer_snapshot_ils_gross else None
+        added += len(
+            ensure_accruals_up_to(
+                db, case_id=c.id, retainer_anchor_date=c.retainer_anchor_date, snapshot_through_month=snapshot_through
+            )
+        )
+    return processed, added
+
+
+def test_bulk_roll_forward_matches_per_case_loop():
+    results = {}
+    for bulk in (True, False):
+        engine = create_engine("sqlite+pysqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+        try:
+            _portfolio(db)
+            counts = ensure_all_cases_accruals_up_to_now(db) if bulk else _per_case_roll_forward(db)
+            accruals = {
+                (a.case.case_reference, a.accrual_month, a.invoice_date, a.due_date, a.amount_ils_gross, a.is_paid)
+                for a in db.query(RetainerAccrual).all()
+            }
+            balances = {
+                b.case.case_reference: tuple(Decimal(str(getattr(b, f))) for f in BALANCE_FIELDS) for b in db.query(CaseBalance).all()
+            }
+            results[bulk] = (counts, accruals, balances)
+        finally:
+            db.close()
+            engine.dispose()
+
+    assert results[True] == results[False]
+    (processed, added), accruals, _ = results[True]
+    assert processed == 5
+    assert added == len(accruals) - 2 > 0
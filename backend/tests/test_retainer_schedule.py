@@ -0,0 +1,141 @@
+"""Closed-form retainer schedule vs. the materialized accrual rows."""
+
+import datetime as dt
+from decimal import Decimal
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.case import Case
+from app.models.case_balance import CaseBalance
+from app.models.data_version import VAT_PERIODS_VERSION_ID, bump_data_version
+from app.models.enums import CaseStatus, CaseType
+from app.models.retainer import RetainerAccrual, RetainerPayment
+from app.models.vat_period import VatPeriod
+from app.services.retainer import (
+    allocate_payments_to_accruals,
+    ensure_accruals_up_to,
+    reprice_unpaid_accruals,
+    retainer_gross_for_month,
+    retainer_summary,
+    set_vat_period,
+)
+from app.services.retainer_schedule import RetainerSchedule, get_vat_table
+
+
+def _case(db: Session, ref: str, **kw) -> Case:
+    c = Case(
+        case_reference=ref,
+        case_type=CaseType.COURT,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2024, 1, 15),
+        retainer_anchor_date=dt.date(2024, 7, 1),
+        deductible_ils_gross=Decimal("20000.00"),
+        insurer_started=False,
+        **kw,
+    )
+    db.add(c)
+    db.commit()
+    return c
+
+
+def test_accrued_total_matches_rows_across_vat_change(db: Session):
+    c = _case(db, "sched")
+    ensure_accruals_up_to(db, case_id=c.id, retainer_anchor_date=c.retainer_anchor_date, up_to=dt.date(2026, 3, 1))
+    rows = db.query(RetainerAccrual).filter_by(case_id=c.id).all()
+    schedule = RetainerSchedule.for_case(c)
+
+    assert schedule.months_accrued(through=dt.date(2026, 3, 15)) == len(rows)
+    assert schedule.accrued_total(through=dt.date(2026, 3, 1)) == sum(r.amount_ils_gross for r in rows)
+    since = dt.date(2024, 11, 1)
+    through = dt.date(2025, 2, 1)
+    assert schedule.accrued_total(through=through, since=since) == sum(
+        r.amount_ils_gross for r in rows if since <= r.accrual_month <= through
+    )
+    assert schedule.accrued_total(through=dt.date(2024, 6, 1)) == Decimal("0.00")
+
+
+def test_schedule_start_follows_snapshot():
+    def case(snapshot, through):  # noqa: ANN001, ANN202
+        return Case(
+            retainer_anchor_date=dt.date(2024, 7, 1),
+            retainer_snapshot_ils_gross=snapshot,
+            retainer_snapshot_through_month=through,
+        )
+
+    assert RetainerSchedule.for_case(case(None, None)).start_month == dt.date(2024, 7, 1)
+    assert RetainerSchedule.for_case(case(Decimal("3000"), dt.date(2025, 3, 1))).start_month == dt.date(2025, 4, 1)
+    assert RetainerSchedule.for_case(case(Decimal("0"), dt.date(2025, 3, 1))).start_month == dt.date(2024, 7, 1)
+    assert RetainerSchedule.for_case(case(Decimal("3000"), None)).start_month is None
+
+
+def test_summary_months_outstanding_and_next_due_date(db: Session):
+    """Jul-Dec 2024 at 1105.65, Jan-Mar 2025 at 1115.10; payments cover Jul-Dec and Jan."""
+    c = _case(db, "sched-summary")
+    ensure_accruals_up_to(db, case_id=c.id, retainer_anchor_date=c.retainer_anchor_date, up_to=dt.date(2025, 3, 1))
+    schedule = RetainerSchedule.for_case(c)
+
+    paid = Decimal("6633.90") + Decimal("1115.10") + Decimal("500.00")
+    assert schedule.months_covered(paid) == 7
+    assert schedule.months_outstanding(accrued_total=schedule.accrued_total(through=dt.date(2025, 3, 1)), paid_total=paid) == 2
+    assert schedule.next_due_date(paid_total=paid) == dt.date(2025, 2, 1) + dt.timedelta(days=60)
+
+    s = retainer_summary(db, case_id=c.id)
+    assert s["months_outstanding"] == 9
+    assert s["next_due_date"] == dt.date(2024, 7, 1) + dt.timedelta(days=60)
+
+
+def test_vat_change_reprices_unpaid_accruals_and_reallocates(db: Session):
+    """A new VAT period re-prices only unpaid months from its start; payments are reallocated for those cases."""
+    c = _case(db, "vat-change")
+    other = _case(db, "vat-untouched")
+    for case in (c, other):
+        ensure_accruals_up_to(db, case_id=case.id, retainer_anchor_date=dt.date(2025, 7, 1), up_to=dt.date(2026, 3, 1))
+    db.query(RetainerAccrual).filter(RetainerAccrual.case_id == other.id, RetainerAccrual.accrual_month >= dt.date(2026, 1, 1)).delete()
+    db.commit()
+    db.add(RetainerPayment(case_id=c.id, payment_date=dt.date(2026, 1, 5), amount_ils_gross=Decimal("6700.00")))
+    db.commit()
+    allocate_payments_to_accruals(db, case_id=c.id)
+    # 6 paid at 1115.10 (Jul-Dec 2025), 9.40 left over.
+    assert [a.is_paid for a in db.query(RetainerAccrual).filter_by(case_id=c.id).order_by(RetainerAccrual.accrual_month)] == [True] * 6 + [False] * 3
+
+    assert get_vat_table(db).rate_for(dt.date(2026, 2, 1)) == Decimal("0.18")
+    set_vat_period(db, start_month=dt.date(2026, 2, 14), rate=Decimal("0.17"))
+    assert get_vat_table(db).rate_for(dt.date(2026, 2, 1)) == Decimal("0.17")  # the session's pending change
+    assert retainer_gross_for_month(dt.date(2026, 1, 1), get_vat_table(db)) == Decimal("1115.10")
+
+    result = reprice_unpaid_accruals(db, since=dt.date(2026, 2, 1))
+    assert result == {"accruals_repriced": 2, "cases_reallocated": 1}
+    amounts = {
+        a.accrual_month: a.amount_ils_gross for a in db.query(RetainerAccrual).filter_by(case_id=c.id)
+    }
+    assert amounts[dt.date(2026, 1, 1)] == Decimal("1115.10")
+    assert amounts[dt.date(2026, 2, 1)] == Decimal("1105.65")
+    assert amounts[dt.date(2026, 3, 1)] == Decimal("1105.65")
+    assert db.get(CaseBalance, c.id).retainer_accrued_total_ils_gross == Decimal("10017.00")
+    assert reprice_unpaid_accruals(db) == {"accruals_repriced": 0, "cases_reallocated": 0}
+    assert get_vat_table(db).rate_for(dt.date(2026, 2, 1)) == Decimal("0.17")  # committed with the re-price
+
+
+def test_vat_rollback_leaves_rates_and_cache_unchanged(db: Session):
+    assert get_vat_table(db).rate_for(dt.date(2026, 2, 1)) == Decimal("0.18")
+    set_vat_period(db, start_month=dt.date(2026, 2, 1), rate=Decimal("0.17"))
+    db.rollback()  # e.g. the re-price failed
+    assert get_vat_table(db).rate_for(dt.date(2026, 2, 1)) == Decimal("0.18")
+    assert db.query(VatPeriod).count() == 0
+
+
+def test_vat_cache_keyed_on_the_vat_periods_version(db: Session):
+    """
+    Another worker's change arrives as a committed row plus a vat_periods version bump, without this
+    process's listeners. Unrelated writes do not reload the table.
+    """
+    assert get_vat_table(db).rate_for(dt.date(2026, 2, 1)) == Decimal("0.18")
+    db.connection().execute(insert(VatPeriod.__table__).values(start_month=dt.date(2026, 2, 1), rate=Decimal("0.17")))
+    db.commit()
+    _case(db, "vat-unrelated-write")  # bumps the data version, not the vat_periods one
+    assert get_vat_table(db).rate_for(dt.date(2026, 2, 1)) == Decimal("0.18")
+
+    bump_data_version(db.connection(), VAT_PERIODS_VERSION_ID)
+    db.commit()
+    assert get_vat_table(db).rate_for(dt.date(2026, 2, 1)) == Decimal("0.17")
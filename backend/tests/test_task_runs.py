@@ -0,0 +1,151 @@
+"""Tests for task run history and per-phase instrumentation."""
+
+import datetime as dt
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api.routes.tasks import daily_job
+from app.db.session import Base
+from app.models.case import Case
+from app.models.enums import CaseStatus, CaseType
+from app.models.retainer import RetainerAccrual
+from app.models.task_run import TaskRun
+from app.services.alerts import run_daily_alerts
+from app.services.task_runs import QUEUED_GRACE, enqueue_task_run, list_task_runs, record_task_run, task_lock
+
+
+def _case(db: Session) -> Case:
+    c = Case(
+        case_reference="runs-1",
+        case_type=CaseType.COURT,
+        status=CaseStatus.OPEN,
+        open_date=dt.date(2024, 1, 1),
+        retainer_anchor_date=dt.date(2024, 7, 1),
+        deductible_ils_gross=Decimal("5000.00"),
+        insurer_started=True,
+        insurer_start_date=dt.date(2025, 3, 1),
+    )
+    db.add(c)
+    db.commit()
+    return c
+
+
+def test_daily_run_records_phases(db: Session):
+    _case(db)
+
+    result = record_task_run(db, "daily", lambda recorder: run_daily_alerts(db, recorder=recorder))
+
+    run = db.query(TaskRun).one()
+    assert run.status == "succeeded"
+    assert run.result == result
+    assert run.finished_at is not None and run.duration_ms is not None
+    phases = {p["name"]: p for p in run.phases}
+    assert list(phases) == ["roll_forward", "insurer_alerts", "deductible_alerts", "retainer_alerts", "record_alerts", "email"]
+    assert phases["roll_forward"]["rows_scanned"] == 1
+    assert phases["roll_forward"]["rows_written"] == db.query(RetainerAccrual).count() > 0
+    assert phases["record_alerts"]["rows_written"] == result["sent"]
+    assert all(p["queries"] > 0 for p in run.phases)
+    assert run.queries == sum(p["queries"] for p in run.phases)
+
+
+def test_failed_run_keeps_the_error(db: Session):
+    def boom(recorder) -> dict:  # noqa: ANN001
+        with recorder.phase("roll_forward"):
+            db.add(Case(case_reference="never-committed"))  # rolled back with the failed run
+            raise RuntimeError("SMTP down")
+
+    with pytest.raises(RuntimeError):
+        record_task_run(db, "daily", boom)
+
+    [run] = list_task_runs(db, task="daily")
+    assert run["status"] == "failed"
+    assert run["error"] == "RuntimeError: SMTP down"
+    assert [p["name"] for p in run["phases"]] == ["roll_forward"]
+    assert db.query(Case).count() == 0
+    assert list_task_runs(db, task="email") == []
+
+
+@pytest.fixture
+def session_factory(tmp_path: Path):
+    """File-backed SQLite shared by the request session and the background worker's sessions."""
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'tasks.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
+    engine.dispose()
+
+
+def test_daily_job_runs_in_background_and_is_not_enqueued_twice(session_factory):  # noqa: ANN001
+    executor = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+
+    def job(job_db: Session, recorder) -> dict:  # noqa: ANN001
+        release.wait(timeout=10)
+        return daily_job(job_db, recorder)
+
+    with session_factory() as db:
+        _case(db)
+        run, future = enqueue_task_run(db, "daily", job, session_factory=session_factory, executor=executor)
+        again, no_future = enqueue_task_run(db, "daily", job, session_factory=session_factory, executor=executor)
+        assert again.id == run.id and no_future is None
+
+        release.set()
+        result = future.result(timeout=10)
+        db.expire_all()
+        finished = db.get(TaskRun, run.id)
+        assert finished.status == "succeeded"
+        assert finished.result == result and result["sent"] > 0
+        assert [p["name"] for p in finished.phases][-1] == "email_delivery"
+
+        # Finished: the next call queues a new run.
+        rerun, rerun_future = enqueue_task_run(db, "daily", job, session_factory=session_factory, executor=executor)
+        assert rerun.id != run.id
+        assert rerun_future.result(timeout=10)["sent"] == 0
+    executor.shutdown()
+
+
+def test_run_is_skipped_while_another_holds_the_lock(session_factory):  # noqa: ANN001
+    executor = ThreadPoolExecutor(max_workers=1)
+    with session_factory() as db, task_lock(session_factory, "daily", run_id=-1) as acquired:
+        assert acquired
+        run, future = enqueue_task_run(db, "daily", daily_job, session_factory=session_factory, executor=executor)
+        assert future.result(timeout=10) is None
+        db.expire_all()
+        skipped = db.get(TaskRun, run.id)
+        assert skipped.status == "skipped"
+        assert skipped.error == "another daily run holds the lock"
+    executor.shutdown()
+
+
+def test_runs_left_by_a_dead_process_are_failed_not_returned(session_factory):  # noqa: ANN001
+    executor = ThreadPoolExecutor(max_workers=1)
+    with session_factory() as db:
+        # A deploy killed the process mid-run (lock released) and another before its queued run started.
+        running = TaskRun(task="daily", status="running", started_at=dt.datetime.now(dt.timezone.utc))
+        queued = TaskRun(task="daily", status="queued", queued_at=dt.datetime.now(dt.timezone.utc) - QUEUED_GRACE * 2)
+        db.add_all([running, queued])
+        db.commit()
+
+        run, future = enqueue_task_run(db, "daily", daily_job, session_factory=session_factory, executor=executor)
+        assert run.id not in (running.id, queued.id)
+        assert future.result(timeout=10) is not None
+        db.expire_all()
+        for stale in (running, queued):
+            row = db.get(TaskRun, stale.id)
+            assert row.status == "failed" and row.error.startswith("abandoned")
+        assert db.get(TaskRun, run.id).status == "succeeded"
+
+        # A running run that holds the lock is still handed back.
+        live = TaskRun(task="daily", status="running")
+        db.add(live)
+        db.commit()
+        with task_lock(session_factory, "daily", run_id=live.id) as acquired:
+            assert acquired
+            again, no_future = enqueue_task_run(db, "daily", daily_job, session_factory=session_factory, executor=executor)
+            assert again.id == live.id and no_future is None
+    executor.shutdown()
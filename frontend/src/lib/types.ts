@@ -42,6 +42,20 @@ export type CaseOut = {
   excess_remaining_ils_gross: string | number
   insurer_started: boolean
   insurer_start_date: string | null
+  fee_summary?: CaseFeeSummary | null
+}
+
+export type CaseFeeSummary = {
+  highest_court_stage: number | null
+  latest_event_type: FeeEventType | null
+  fee_event_count: number
+  fees_total_ils_gross: string | number
+  fees_due_cash_total_ils_gross: string | number
+}
+
+export type CaseListPage = {
+  items: CaseOut[]
+  next_cursor: string | null
 }
 
 export type ExpenseOut = {
@@ -80,6 +94,8 @@ export type RetainerSummary = {
   retainer_applied_to_fees_total_ils_gross: string | number
   retainer_credit_balance_ils_gross: string | number
   fees_due_total_ils_gross: string | number
+  months_outstanding: number
+  next_due_date: string | null
 }
 
 export type FeeEvent = {
@@ -93,6 +109,15 @@ export type FeeEvent = {
   amount_due_cash_ils_gross: string | number
 }
 
+export type CaseWorkspace = {
+  case: CaseOut
+  expenses: ExpenseOut[]
+  fee_events: FeeEvent[]
+  retainer_summary: RetainerSummary
+  retainer_accruals: RetainerAccrual[]
+  retainer_payments: RetainerPayment[]
+}
+
 export type NotificationSeverity = 'info' | 'warning' | 'danger'
 
 export type Notification = {
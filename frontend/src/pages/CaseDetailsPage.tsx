@@ -7,6 +7,7 @@ import { formatILS, formatDateYMD, isOverdue, toNumber } from '../lib/format'
 import { useUnsavedGuard } from '../lib/useUnsavedGuard'
 import type {
   CaseOut,
+  CaseWorkspace,
   ExpenseCategory,
   ExpenseOut,
   ExpensePayer,
@@ -59,10 +60,11 @@ export function CaseDetailsPage() {
 
   type ModalKind = 'expense' | 'retainerPayment' | 'feeEvent'
   const [activeModal, setActiveModal] = useState<ModalKind | null>(null)
-  const [retainerReloadKey, setRetainerReloadKey] = useState(0)
-  const [feesReloadKey, setFeesReloadKey] = useState(0)
 
   const [feeEvents, setFeeEvents] = useState<FeeEvent[]>([])
+  const [retainerSummary, setRetainerSummary] = useState<RetainerSummary | null>(null)
+  const [retainerAccruals, setRetainerAccruals] = useState<RetainerAccrual[]>([])
+  const [retainerPayments, setRetainerPayments] = useState<RetainerPayment[]>([])
 
   useEffect(() => {
     if (activeModal) {
@@ -77,14 +79,13 @@ export function CaseDetailsPage() {
     setError(null)
     setIsLoading(true)
     try {
-      const [c, exps, fees] = await Promise.all([
-        apiFetch<CaseOut>(`/cases/${id}`),
-        apiFetch<ExpenseOut[]>(`/cases/${id}/expenses/`),
-        apiFetch<FeeEvent[]>(`/cases/${id}/fees/`),
-      ])
-      setCaseItem(c)
-      setExpenses(exps)
-      setFeeEvents(fees)
+      const ws = await apiFetch<CaseWorkspace>(`/cases/${id}/workspace`)
+      setCaseItem(ws.case)
+      setExpenses(ws.expenses)
+      setFeeEvents(ws.fee_events)
+      setRetainerSummary(ws.retainer_summary)
+      setRetainerAccruals(ws.retainer_accruals)
+      setRetainerPayments(ws.retainer_payments)
     } catch (e: any) {
       setError(e?.message || 'שגיאה')
     } finally {
@@ -172,19 +173,19 @@ export function CaseDetailsPage() {
 
               {tab === 'retainer' ? (
                 <RetainerPanel
-                  caseId={caseItem.id}
                   retainerAnchorDate={caseItem.retainer_anchor_date}
                   retainerSnapshotIlsGross={caseItem.retainer_snapshot_ils_gross}
+                  summary={retainerSummary}
+                  accruals={retainerAccruals}
+                  payments={retainerPayments}
                   onOpenAddPayment={() => setActiveModal('retainerPayment')}
-                  retainerReloadKey={retainerReloadKey}
                 />
               ) : null}
               {tab === 'fees' ? (
                 <FeesPanel
-                  caseId={caseItem.id}
+                  items={feeEvents}
                   historicalFeeStages={caseItem.historical_fee_stages ?? []}
                   onOpenAddFeeStage={() => setActiveModal('feeEvent')}
-                  feesReloadKey={feesReloadKey}
                 />
               ) : null}
             </div>
@@ -208,7 +209,6 @@ export function CaseDetailsPage() {
           onClose={() => setActiveModal(null)}
           onSaved={async () => {
             setActiveModal(null)
-            setRetainerReloadKey((k) => k + 1)
             await load()
           }}
         />
@@ -219,7 +219,6 @@ export function CaseDetailsPage() {
           onClose={() => setActiveModal(null)}
           onSaved={async () => {
             setActiveModal(null)
-            setFeesReloadKey((k) => k + 1)
             await load()
           }}
         />
@@ -492,54 +491,23 @@ function Field({
 }
 
 function RetainerPanel({
-  caseId,
   retainerAnchorDate,
   retainerSnapshotIlsGross,
+  summary,
+  accruals,
+  payments,
   onOpenAddPayment,
-  retainerReloadKey,
 }: {
-  caseId: number
   retainerAnchorDate: string
   retainerSnapshotIlsGross: string | number | null
+  summary: RetainerSummary | null
+  accruals: RetainerAccrual[]
+  payments: RetainerPayment[]
   onOpenAddPayment: () => void
-  retainerReloadKey: number
 }) {
-  const [summary, setSummary] = useState<RetainerSummary | null>(null)
-  const [accruals, setAccruals] = useState<RetainerAccrual[]>([])
-  const [payments, setPayments] = useState<RetainerPayment[]>([])
-  const [isLoading, setIsLoading] = useState(true)
-  const [error, setError] = useState<string | null>(null)
-
   const hasHistoricalSnapshot =
     retainerSnapshotIlsGross != null && Number(retainerSnapshotIlsGross) > 0
 
-  async function load() {
-    setError(null)
-    setIsLoading(true)
-    try {
-      const [s, a, p] = await Promise.all([
-        apiFetch<RetainerSummary>(`/cases/${caseId}/retainer/summary`),
-        apiFetch<RetainerAccrual[]>(`/cases/${caseId}/retainer/accruals`),
-        apiFetch<RetainerPayment[]>(`/cases/${caseId}/retainer/payments`),
-      ])
-      setSummary(s)
-      setAccruals(a)
-      setPayments(p)
-    } catch (e: any) {
-      setError(e?.message || 'שגיאה')
-    } finally {
-      setIsLoading(false)
-    }
-  }
-
-  useEffect(() => {
-    load()
-    // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [caseId, retainerReloadKey])
-
-  if (isLoading) return <div className="text-right text-sm text-muted">טוען ריטיינר...</div>
-  if (error) return <div className="text-right text-sm text-red-300">{error}</div>
-
   const retainerStartMonth = retainerAnchorDate ? String(retainerAnchorDate).slice(0, 7) : null
 
   return (
@@ -754,38 +722,14 @@ function AddRetainerPaymentModal({ caseId, onClose, onSaved }: { caseId: number;
 }
 
 function FeesPanel({
-  caseId,
+  items,
   historicalFeeStages,
   onOpenAddFeeStage,
-  feesReloadKey,
 }: {
-  caseId: number
+  items: FeeEvent[]
   historicalFeeStages: string[]
   onOpenAddFeeStage: () => void
-  feesReloadKey: number
 }) {
-  const [items, setItems] = useState<FeeEvent[]>([])
-  const [isLoading, setIsLoading] = useState(true)
-  const [error, setError] = useState<string | null>(null)
-
-  async function load() {
-    setError(null)
-    setIsLoading(true)
-    try {
-      const data = await apiFetch<FeeEvent[]>(`/cases/${caseId}/fees/`)
-      setItems(data)
-    } catch (e: any) {
-      setError(e?.message || 'שגיאה')
-    } finally {
-      setIsLoading(false)
-    }
-  }
-
-  useEffect(() => {
-    load()
-    // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [caseId, feesReloadKey])
-
   const totals = useMemo(() => {
     const total = items.reduce((s, e) => s + toNumber(e.computed_amount_ils_gross), 0)
     const covered = items.reduce((s, e) => s + toNumber(e.amount_covered_by_credit_ils_gross), 0)
@@ -793,9 +737,6 @@ function FeesPanel({
     return { total, covered, due }
   }, [items])
 
-  if (isLoading) return <div className="text-right text-sm text-muted">טוען אירועי שכ״ט...</div>
-  if (error) return <div className="text-right text-sm text-red-300">{error}</div>
-
   const hasHistorical = historicalFeeStages.length > 0
 
   return (
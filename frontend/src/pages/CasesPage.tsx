@@ -1,10 +1,10 @@
-import { useEffect, useMemo, useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 import { Link } from 'react-router-dom'
 import { BackButton } from '../components/BackButton'
 import { apiFetch } from '../lib/api'
 import { downloadTextFile, toCsv } from '../lib/csv'
 import { formatILS } from '../lib/format'
-import type { CaseOut, CaseType, FeeEvent } from '../lib/types'
+import type { CaseListPage, CaseOut, CaseStatus, CaseType } from '../lib/types'
 
 const FEE_EVENT_LABEL: Record<string, string> = {
   COURT_STAGE_1_DEFENSE: 'שלב 1 — כתב הגנה',
@@ -21,6 +21,22 @@ const FEE_EVENT_LABEL: Record<string, string> = {
   SMALL_CLAIMS_MANUAL: 'תביעות קטנות — ידני',
 }
 
+const COURT_STAGE_EVENT: Record<number, string> = {
+  1: 'COURT_STAGE_1_DEFENSE',
+  2: 'COURT_STAGE_2_DAMAGES',
+  3: 'COURT_STAGE_3_EVIDENCE',
+  4: 'COURT_STAGE_4_PROOFS',
+  5: 'COURT_STAGE_5_SUMMARIES',
+}
+
+function stageLabel(c: CaseOut): string {
+  const s = c.fee_summary
+  if (!s || s.fee_event_count === 0) return 'לא הוגדר'
+  if (s.highest_court_stage) return FEE_EVENT_LABEL[COURT_STAGE_EVENT[s.highest_court_stage]]
+  if (s.latest_event_type) return FEE_EVENT_LABEL[s.latest_event_type] || s.latest_event_type
+  return `${s.fee_event_count} אירועי שכ״ט`
+}
+
 const CASE_TYPE_LABEL: Record<string, string> = {
   COURT: 'תיק ביהמ"ש',
   DEMAND_LETTER: 'מכתב דרישה',
@@ -29,6 +45,10 @@ const CASE_TYPE_LABEL: Record<string, string> = {
 
 const CASE_TYPES: CaseType[] = ['COURT', 'DEMAND_LETTER', 'SMALL_CLAIMS']
 
+const PAGE_SIZE = 100
+// Search/filter changes refetch once input pauses for this long.
+const SEARCH_DEBOUNCE_MS = 300
+
 type CreateCaseForm = {
   case_reference: string
   case_type: CaseType
@@ -45,8 +65,12 @@ const defaultCreateForm: CreateCaseForm = {
 
 export function CasesPage() {
   const [items, setItems] = useState<CaseOut[]>([])
-  const [stageByCaseId, setStageByCaseId] = useState<Record<number, string>>({})
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [isLoadingMore, setIsLoadingMore] = useState(false)
   const [query, setQuery] = useState('')
+  const [statusFilter, setStatusFilter] = useState<CaseStatus | 'all'>('all')
+  const [caseTypeFilter, setCaseTypeFilter] = useState<CaseType | 'all'>('all')
+  const [branchFilter, setBranchFilter] = useState('')
   const [isLoading, setIsLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
   const [isExporting, setIsExporting] = useState(false)
@@ -54,57 +78,72 @@ export function CasesPage() {
   const [createForm, setCreateForm] = useState<CreateCaseForm>(defaultCreateForm)
   const [createError, setCreateError] = useState<string | null>(null)
   const [isCreating, setIsCreating] = useState(false)
+  // Only the latest request may update the list (an older, slower response is dropped).
+  const requestSeq = useRef(0)
+
+  function listQuery(cursor?: string | null): string {
+    const qs = new URLSearchParams({ limit: String(PAGE_SIZE), include: 'fee_summary' })
+    const search = query.trim()
+    if (search) qs.set('search', search)
+    if (statusFilter !== 'all') qs.set('status', statusFilter)
+    if (caseTypeFilter !== 'all') qs.set('case_type', caseTypeFilter)
+    if (branchFilter.trim()) qs.set('branch_name', branchFilter.trim())
+    if (cursor) qs.set('cursor', cursor)
+    return `/cases/?${qs.toString()}`
+  }
 
   async function load() {
+    const seq = ++requestSeq.current
     setError(null)
     setIsLoading(true)
     try {
-      const data = await apiFetch<CaseOut[]>('/cases/')
-      setItems(data)
-      const stages: Record<number, string> = {}
-      await Promise.all(
-        data.map(async (c) => {
-          try {
-            const fees = await apiFetch<FeeEvent[]>(`/cases/${c.id}/fees/`)
-            if (fees.length > 0) {
-              const latest = [...fees].sort(
-                (a, b) => new Date(b.event_date).getTime() - new Date(a.event_date).getTime()
-              )[0]
-              stages[c.id] = FEE_EVENT_LABEL[latest.event_type] || latest.event_type
-            }
-          } catch {
-            // ignore per-case fee fetch errors
-          }
-        })
-      )
-      setStageByCaseId(stages)
+      const page = await apiFetch<CaseListPage>(listQuery())
+      if (seq !== requestSeq.current) return
+      setItems(page.items)
+      setNextCursor(page.next_cursor)
     } catch (e: any) {
-      setError(e?.message || 'שגיאה')
+      if (seq === requestSeq.current) setError(e?.message || 'שגיאה')
     } finally {
-      setIsLoading(false)
+      if (seq === requestSeq.current) setIsLoading(false)
     }
   }
 
-  useEffect(() => {
-    load()
-  }, [])
+  async function loadMore() {
+    if (!nextCursor) return
+    const seq = requestSeq.current
+    setError(null)
+    setIsLoadingMore(true)
+    try {
+      const page = await apiFetch<CaseListPage>(listQuery(nextCursor))
+      if (seq !== requestSeq.current) return
+      setItems((prev) => [...prev, ...page.items])
+      setNextCursor(page.next_cursor)
+    } catch (e: any) {
+      if (seq === requestSeq.current) setError(e?.message || 'שגיאה')
+    } finally {
+      setIsLoadingMore(false)
+    }
+  }
 
-  const filtered = useMemo(() => {
-    const q = query.trim().toLowerCase()
-    if (!q) return items
-    return items.filter(
-      (c) =>
-        c.case_reference.toLowerCase().includes(q) ||
-        (c.case_name?.toLowerCase().includes(q) ?? false) ||
-        String(c.id).includes(q)
-    )
-  }, [items, query])
+  // Search and filters run on the server: a change reloads from the first page (cursor reset).
+  useEffect(() => {
+    const t = setTimeout(load, SEARCH_DEBOUNCE_MS)
+    return () => clearTimeout(t)
+  }, [query, statusFilter, caseTypeFilter, branchFilter])
 
   async function exportCasesCsv() {
     setError(null)
     setIsExporting(true)
     try {
-      const data = await apiFetch<CaseOut[]>('/cases/')
+      const data: CaseOut[] = []
+      let cursor: string | null = null
+      do {
+        const qs = new URLSearchParams({ limit: '500' })
+        if (cursor) qs.set('cursor', cursor)
+        const page: CaseListPage = await apiFetch<CaseListPage>(`/cases/?${qs.toString()}`)
+        data.push(...page.items)
+        cursor = page.next_cursor
+      } while (cursor)
       const rows = data.map((c) => ({
         case_name: c.case_name ?? '',
         case_reference: c.case_reference,
@@ -195,6 +234,33 @@ export function CasesPage() {
               value={query}
               onChange={(e) => setQuery(e.target.value)}
             />
+            <select
+              className="input h-12 md:max-w-[10rem]"
+              value={statusFilter}
+              onChange={(e) => setStatusFilter(e.target.value as CaseStatus | 'all')}
+            >
+              <option value="all">כל הסטטוסים</option>
+              <option value="OPEN">פתוח</option>
+              <option value="CLOSED">סגור</option>
+            </select>
+            <select
+              className="input h-12 md:max-w-[10rem]"
+              value={caseTypeFilter}
+              onChange={(e) => setCaseTypeFilter(e.target.value as CaseType | 'all')}
+            >
+              <option value="all">כל סוגי התיקים</option>
+              {CASE_TYPES.map((t) => (
+                <option key={t} value={t}>
+                  {CASE_TYPE_LABEL[t]}
+                </option>
+              ))}
+            </select>
+            <input
+              className="input h-12 md:max-w-[10rem]"
+              placeholder="סניף"
+              value={branchFilter}
+              onChange={(e) => setBranchFilter(e.target.value)}
+            />
             <div className="flex gap-2">
               <button
                 onClick={() => setShowCreateModal(true)}
@@ -228,14 +294,14 @@ export function CasesPage() {
                   </tr>
                 </thead>
                 <tbody>
-                  {filtered.map((c) => (
+                  {items.map((c) => (
                     <tr key={c.id} className="border-b border-border/30 hover:bg-surface/30">
                       <td className="py-3">
                         <Link to={`/cases/${c.id}`} className="text-primary hover:underline">
                           {c.case_name ?? c.case_reference}
                         </Link>
                       </td>
-                      <td className="py-3">{stageByCaseId[c.id] ?? 'לא הוגדר'}</td>
+                      <td className="py-3">{stageLabel(c)}</td>
                       <td className="py-3">
                         {c.retainer_snapshot_ils_gross != null ? formatILS(c.retainer_snapshot_ils_gross) : '—'}
                       </td>
@@ -246,7 +312,7 @@ export function CasesPage() {
                       <td className="py-3">{c.status === 'OPEN' ? 'פתוח' : 'סגור'}</td>
                     </tr>
                   ))}
-                  {filtered.length === 0 ? (
+                  {items.length === 0 ? (
                     <tr>
                       <td colSpan={6} className="py-10 text-center text-muted">
                         אין תוצאות
@@ -255,6 +321,13 @@ export function CasesPage() {
                   ) : null}
                 </tbody>
               </table>
+              {nextCursor ? (
+                <div className="mt-4 flex justify-center">
+                  <button onClick={loadMore} className="btn btn-secondary" disabled={isLoadingMore}>
+                    {isLoadingMore ? 'טוען…' : 'טען עוד'}
+                  </button>
+                </div>
+              ) : null}
             </div>
           ) : null}
         </div>